@@ -3,7 +3,7 @@ The main application object (it has to be loaded by any worker/script)
 in order to initialize the database and get a working configuration.
 """
 
-from typing import List, Tuple
+from typing import List, Tuple, Dict, Set
 from datetime import datetime
 import re
 
@@ -11,12 +11,15 @@ from adsputils import ADSCelery
 
 from adsplanetnamepipe.models import FeatureName, FeatureType, AmbiguousFeatureName, MultiTokenFeatureName, \
     NamedEntityLabel, Target, KnowledgeBase, KnowledgeBaseHistory, NamedEntityHistory, NamedEntity, USGSNomenclature, \
-    FeatureNameContext
+    FeatureNameContext, PaperRelevanceScore, KnowledgeGraphPathWeights, IdentifyWatermark, IdentifiedFulltext, \
+    IdentifyCheckpoint
+from adsplanetnamepipe.utils.gazetteer_snapshot import GazetteerSnapshot
 
 
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import and_, or_, desc, delete, asc
 from sqlalchemy.sql import func, select
+from sqlalchemy.dialects.postgresql import insert
 
 
 class ADSPlanetaryNamesPipelineCelery(ADSCelery):
@@ -178,6 +181,49 @@ class ADSPlanetaryNamesPipelineCelery(ADSCelery):
                 self.logger.error("Unable to fetch the target records.")
         return []
 
+    def get_gazetteer_snapshot(self) -> GazetteerSnapshot:
+        """
+        load the tables the arguments of the pipeline are setup from, with one query per table, so that the arguments
+        of all the feature names are setup without querying for each
+
+        :return: the GazetteerSnapshot, or None if the tables could not be loaded
+        """
+        with self.session_scope() as session:
+            try:
+                plural_feature_types = {}
+                for entity, plural_entity in session.query(FeatureType.entity, FeatureType.plural_entity).all():
+                    # same as get_plural_feature_type_entity, the first one found for the feature type
+                    plural_feature_types.setdefault(entity, plural_entity)
+
+                # ordered by the primary key, the order of the contexts and of the multi-token entities does not matter
+                context_ambiguous_feature_names = {}
+                for entity, context in session.query(AmbiguousFeatureName.entity, AmbiguousFeatureName.context) \
+                                              .order_by(AmbiguousFeatureName.entity, AmbiguousFeatureName.context).all():
+                    context_ambiguous_feature_names.setdefault(entity, []).append(context)
+
+                multi_token_containing_feature_names = {}
+                for entity, multi_token_entity in session.query(MultiTokenFeatureName.entity, MultiTokenFeatureName.multi_token_entity) \
+                                                         .order_by(MultiTokenFeatureName.entity, MultiTokenFeatureName.multi_token_entity).all():
+                    multi_token_containing_feature_names.setdefault(entity, []).append(multi_token_entity)
+
+                rows = session.query(NamedEntityLabel).all()
+                name_entity_labels = [row.toJSON() for row in sorted(rows, key=NamedEntityLabel.sort_key)]
+
+                all_targets = [entity for entity, in session.query(Target.entity).all()]
+            except SQLAlchemyError as e:
+                session.rollback()
+                self.logger.error(f"Error occurred while loading the gazetteer snapshot: {str(e)}")
+                return None
+
+        if not name_entity_labels:
+            self.logger.error("Unable to fetch the named entity label records.")
+        if not all_targets:
+            self.logger.error("Unable to fetch the target records.")
+        snapshot = GazetteerSnapshot(plural_feature_types, context_ambiguous_feature_names, multi_token_containing_feature_names,
+                                     name_entity_labels, all_targets)
+        self.logger.info(f"Loaded the gazetteer snapshot: {snapshot.get_stats()}.")
+        return snapshot
+
     def get_feature_type_entities(self, target_entity: str) -> List[str]:
         """
         return all feature types for a given target
@@ -225,6 +271,18 @@ class ADSPlanetaryNamesPipelineCelery(ADSCelery):
                     # flush to generate the ID for the history entry
                     session.flush()
 
+                    # the knowledge graph is going to be built from this history entry from now on,
+                    # so the path weights of the graphs built from the earlier entries are no longer valid
+                    session.execute(delete(KnowledgeGraphPathWeights)
+                                    .where(KnowledgeGraphPathWeights.history_id.in_(
+                                        select(KnowledgeBaseHistory.id)
+                                        .where(and_(KnowledgeBaseHistory.feature_name_entity == history_entry.feature_name_entity,
+                                                    KnowledgeBaseHistory.feature_type_entity == history_entry.feature_type_entity,
+                                                    KnowledgeBaseHistory.target_entity == history_entry.target_entity,
+                                                    KnowledgeBaseHistory.named_entity_label == history_entry.named_entity_label,
+                                                    KnowledgeBaseHistory.id != history_entry.id))))
+                                    .execution_options(synchronize_session=False))
+
                     if knowledge_base_entries:
                         for knowledge_base_entry in knowledge_base_entries:
                             # assign the generated history ID to the KnowledgeBase entry
@@ -282,10 +340,11 @@ class ADSPlanetaryNamesPipelineCelery(ADSCelery):
         """
         with self.session_scope() as session:
             try:
+                knowledge_base_history_criteria = and_(KnowledgeBaseHistory.feature_name_entity == feature_name_entity,
+                                                       KnowledgeBaseHistory.target_entity == target_entity,
+                                                       KnowledgeBaseHistory.named_entity_label == 'planetary')
                 knowledge_base_history = session.query(KnowledgeBaseHistory.id.label('id')) \
-                    .filter(and_(KnowledgeBaseHistory.feature_name_entity == feature_name_entity,
-                                 KnowledgeBaseHistory.target_entity == target_entity,
-                                 KnowledgeBaseHistory.named_entity_label == 'planetary')) \
+                    .filter(knowledge_base_history_criteria) \
                     .subquery()
 
                 rows_updated = session.query(KnowledgeBase)\
@@ -296,6 +355,11 @@ class ADSPlanetaryNamesPipelineCelery(ADSCelery):
                     {KnowledgeBase.keywords: func.array_append(KnowledgeBase.keywords, keyword.lower())},
                     synchronize_session='fetch'
                 )
+                # keywords have changed, the knowledge graph needs to be rebuilt
+                session.execute(delete(KnowledgeGraphPathWeights)
+                                .where(KnowledgeGraphPathWeights.history_id.in_(
+                                    select(KnowledgeBaseHistory.id).where(knowledge_base_history_criteria)))
+                                .execution_options(synchronize_session=False))
                 session.commit()
 
                 self.logger.info(f"{rows_updated} rows updated with the keyword `{keyword.lower()}` for feature name `{feature_name_entity}` and target `{target_entity}` for the `KnowledgeBase` records.")
@@ -317,10 +381,11 @@ class ADSPlanetaryNamesPipelineCelery(ADSCelery):
         """
         with self.session_scope() as session:
             try:
+                knowledge_base_history_criteria = and_(KnowledgeBaseHistory.feature_name_entity == feature_name_entity,
+                                                       KnowledgeBaseHistory.target_entity == target_entity,
+                                                       KnowledgeBaseHistory.named_entity_label == 'planetary')
                 knowledge_base_history = session.query(KnowledgeBaseHistory.id.label('id')) \
-                    .filter(and_(KnowledgeBaseHistory.feature_name_entity == feature_name_entity,
-                                 KnowledgeBaseHistory.target_entity == target_entity,
-                                 KnowledgeBaseHistory.named_entity_label == 'planetary')) \
+                    .filter(knowledge_base_history_criteria) \
                     .subquery()
 
                 rows_updated = session.query(KnowledgeBase) \
@@ -330,6 +395,11 @@ class ADSPlanetaryNamesPipelineCelery(ADSCelery):
                         {KnowledgeBase.keywords: func.array_remove(KnowledgeBase.keywords, keyword.lower())},
                         synchronize_session='fetch'
                     )
+                # keywords have changed, the knowledge graph needs to be rebuilt
+                session.execute(delete(KnowledgeGraphPathWeights)
+                                .where(KnowledgeGraphPathWeights.history_id.in_(
+                                    select(KnowledgeBaseHistory.id).where(knowledge_base_history_criteria)))
+                                .execution_options(synchronize_session=False))
                 session.commit()
 
                 self.logger.info(f"{rows_updated} rows updated by removing the keyword `{keyword.lower()}` for feature name `{feature_name_entity}` and target `{target_entity}` from the `KnowledgeBase` records.")
@@ -374,6 +444,9 @@ class ADSPlanetaryNamesPipelineCelery(ADSCelery):
         """
         with self.session_scope() as session:
             try:
+                session.execute(delete(KnowledgeGraphPathWeights)
+                                .where(KnowledgeGraphPathWeights.history_id.in_(ids_to_remove))
+                                .execution_options(synchronize_session=False))
                 knowledge_base_rows_deleted = session.execute(delete(KnowledgeBase)
                                                               .where(KnowledgeBase.history_id.in_(ids_to_remove)) \
                                                               .execution_options(synchronize_session=False)).rowcount
@@ -419,15 +492,20 @@ class ADSPlanetaryNamesPipelineCelery(ADSCelery):
                              f"Deleted {knowledge_base_history_rows_deleted} rows from knowledge_base_history and {knowledge_base_rows_deleted} rows from knowledge_base.")
         return knowledge_base_history_rows_deleted, knowledge_base_rows_deleted
 
-    def insert_named_entity_records(self, named_entity_list: List[Tuple[NamedEntityHistory, List[NamedEntity]]]) -> bool:
+    def insert_named_entity_records(self, named_entity_list: List[Tuple[NamedEntityHistory, List[NamedEntity]]],
+                                    checkpoint_keys: List[Tuple[str, str, str, str]] = None) -> bool:
         """
         insert named entity records into the database
 
         :param named_entity_list: a list of tuples containing NamedEntityHistory and associated NamedEntity records
+        :param checkpoint_keys: optional list of tuples containing (feature_name_entity, feature_type_entity, target_entity, timestamp)
+                                of the identify checkpoints to remove in the same transaction, once the records are saved
         :return: true if the insertion is successful, false otherwise
         """
         with self.session_scope() as session:
             try:
+                for checkpoint_key in checkpoint_keys or []:
+                    self.delete_identify_checkpoints(session, *checkpoint_key)
                 for history_entry, named_entity_entries in named_entity_list:
                     session.add(history_entry)
                     # flush to generate the ID for the history entry
@@ -908,3 +986,315 @@ class ADSPlanetaryNamesPipelineCelery(ADSCelery):
                 self.logger.info("No entities require updating for the knowledge graph.")
 
         return result
+
+    def get_paper_relevance_score(self, bibcode: str, fulltext_mtime: str, target_entity: str, feature_type_entity: str) -> float:
+        """
+        retrieve the paper relevance score computed earlier for a record, target, and feature type
+
+        :param bibcode: the bibcode of the record
+        :param fulltext_mtime: the fulltext modification timestamp of the record
+        :param target_entity: the target entity to filter by
+        :param feature_type_entity: the feature type entity to filter by
+        :return: the paper relevance score, or -1 if it has not been computed for this version of the fulltext
+        """
+        with self.session_scope() as session:
+            row = session.query(PaperRelevanceScore.paper_relevance_score) \
+                .filter(and_(PaperRelevanceScore.bibcode == bibcode,
+                             PaperRelevanceScore.fulltext_mtime == fulltext_mtime,
+                             PaperRelevanceScore.target_entity == target_entity,
+                             PaperRelevanceScore.feature_type_entity == feature_type_entity)) \
+                .first()
+            if row:
+                return row.paper_relevance_score
+        return -1
+
+    def insert_paper_relevance_score(self, bibcode: str, fulltext_mtime: str, target_entity: str, feature_type_entity: str,
+                                     paper_relevance_score: float) -> bool:
+        """
+        insert the paper relevance score of a record for a target and feature type,
+        if the score has already been inserted, by another worker for example, it is left as is
+
+        :param bibcode: the bibcode of the record
+        :param fulltext_mtime: the fulltext modification timestamp of the record
+        :param target_entity: the target entity
+        :param feature_type_entity: the feature type entity
+        :param paper_relevance_score: the relevance score computed from the paper characteristics
+        :return: True if the insertion is successful, False otherwise
+        """
+        with self.session_scope() as session:
+            try:
+                record = PaperRelevanceScore(bibcode=bibcode,
+                                             fulltext_mtime=fulltext_mtime,
+                                             target_entity=target_entity,
+                                             feature_type_entity=feature_type_entity,
+                                             paper_relevance_score=paper_relevance_score)
+                session.execute(insert(PaperRelevanceScore)
+                                .values(bibcode=record.bibcode,
+                                        fulltext_mtime=record.fulltext_mtime,
+                                        target_entity=record.target_entity,
+                                        feature_type_entity=record.feature_type_entity,
+                                        paper_relevance_score=record.paper_relevance_score,
+                                        date=record.date)
+                                .on_conflict_do_nothing())
+                session.commit()
+                return True
+            except SQLAlchemyError as e:
+                session.rollback()
+                self.logger.error(f"Error occurred while inserting `PaperRelevanceScore` record for {bibcode}/{target_entity}/{feature_type_entity}: {str(e)}")
+                return False
+
+    def get_knowledge_graph_path_weights(self, feature_name_entity: str, feature_type_entity: str, target_entity: str,
+                                         named_entity_label: str) -> Tuple[int, Dict[str, float]]:
+        """
+        retrieve the path weights of the knowledge graph built from the most recent knowledge base records
+
+        :param feature_name_entity: the feature name entity to filter by
+        :param feature_type_entity: the feature type entity to filter by
+        :param target_entity: the target entity to filter by
+        :param named_entity_label: the named entity label to filter by
+        :return: a tuple of the most recent history ID, or -1 if there are no knowledge base records,
+                 and the path weights, or empty dictionary if the knowledge graph has not been saved
+        """
+        with self.session_scope() as session:
+            row = session.query(KnowledgeBaseHistory.id, KnowledgeGraphPathWeights.path_weights) \
+                .outerjoin(KnowledgeGraphPathWeights, KnowledgeGraphPathWeights.history_id == KnowledgeBaseHistory.id) \
+                .filter(and_(KnowledgeBaseHistory.feature_name_entity == feature_name_entity,
+                             KnowledgeBaseHistory.feature_type_entity == feature_type_entity,
+                             KnowledgeBaseHistory.target_entity == target_entity,
+                             KnowledgeBaseHistory.named_entity_label == named_entity_label)) \
+                .order_by(desc(KnowledgeBaseHistory.date)) \
+                .first()
+            if row:
+                return row.id, row.path_weights or {}
+        return -1, {}
+
+    def insert_knowledge_graph_path_weights(self, history_id: int, path_weights: Dict[str, float]) -> bool:
+        """
+        insert the path weights of the knowledge graph built from the knowledge base records of a history entry,
+        if they have already been inserted, by another worker for example, they are left as is
+
+        :param history_id: the ID of the history entry the knowledge graph was built from
+        :param path_weights: the average path weight between each keyword and the feature name
+        :return: True if the insertion is successful, False otherwise
+        """
+        with self.session_scope() as session:
+            try:
+                record = KnowledgeGraphPathWeights(history_id=history_id, path_weights=path_weights)
+                session.execute(insert(KnowledgeGraphPathWeights)
+                                .values(history_id=record.history_id,
+                                        path_weights=record.path_weights,
+                                        date=record.date)
+                                .on_conflict_do_nothing())
+                session.commit()
+                return True
+            except SQLAlchemyError as e:
+                session.rollback()
+                self.logger.error(f"Error occurred while inserting `KnowledgeGraphPathWeights` record for history id {history_id}: {str(e)}")
+                return False
+
+    def get_identify_watermark(self, feature_name_entity: str, feature_type_entity: str, target_entity: str) -> str:
+        """
+        retrieve the most recent fulltext modification timestamp of the records identified by the last successful
+        incremental run for a feature name
+
+        :param feature_name_entity: the feature name entity to filter by
+        :param feature_type_entity: the feature type entity to filter by
+        :param target_entity: the target entity to filter by
+        :return: the fulltext modification timestamp, or empty string if there has been no incremental run
+        """
+        with self.session_scope() as session:
+            row = session.query(IdentifyWatermark.fulltext_mtime) \
+                .filter(and_(IdentifyWatermark.feature_name_entity == feature_name_entity,
+                             IdentifyWatermark.feature_type_entity == feature_type_entity,
+                             IdentifyWatermark.target_entity == target_entity)) \
+                .first()
+            if row:
+                return row.fulltext_mtime
+        return ''
+
+    def get_identified_fulltexts(self, feature_name_entity: str, feature_type_entity: str, target_entity: str,
+                                 fulltext_mtime: str = '') -> Set[Tuple[str, str]]:
+        """
+        retrieve the versions of the fulltexts of the records identified by the incremental runs for a feature name
+
+        :param feature_name_entity: the feature name entity to filter by
+        :param feature_type_entity: the feature type entity to filter by
+        :param target_entity: the target entity to filter by
+        :param fulltext_mtime: only the fulltexts modified at or after this timestamp (optional)
+        :return: a set of tuples containing (bibcode, fulltext_mtime)
+        """
+        with self.session_scope() as session:
+            conditions = [IdentifiedFulltext.feature_name_entity == feature_name_entity,
+                          IdentifiedFulltext.feature_type_entity == feature_type_entity,
+                          IdentifiedFulltext.target_entity == target_entity]
+            if fulltext_mtime:
+                conditions.append(IdentifiedFulltext.fulltext_mtime >= fulltext_mtime)
+            rows = session.query(IdentifiedFulltext.bibcode, IdentifiedFulltext.fulltext_mtime) \
+                .filter(and_(*conditions)) \
+                .all()
+            return set((row.bibcode, row.fulltext_mtime) for row in rows)
+
+    def insert_identified_fulltexts(self, feature_name_entity: str, feature_type_entity: str, target_entity: str,
+                                    fulltexts: List[Tuple[str, str]], move_watermark: bool = True) -> bool:
+        """
+        record the versions of the fulltexts of the records identified by a successful incremental run for a feature name,
+        and move its watermark to the most recent of them, the watermark never moves back
+
+        :param feature_name_entity: the feature name entity
+        :param feature_type_entity: the feature type entity
+        :param target_entity: the target entity
+        :param fulltexts: a list of tuples containing (bibcode, fulltext_mtime) of the records identified
+        :param move_watermark: if False, only the fulltexts are recorded, ie, when some of the records of the run are left
+                               for a new task, and can be older than the ones identified
+        :return: True if the insertion is successful, False otherwise
+        """
+        fulltexts = [(bibcode, fulltext_mtime) for bibcode, fulltext_mtime in fulltexts if fulltext_mtime]
+        if not fulltexts:
+            return True
+
+        with self.session_scope() as session:
+            try:
+                records = [IdentifiedFulltext(feature_name_entity=feature_name_entity,
+                                              feature_type_entity=feature_type_entity,
+                                              target_entity=target_entity,
+                                              bibcode=bibcode,
+                                              fulltext_mtime=fulltext_mtime) for bibcode, fulltext_mtime in set(fulltexts)]
+                session.execute(insert(IdentifiedFulltext)
+                                .values([dict(feature_name_entity=record.feature_name_entity,
+                                              feature_type_entity=record.feature_type_entity,
+                                              target_entity=record.target_entity,
+                                              bibcode=record.bibcode,
+                                              fulltext_mtime=record.fulltext_mtime,
+                                              date=record.date) for record in records])
+                                .on_conflict_do_nothing())
+                if not move_watermark:
+                    session.commit()
+                    return True
+
+                watermark = IdentifyWatermark(feature_name_entity=feature_name_entity,
+                                              feature_type_entity=feature_type_entity,
+                                              target_entity=target_entity,
+                                              fulltext_mtime=max(fulltext_mtime for _, fulltext_mtime in fulltexts))
+                statement = insert(IdentifyWatermark).values(feature_name_entity=watermark.feature_name_entity,
+                                                             feature_type_entity=watermark.feature_type_entity,
+                                                             target_entity=watermark.target_entity,
+                                                             fulltext_mtime=watermark.fulltext_mtime,
+                                                             date=watermark.date)
+                session.execute(statement.on_conflict_do_update(
+                    index_elements=['feature_name_entity', 'feature_type_entity', 'target_entity'],
+                    set_=dict(fulltext_mtime=func.greatest(IdentifyWatermark.fulltext_mtime, statement.excluded.fulltext_mtime),
+                              date=statement.excluded.date)))
+                session.commit()
+                return True
+            except SQLAlchemyError as e:
+                session.rollback()
+                self.logger.error(f"Error occurred while inserting `IdentifiedFulltext` records for {feature_name_entity}/{feature_type_entity}/{target_entity}: {str(e)}")
+                return False
+
+    def get_identify_checkpoints(self, feature_name_entity: str, feature_type_entity: str, target_entity: str,
+                                 timestamp: str, date: datetime = None) -> Dict[str, Tuple[str, dict]]:
+        """
+        retrieve the records an identify task has processed before it was retried
+
+        :param feature_name_entity: the feature name entity to filter by
+        :param feature_type_entity: the feature type entity to filter by
+        :param target_entity: the target entity to filter by
+        :param timestamp: the timestamp of the task to filter by
+        :param date: only the records processed at or after this date (optional)
+        :return: a dict of bibcode to a tuple containing (fulltext_mtime, scored), scored is None if the record has no excerpts
+        """
+        with self.session_scope() as session:
+            conditions = [IdentifyCheckpoint.feature_name_entity == feature_name_entity,
+                          IdentifyCheckpoint.feature_type_entity == feature_type_entity,
+                          IdentifyCheckpoint.target_entity == target_entity,
+                          IdentifyCheckpoint.timestamp == timestamp]
+            if date:
+                conditions.append(IdentifyCheckpoint.date >= date)
+            rows = session.query(IdentifyCheckpoint.bibcode, IdentifyCheckpoint.fulltext_mtime, IdentifyCheckpoint.scored) \
+                .filter(and_(*conditions)) \
+                .all()
+            return {row.bibcode: (row.fulltext_mtime, row.scored) for row in rows}
+
+    def insert_identify_checkpoint(self, feature_name_entity: str, feature_type_entity: str, target_entity: str,
+                                   timestamp: str, bibcode: str, fulltext_mtime: str, scored: dict) -> bool:
+        """
+        insert the excerpts, keywords, and scores of a record an identify task has processed,
+        replacing the ones saved by an earlier attempt, if any
+
+        :param feature_name_entity: the feature name entity
+        :param feature_type_entity: the feature type entity
+        :param target_entity: the target entity
+        :param timestamp: the timestamp of the task
+        :param bibcode: the bibcode of the record
+        :param fulltext_mtime: the fulltext modification timestamp of the record
+        :param scored: the excerpts of the record with their keywords and scores, or None if it has no excerpts
+        :return: True if the insertion is successful, False otherwise
+        """
+        with self.session_scope() as session:
+            try:
+                record = IdentifyCheckpoint(feature_name_entity=feature_name_entity,
+                                            feature_type_entity=feature_type_entity,
+                                            target_entity=target_entity,
+                                            timestamp=timestamp,
+                                            bibcode=bibcode,
+                                            fulltext_mtime=fulltext_mtime,
+                                            scored=scored)
+                statement = insert(IdentifyCheckpoint).values(feature_name_entity=record.feature_name_entity,
+                                                              feature_type_entity=record.feature_type_entity,
+                                                              target_entity=record.target_entity,
+                                                              timestamp=record.timestamp,
+                                                              bibcode=record.bibcode,
+                                                              fulltext_mtime=record.fulltext_mtime,
+                                                              scored=record.scored,
+                                                              date=record.date)
+                session.execute(statement.on_conflict_do_update(
+                    index_elements=['feature_name_entity', 'feature_type_entity', 'target_entity', 'timestamp', 'bibcode'],
+                    set_=dict(fulltext_mtime=statement.excluded.fulltext_mtime,
+                              scored=statement.excluded.scored,
+                              date=statement.excluded.date)))
+                session.commit()
+                return True
+            except SQLAlchemyError as e:
+                session.rollback()
+                self.logger.error(f"Error occurred while inserting `IdentifyCheckpoint` record for {bibcode}/{feature_name_entity}/{feature_type_entity}/{target_entity}: {str(e)}")
+                return False
+
+    def remove_identify_checkpoints(self, feature_name_entity: str, feature_type_entity: str, target_entity: str,
+                                    timestamp: str) -> int:
+        """
+        remove the records an identify task has processed, once it is done
+
+        :param feature_name_entity: the feature name entity
+        :param feature_type_entity: the feature type entity
+        :param target_entity: the target entity
+        :param timestamp: the timestamp of the task
+        :return: the number of records removed, or -1 if there was an error
+        """
+        with self.session_scope() as session:
+            try:
+                count = self.delete_identify_checkpoints(session, feature_name_entity, feature_type_entity, target_entity, timestamp)
+                session.commit()
+                return count
+            except SQLAlchemyError as e:
+                session.rollback()
+                self.logger.error(f"Error occurred while removing `IdentifyCheckpoint` records for {feature_name_entity}/{feature_type_entity}/{target_entity}: {str(e)}")
+                return -1
+
+    def delete_identify_checkpoints(self, session, feature_name_entity: str, feature_type_entity: str, target_entity: str,
+                                    timestamp: str) -> int:
+        """
+        delete the records an identify task has processed, within the caller's transaction
+
+        :param session: the session of the transaction
+        :param feature_name_entity: the feature name entity
+        :param feature_type_entity: the feature type entity
+        :param target_entity: the target entity
+        :param timestamp: the timestamp of the task
+        :return: the number of records deleted
+        """
+        result = session.execute(delete(IdentifyCheckpoint)
+                                 .where(and_(IdentifyCheckpoint.feature_name_entity == feature_name_entity,
+                                             IdentifyCheckpoint.feature_type_entity == feature_type_entity,
+                                             IdentifyCheckpoint.target_entity == target_entity,
+                                             IdentifyCheckpoint.timestamp == timestamp)))
+        return result.rowcount
@@ -1,4 +1,5 @@
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Dict
 
 from adsplanetnamepipe.models import KnowledgeBase, KnowledgeBaseHistory
 from adsplanetnamepipe.utils.common import EntityArgs, Synonyms
@@ -8,6 +9,8 @@ from adsplanetnamepipe.utils.extract_keywords import ExtractKeywords
 from adsplanetnamepipe.utils.adsabs_ner import ADSabsNER
 from adsplanetnamepipe.utils.local_llm import LocalLLM
 from adsplanetnamepipe.utils.paper_relevance import PaperRelevance
+from adsplanetnamepipe.utils.collect_gates import CollectGates
+from adsplanetnamepipe.utils.end_to_end_context import EndToEndContext
 
 
 class CollectKnowldegeBase():
@@ -20,11 +23,12 @@ class CollectKnowldegeBase():
     language model processing to collect both positive and negative knowledge base entries
     """
 
-    def __init__(self, args: EntityArgs):
+    def __init__(self, args: EntityArgs, paper_relevance_store=None):
         """
         initialize the CollectKnowldegeBase class
 
         :param args: configuration arguments for the pipeline
+        :param paper_relevance_store: optional persistent store to share paper relevance scores across workers and runs
         """
         self.args = args
         # step 1 of the pipeline
@@ -36,9 +40,31 @@ class CollectKnowldegeBase():
         # step 4 of the pipeline
         self.extract_keywords = ExtractKeywords(args)
         # step 5b of the pipeline, only scoring the positive records
-        self.paper_relevance = PaperRelevance(args)
+        self.paper_relevance = PaperRelevance(args, paper_relevance_store)
         # step 5c of the pipeline, only scoring the positive records
         self.local_llm = LocalLLM(args)
+        # thresholds of the positive records, checked as soon as the scores are known
+        self.collect_gates = CollectGates()
+        # set by end_to_end, to share the excerpts and keywords with the other phase
+        self.end_to_end_context: EndToEndContext = None
+        self.vocabulary = Synonyms().add_synonyms([args.target,
+                                                   args.feature_type, args.feature_type_plural,
+                                                   args.feature_name])
+
+    def update_args(self, args: EntityArgs):
+        """
+        point the pipeline to another feature name of the same target and feature type, reusing its components
+
+        the components keep what they have setup for the target and feature type (ie, the compiled regexes),
+        and read the feature name from the args when they are called
+
+        :param args: configuration arguments for the pipeline, with the same target, feature type, and timestamp
+        :return:
+        """
+        self.args = args
+        for component in [self.search_retrieval, self.match_excerpt, self.adsabs_ner, self.extract_keywords,
+                          self.paper_relevance, self.local_llm]:
+            component.args = args
         self.vocabulary = Synonyms().add_synonyms([args.target,
                                                    args.feature_type, args.feature_type_plural,
                                                    args.feature_name])
@@ -50,13 +76,10 @@ class CollectKnowldegeBase():
         :param doc: dictionary containing document information
         :return: float representing the calculated paper relevance score
         """
-        text = ' '.join(doc.get('title', '')) + ' ' + doc.get('abstract', '') + ' ' + doc.get('body', '')
-        return self.paper_relevance.forward(
-            text,
-            bibstem=doc.get('bibcode', '')[4:9].strip('.'),
-            databases=', '.join(doc.get('database')),
+        return self.paper_relevance.forward_doc(
+            doc,
             astronomy_main_journals=self.search_retrieval.astronomy_journal_filter,
-            len_existing_wikidata=len(self.extract_keywords.wiki.extract_top_keywords(text))
+            re_wiki_vocab=self.extract_keywords.wiki.re_wiki_vocab
         )
 
     def get_local_llm_score(self, doc: dict, excerpt: str) -> float:
@@ -69,15 +92,53 @@ class CollectKnowldegeBase():
         """
         return self.local_llm.forward(doc['title'], doc.get('abstract', None), excerpt)
 
-    def collect_KB_positive(self) -> List[Tuple[KnowledgeBaseHistory, List[KnowledgeBase]]]:
+    def get_excerpts(self, doc: dict) -> Tuple[bool, List[str]]:
+        """
+        extract the excerpts of a given document, from the end_to_end context if set
+
+        :param doc: dictionary containing document information
+        :return: the output of MatchExcerpt.forward
+        """
+        if self.end_to_end_context:
+            return self.end_to_end_context.get_excerpts(self.match_excerpt, doc, self.adsabs_ner)
+        return self.match_excerpt.forward(doc, self.adsabs_ner)
+
+    def get_excerpt_keywords(self, excerpt: str) -> List[str]:
+        """
+        extract the keywords of a given excerpt, from the end_to_end context if set
+
+        :param excerpt: string containing the relevant excerpt from the document
+        :return: list of extracted keywords
+        """
+        if self.end_to_end_context:
+            return self.end_to_end_context.get_keywords(self.extract_keywords, excerpt, num_keywords=10)
+        return self.extract_keywords.forward(excerpt, num_keywords=10)
+
+    def get_special_keywords(self, excerpt: str) -> List[str]:
+        """
+        extract the special keywords of a given excerpt, from the end_to_end context if set
+
+        :param excerpt: string containing the relevant excerpt from the document
+        :return: list of extracted special keywords
+        """
+        if self.end_to_end_context:
+            return self.end_to_end_context.get_special_keywords(self.extract_keywords, excerpt)
+        return self.extract_keywords.forward_special(excerpt)
+
+    def collect_KB_positive(self, docs: List[Dict] = None, update_corpus: bool = True) -> List[Tuple[KnowledgeBaseHistory, List[KnowledgeBase]]]:
         """
         collect positive knowledge base entries from scientific literature
 
+        :param docs: optional list of solr documents already retrieved with collect_usgs_terms_query
+        :param update_corpus: if False, the docs have already been added to the corpus idf
         :return: list of tuples containing KnowledgeBaseHistory and associated KnowledgeBase records
         """
         collected: List[Tuple[KnowledgeBaseHistory, List[KnowledgeBase]]] = []
 
-        docs = self.search_retrieval.collect_usgs_terms_query()
+        if docs is None:
+            docs = self.search_retrieval.collect_usgs_terms_query()
+        if update_corpus:
+            self.extract_keywords.update_corpus(docs)
         if len(docs) > 0:
             # for each run, create a KnowledgeBaseHistory record and a list of associated KnowledgeBase records
             history_record = KnowledgeBaseHistory(
@@ -93,9 +154,12 @@ class CollectKnowldegeBase():
                 collected_doc: List[KnowledgeBase] = []
                 local_llm_scores_doc = []
 
-                _, excerpts = self.match_excerpt.forward(doc, self.adsabs_ner)
+                _, excerpts = self.get_excerpts(doc)
                 if excerpts:
+                    # the paper relevance score is the cheapest, if the doc cannot pass it, skip the rest
                     paper_relevance_score = self.get_paper_relevance_score(doc)
+                    if not self.collect_gates.check_paper_relevance(paper_relevance_score, len(excerpts)):
+                        continue
 
                     # before extracting keywords from each excerpt, extract keywords from the fulltext
                     # note that for this case we are not inserting anything for excerpt, and the item_id is 0
@@ -113,10 +177,13 @@ class CollectKnowldegeBase():
 
                     # now get keywords for each excerpt, count only if got them
                     item_id = 1
-                    for excerpt in excerpts:
-                        excerpt_keywords = self.extract_keywords.forward(excerpt, num_keywords=10)
+                    for j, excerpt in enumerate(excerpts):
+                        # stop once the excerpts left cannot get the doc to pass
+                        if not self.collect_gates.check_excerpts_left(len(collected_doc), local_llm_scores_doc, len(excerpts), len(excerpts) - j):
+                            break
+                        excerpt_keywords = self.get_excerpt_keywords(excerpt)
                         if excerpt_keywords:
-                            special_keywords = self.extract_keywords.forward_special(excerpt)
+                            special_keywords = self.get_special_keywords(excerpt)
                             # include this excerpt only if there are any STI-keywords identified
                             if special_keywords:
                                 collected_doc.append(KnowledgeBase(
@@ -132,28 +199,33 @@ class CollectKnowldegeBase():
                                 item_id += 1
 
                     # decide to add these records to the knowledge base or not
-                    if item_id > 1:
-                        avg_local_llm_scores = sum(local_llm_scores_doc) / len(local_llm_scores_doc)
-                        # include the record for knowledge graph if
-                        # 1- average of llm scores are high (experimented and 0.5 is a good threshold)
-                        # 2- paper relevance score is high (experimented and 0.6 is a good threshold)
-                        # 3- at least half and the original excerpts remains and
-                        #    was not eliminated by the two local llm and paper relevance scores
-                        if avg_local_llm_scores >= 0.5 and paper_relevance_score >= 0.6 and len(collected_doc) >= (len(excerpts) / 2):
-                            # Append the tuple of history_record and collected_doc to collected
-                            collected.append((history_record, collected_doc))
+                    # include the record for knowledge graph if
+                    # 1- average of llm scores are high (experimented and 0.5 is a good threshold)
+                    # 2- paper relevance score is high (experimented and 0.6 is a good threshold)
+                    # 3- at least half and the original excerpts remains and
+                    #    was not eliminated by the two local llm and paper relevance scores
+                    if self.collect_gates.check(paper_relevance_score, len(collected_doc), local_llm_scores_doc, len(excerpts)):
+                        # Append the tuple of history_record and collected_doc to collected
+                        collected.append((history_record, collected_doc))
+
+            self.collect_gates.log_stats(self.args.feature_name)
 
         return collected
 
-    def collect_KB_negative(self) -> List[Tuple[KnowledgeBaseHistory, List[KnowledgeBase]]]:
+    def collect_KB_negative(self, docs: List[Dict] = None, update_corpus: bool = True) -> List[Tuple[KnowledgeBaseHistory, List[KnowledgeBase]]]:
         """
         collect negative knowledge base entries from scientific literature
 
+        :param docs: optional list of solr documents already retrieved with collect_non_usgs_terms_query
+        :param update_corpus: if False, the docs have already been added to the corpus idf
         :return: list of tuples containing KnowledgeBaseHistory and associated KnowledgeBase records
         """
         collected: List[Tuple[KnowledgeBaseHistory, List[KnowledgeBase]]] = []
 
-        docs = self.search_retrieval.collect_non_usgs_terms_query()
+        if docs is None:
+            docs = self.search_retrieval.collect_non_usgs_terms_query()
+        if update_corpus:
+            self.extract_keywords.update_corpus(docs)
         if len(docs) > 0:
             history_record = KnowledgeBaseHistory(
                 id=None, # Set to None for now, will be updated later
@@ -164,21 +236,21 @@ class CollectKnowldegeBase():
             )
             knowledge_base_records: List[KnowledgeBase] = []
 
-            for doc in docs:
-                proceed, _ = self.match_excerpt.forward(doc, usgs_term=False)
-                if proceed:
-                    # for the negative side, only getting keywords from the fulltext, no excerpt extraction
-                    tfidf_keywords = self.extract_keywords.forward_doc(doc, self.vocabulary, usgs_term=False)
-                    if tfidf_keywords:
-                        knowledge_base_records.append(KnowledgeBase(
-                            history_id=None,  # Set to None for now, will be updated later
-                            bibcode=doc['bibcode'],
-                            database=doc['database'],
-                            excerpt=None,
-                            keywords_item_id=0,
-                            keywords=tfidf_keywords,
-                            special_keywords=[],
-                        ))
+            docs = [doc for doc in docs if self.match_excerpt.forward(doc, usgs_term=False)[0]]
+            # for the negative side, only getting keywords from the fulltext, no excerpt extraction,
+            # and since there can be hundreds of docs, get them for all the docs in one batch
+            docs_tfidf_keywords = self.extract_keywords.forward_docs(docs, self.vocabulary, usgs_term=False) if docs else []
+            for doc, tfidf_keywords in zip(docs, docs_tfidf_keywords):
+                if tfidf_keywords:
+                    knowledge_base_records.append(KnowledgeBase(
+                        history_id=None,  # Set to None for now, will be updated later
+                        bibcode=doc['bibcode'],
+                        database=doc['database'],
+                        excerpt=None,
+                        keywords_item_id=0,
+                        keywords=tfidf_keywords,
+                        special_keywords=[],
+                    ))
 
             if knowledge_base_records:
                 collected.append((history_record, knowledge_base_records))
@@ -189,8 +261,21 @@ class CollectKnowldegeBase():
         """
         collect both positive and negative knowledge base entries
 
+        the solr queries of the two sides run at the same time, the docs of both are then added to the corpus idf,
+        the positive first, so that the keywords of both sides are extracted with the same idf whatever the timing,
+        and the negative side is processed in the background while the positive side waits on the local llm and
+        the nasa concepts, the records are put together, the positive first, as when running them one after the other
+
         :return: combined list of tuples containing KnowledgeBaseHistory and associated KnowledgeBase records
         """
-        KB_positive = self.collect_KB_positive()
-        KB_negative = self.collect_KB_negative()
-        return KB_positive + KB_negative
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            docs_positive = executor.submit(self.search_retrieval.collect_usgs_terms_query)
+            docs_negative = executor.submit(self.search_retrieval.collect_non_usgs_terms_query)
+            docs_positive, docs_negative = docs_positive.result(), docs_negative.result()
+
+            self.extract_keywords.update_corpus(docs_positive)
+            self.extract_keywords.update_corpus(docs_negative)
+
+            KB_negative = executor.submit(self.collect_KB_negative, docs_negative, update_corpus=False)
+            KB_positive = self.collect_KB_positive(docs_positive, update_corpus=False)
+            return KB_positive + KB_negative.result()
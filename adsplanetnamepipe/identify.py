@@ -1,4 +1,5 @@
-from typing import List, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Dict
 
 from adsputils import load_config
 
@@ -9,14 +10,213 @@ from adsplanetnamepipe.models import NamedEntity, NamedEntityHistory
 from adsplanetnamepipe.utils.common import EntityArgs, Synonyms
 from adsplanetnamepipe.utils.search_retrieval import SearchRetrieval
 from adsplanetnamepipe.utils.match_excerpt import MatchExcerpt
-from adsplanetnamepipe.utils.extract_keywords import ExtractKeywords
+from adsplanetnamepipe.utils.extract_keywords import ExtractKeywords, NASAWrapper
 from adsplanetnamepipe.utils.adsabs_ner import ADSabsNER
 from adsplanetnamepipe.utils.local_llm import LocalLLM
 from adsplanetnamepipe.utils.paper_relevance import PaperRelevance
-from adsplanetnamepipe.utils.knowledge_graph import KnowledgeGraph
+from adsplanetnamepipe.utils.knowledge_graph import get_knowledge_graph_class
 from adsplanetnamepipe.utils.label_and_confidence import LabelAndConfidence
+from adsplanetnamepipe.utils.stage_pipeline import StagePipeline
+from adsplanetnamepipe.utils.end_to_end_context import EndToEndContext
+from adsplanetnamepipe.utils.task_checkpoint import TaskCheckpoint
+from adsplanetnamepipe.utils.task_budget import TaskBudget
 
-class IdentifyPlanetaryEntities():
+
+class IdentifyScoreStage(object):
+
+    """
+    a class that implements the remote steps of identify, the local llm scores and the special keywords of the excerpts,
+    setting up only the components these steps call, so that the workers of the score stage do not load the models
+    of the other steps
+    """
+
+    def __init__(self, args: EntityArgs):
+        """
+        initialize the IdentifyScoreStage class
+
+        :param args: configuration arguments for the pipeline
+        """
+        self.args = args
+        # step 5c of the pipeline
+        self.local_llm = LocalLLM(args)
+        self.nasa = NASAWrapper()
+
+    def update_args(self, args: EntityArgs):
+        """
+        point the stage to another feature name of the same target and feature type
+
+        :param args: configuration arguments for the pipeline, with the same target, feature type, and timestamp
+        :return:
+        """
+        self.args = args
+        self.local_llm.args = args
+
+    def get_local_llm_score(self, doc: dict, excerpt: str) -> float:
+        """
+        calculate the local LLM score for a given document and excerpt
+
+        :param doc: dictionary containing document information
+        :param excerpt: string containing the relevant excerpt from the document
+        :return: float representing the calculated local LLM score
+        """
+        return self.local_llm.forward(doc['title'], doc.get('abstract', None), excerpt)
+
+    def get_special_keywords(self, excerpt: str) -> List[str]:
+        """
+        extract the special keywords of a given excerpt
+
+        :param excerpt: string containing the relevant excerpt from the document
+        :return: list of extracted special keywords
+        """
+        return self.nasa.forward(excerpt)
+
+    def score_excerpts(self, extracted: List[Dict]) -> List[Dict]:
+        """
+        the remote steps of the pipeline, get the local llm score and the special keywords of each excerpt
+
+        :param extracted: list of dicts returned by extract_excerpts
+        :return: the same list, with local_llm_score and special_keywords added to each excerpt
+        """
+        for doc in extracted:
+            for excerpt in doc['excerpts']:
+                excerpt['local_llm_score'] = self.get_local_llm_score(doc, excerpt['excerpt'])
+                excerpt['special_keywords'] = self.get_special_keywords(excerpt['excerpt'])
+        return extracted
+
+
+class IdentifyLabelStage(object):
+
+    """
+    a class that implements the last step of identify, the knowledge graph scores, and the labels and confidences,
+    setting up only the components this step calls
+    """
+
+    def __init__(self, args: EntityArgs, keywords_positive: List[List['str']], keywords_negative: List[List['str']],
+                 path_weights_positive: Dict[str, float] = None, path_weights_negative: Dict[str, float] = None):
+        """
+        initialize the IdentifyLabelStage class
+
+        :param args: configuration arguments for the pipeline
+        :param keywords_positive: list of lists containing positive keywords
+        :param keywords_negative: list of lists containing negative keywords
+        :param path_weights_positive: optional path weights of the positive knowledge graph built earlier, used instead of keywords_positive
+        :param path_weights_negative: optional path weights of the negative knowledge graph built earlier, used instead of keywords_negative
+        """
+        self.args = args
+        # step 5a of the pipeline
+        knowledge_graph_class = get_knowledge_graph_class()
+        self.knowledge_graph_positive = knowledge_graph_class(args, keywords_positive, [], path_weights_positive)
+        self.knowledge_graph_negative = knowledge_graph_class(args, keywords_negative, [], path_weights_negative)
+        # step 6 of the pipeline
+        self.label_and_confidence = LabelAndConfidence(args)
+        self.score_format = '%.{}f'.format(config['PLANETARYNAMES_PIPELINE_FORMAT_SIGNIFICANT_DIGITS'])
+
+    def update_args(self, args: EntityArgs, keywords_positive: List[List['str']], keywords_negative: List[List['str']],
+                    path_weights_positive: Dict[str, float] = None, path_weights_negative: Dict[str, float] = None):
+        """
+        point the stage to another feature name of the same target and feature type, only the knowledge graphs are
+        built for the new feature name
+
+        :param args: configuration arguments for the pipeline, with the same target, feature type, and timestamp
+        :param keywords_positive: list of lists containing positive keywords
+        :param keywords_negative: list of lists containing negative keywords
+        :param path_weights_positive: optional path weights of the positive knowledge graph built earlier, used instead of keywords_positive
+        :param path_weights_negative: optional path weights of the negative knowledge graph built earlier, used instead of keywords_negative
+        :return:
+        """
+        self.args = args
+        self.label_and_confidence.args = args
+        knowledge_graph_class = get_knowledge_graph_class()
+        self.knowledge_graph_positive = knowledge_graph_class(args, keywords_positive, [], path_weights_positive)
+        self.knowledge_graph_negative = knowledge_graph_class(args, keywords_negative, [], path_weights_negative)
+
+    def get_knowledge_graph_score(self, keywords: List[List['str']]) -> float:
+        """
+        calculate the knowledge graph score based on positive and negative scores
+
+        :param keywords: list of lists containing keywords to evaluate
+        :return: float representing the calculated knowledge graph score
+        """
+        positive_score = self.knowledge_graph_positive.forward(keywords)
+        negative_score = self.knowledge_graph_negative.forward(keywords)
+        score = positive_score / (positive_score + negative_score)
+        return float(self.score_format % score)
+
+    def get_knowledge_graph_scores(self, keywords_list: List[List['str']]) -> List[float]:
+        """
+        calculate the knowledge graph scores for multiple lists of keywords, ie, all the excerpts of a document, at once
+
+        :param keywords_list: list of lists containing keywords to evaluate
+        :return: list of floats representing the calculated knowledge graph scores
+        """
+        positive_scores = self.knowledge_graph_positive.forward_many(keywords_list)
+        negative_scores = self.knowledge_graph_negative.forward_many(keywords_list)
+        return [float(self.score_format % (positive_score / (positive_score + negative_score)))
+                for positive_score, negative_score in zip(positive_scores, negative_scores)]
+
+    def label_excerpts(self, scored: List[Dict]) -> List[Tuple[NamedEntityHistory, List[NamedEntity]]]:
+        """
+        the last step of the pipeline, score the excerpts with the knowledge graphs, and get the label and confidence of each doc
+
+        :param scored: list of dicts returned by score_excerpts
+        :return: list of tuples containing NamedEntityHistory and associated NamedEntity records
+        """
+        identified: List[Tuple[NamedEntityHistory, List[NamedEntity]]] = []
+
+        if len(scored) > 0:
+            # for each run, create a NamedEntityHistory record and a list of associated NamedEntity records
+            history_record = NamedEntityHistory(
+                id=None, # Set to None for now, will be updated later
+                feature_name_entity=self.args.feature_name,
+                feature_type_entity=self.args.feature_type,
+                target_entity=self.args.target,
+            )
+            # the aggregated scores of each identified doc, in the order of identified
+            scores_list: List[Tuple[float, float, float]] = []
+            for doc in scored:
+                # for each doc list of NamedEntity records and the corresponding llm and knowledge graph scores
+                # identify the entity label and confidence score for the average of these scores
+                identified_docs: List[NamedEntity] = []
+                for item_id, excerpt in enumerate(doc['excerpts'], start=1):
+                    identified_docs.append(NamedEntity(
+                        history_id=None,  # Set to None for now, will be updated later
+                        bibcode=doc['bibcode'],
+                        database=doc['database'],
+                        excerpt=excerpt['excerpt'],
+                        keywords_item_id=item_id,
+                        keywords=excerpt['keywords'],
+                        special_keywords=excerpt['special_keywords'],
+                        knowledge_graph_score=None,   # Set to None for now, will be updated later
+                        paper_relevance_score=doc['paper_relevance_score'],
+                        local_llm_score=None,  # Set to None for now, will be updated later
+                        confidence_score=None,  # Set to None for now, will be updated later
+                        named_entity_label=None,  # Set to None for now, will be updated later
+                    ))
+                local_llm_scores_doc = [excerpt['local_llm_score'] for excerpt in doc['excerpts']]
+
+                # score the keywords of all the excerpts at once
+                knowledge_graph_scores_doc = self.get_knowledge_graph_scores([record.keywords for record in identified_docs])
+                avg_knowledge_graph_scores = float(self.score_format % (sum(knowledge_graph_scores_doc) / len(knowledge_graph_scores_doc)))
+                avg_local_llm_scores = float(self.score_format % (sum(local_llm_scores_doc) / len(local_llm_scores_doc)))
+                # update the knowledge graph score and local llm score to the aggregated ones
+                for record in identified_docs:
+                    record.knowledge_graph_score = avg_knowledge_graph_scores
+                    record.local_llm_score = avg_local_llm_scores
+                # queue for getting the label and confidence
+                identified.append((history_record, identified_docs))
+                scores_list.append((avg_knowledge_graph_scores, doc['paper_relevance_score'], avg_local_llm_scores))
+
+            # give the three scores of all the docs to the model at once and get back labels and confidences
+            # add newly acquired label/score to all the identified records of each doc
+            for (_, identified_docs), (label, score) in zip(identified, self.label_and_confidence.forward_many(scores_list)):
+                for record in identified_docs:
+                    record.named_entity_label = label
+                    record.confidence_score = score
+
+        return identified
+
+
+class IdentifyPlanetaryEntities(IdentifyScoreStage, IdentifyLabelStage):
 
     """
     a class that implements a pipeline for identifying planetary entities in scientific literature
@@ -24,15 +224,22 @@ class IdentifyPlanetaryEntities():
     this class integrates various components such as search retrieval, excerpt matching,
     named entity recognition, keyword extraction, knowledge graph analysis, paper relevance
     scoring, local language model processing, and entity labeling and confidence scoring
+
+    the remote steps and the last step are inherited from the stages, which the stage split tasks set up on their own
     """
 
-    def __init__(self, args: EntityArgs, keywords_positive: List[List['str']], keywords_negative: List[List['str']]):
+    def __init__(self, args: EntityArgs, keywords_positive: List[List['str']], keywords_negative: List[List['str']],
+                 paper_relevance_store=None, path_weights_positive: Dict[str, float] = None,
+                 path_weights_negative: Dict[str, float] = None):
         """
         initialize the IdentifyPlanetaryEntities class
 
         :param args: configuration arguments for the pipeline
         :param keywords_positive: list of lists containing positive keywords
         :param keywords_negative: list of lists containing negative keywords
+        :param paper_relevance_store: optional persistent store to share paper relevance scores across workers and runs
+        :param path_weights_positive: optional path weights of the positive knowledge graph built earlier, used instead of keywords_positive
+        :param path_weights_negative: optional path weights of the negative knowledge graph built earlier, used instead of keywords_negative
         """
         self.args = args
         # step 1 of the pipeline
@@ -44,30 +251,51 @@ class IdentifyPlanetaryEntities():
         # step 4 of the pipeline
         self.extract_keywords = ExtractKeywords(args)
         # step 5a of the pipeline
-        self.knowledge_graph_positive = KnowledgeGraph(args, keywords_positive,[])
-        self.knowledge_graph_negative = KnowledgeGraph(args, keywords_negative,[])
+        knowledge_graph_class = get_knowledge_graph_class()
+        self.knowledge_graph_positive = knowledge_graph_class(args, keywords_positive, [], path_weights_positive)
+        self.knowledge_graph_negative = knowledge_graph_class(args, keywords_negative, [], path_weights_negative)
         # step 5b of the pipeline
-        self.paper_relevance = PaperRelevance(args)
+        self.paper_relevance = PaperRelevance(args, paper_relevance_store)
         # step 5c of the pipeline
         self.local_llm = LocalLLM(args)
         # step 6 of the pipeline
         self.label_and_confidence = LabelAndConfidence(args)
+        # set by end_to_end, to share the excerpts and keywords with the other phase
+        self.end_to_end_context: EndToEndContext = None
+        # set by the tasks, to save each doc once scored and resume from them when retried
+        self.checkpoint: TaskCheckpoint = None
+        # set by the tasks, to stop taking new docs once the budget of the task is spent
+        self.budget: TaskBudget = None
         self.vocabulary = Synonyms().add_synonyms([args.target,
                                                    args.feature_type, args.feature_type_plural,
                                                    args.feature_name])
         self.score_format = '%.{}f'.format(config['PLANETARYNAMES_PIPELINE_FORMAT_SIGNIFICANT_DIGITS'])
 
-    def get_knowledge_graph_score(self, keywords: List[List['str']]) -> float:
+    def update_args(self, args: EntityArgs, keywords_positive: List[List['str']], keywords_negative: List[List['str']],
+                    path_weights_positive: Dict[str, float] = None, path_weights_negative: Dict[str, float] = None):
         """
-        calculate the knowledge graph score based on positive and negative scores
+        point the pipeline to another feature name of the same target and feature type, reusing its components
 
-        :param keywords: list of lists containing keywords to evaluate
-        :return: float representing the calculated knowledge graph score
+        the components keep what they have setup for the target and feature type (ie, the compiled regexes, the models),
+        and read the feature name from the args when they are called, only the knowledge graphs are built for the new feature name
+
+        :param args: configuration arguments for the pipeline, with the same target, feature type, and timestamp
+        :param keywords_positive: list of lists containing positive keywords
+        :param keywords_negative: list of lists containing negative keywords
+        :param path_weights_positive: optional path weights of the positive knowledge graph built earlier, used instead of keywords_positive
+        :param path_weights_negative: optional path weights of the negative knowledge graph built earlier, used instead of keywords_negative
+        :return:
         """
-        positive_score = self.knowledge_graph_positive.forward(keywords)
-        negative_score = self.knowledge_graph_negative.forward(keywords)
-        score = positive_score / (positive_score + negative_score)
-        return float(self.score_format % score)
+        self.args = args
+        for component in [self.search_retrieval, self.match_excerpt, self.adsabs_ner, self.extract_keywords,
+                          self.paper_relevance, self.local_llm, self.label_and_confidence]:
+            component.args = args
+        knowledge_graph_class = get_knowledge_graph_class()
+        self.knowledge_graph_positive = knowledge_graph_class(args, keywords_positive, [], path_weights_positive)
+        self.knowledge_graph_negative = knowledge_graph_class(args, keywords_negative, [], path_weights_negative)
+        self.vocabulary = Synonyms().add_synonyms([args.target,
+                                                   args.feature_type, args.feature_type_plural,
+                                                   args.feature_name])
 
     def get_paper_relevance_score(self, doc: dict) -> float:
         """
@@ -76,96 +304,160 @@ class IdentifyPlanetaryEntities():
         :param doc: dictionary containing document information
         :return: float representing the calculated paper relevance score
         """
-        text = ' '.join(doc.get('title', '')) + ' ' + doc.get('abstract', '') + ' ' + doc.get('body', '')
-        score = self.paper_relevance.forward(
-            text,
-            bibstem=doc.get('bibcode', '')[4:9].strip('.'),
-            databases=', '.join(doc.get('database')),
+        score = self.paper_relevance.forward_doc(
+            doc,
             astronomy_main_journals=self.search_retrieval.astronomy_journal_filter,
-            len_existing_wikidata=len(self.extract_keywords.wiki.extract_top_keywords(text))
+            re_wiki_vocab=self.extract_keywords.wiki.re_wiki_vocab
         )
         return float(self.score_format % score)
 
-    def get_local_llm_score(self, doc: dict, excerpt: str) -> float:
+    def get_excerpts(self, doc: dict) -> Tuple[bool, List[str]]:
         """
-        calculate the local LLM score for a given document and excerpt
+        extract the excerpts of a given document, from the end_to_end context if set
 
         :param doc: dictionary containing document information
+        :return: the output of MatchExcerpt.forward
+        """
+        if self.end_to_end_context:
+            return self.end_to_end_context.get_excerpts(self.match_excerpt, doc, self.adsabs_ner)
+        return self.match_excerpt.forward(doc, self.adsabs_ner)
+
+    def get_excerpt_keywords(self, excerpt: str) -> List[str]:
+        """
+        extract the keywords of a given excerpt, from the end_to_end context if set
+
         :param excerpt: string containing the relevant excerpt from the document
-        :return: float representing the calculated local LLM score
+        :return: list of extracted keywords
         """
-        return self.local_llm.forward(doc['title'], doc.get('abstract', None), excerpt)
+        if self.end_to_end_context:
+            return self.end_to_end_context.get_keywords(self.extract_keywords, excerpt, num_keywords=10)
+        return self.extract_keywords.forward(excerpt, num_keywords=10)
+
+    def get_special_keywords(self, excerpt: str) -> List[str]:
+        """
+        extract the special keywords of a given excerpt, from the end_to_end context if set
+
+        :param excerpt: string containing the relevant excerpt from the document
+        :return: list of extracted special keywords
+        """
+        if self.end_to_end_context:
+            return self.end_to_end_context.get_special_keywords(self.extract_keywords, excerpt)
+        return self.extract_keywords.forward_special(excerpt)
 
-    def identify(self) -> List[Tuple[NamedEntityHistory, List[NamedEntity]]]:
+    def identify(self, docs: List[Dict] = None) -> List[Tuple[NamedEntityHistory, List[NamedEntity]]]:
         """
         identify planetary entities using the pipeline
 
+        :param docs: optional list of solr documents already retrieved with identify_terms_query
         :return: list of tuples containing NamedEntityHistory and associated NamedEntity records
         """
-        identified: List[Tuple[NamedEntityHistory, List[NamedEntity]]] = []
+        if docs is None:
+            docs = self.search_retrieval.identify_terms_query()
+        if self.checkpoint or self.budget:
+            return self.label_excerpts(self.resume_and_score_excerpts(docs))
+        if config.get('PLANETARYNAMES_PIPELINE_IDENTIFY_THREADS', 0) > 0:
+            return self.label_excerpts(self.extract_and_score_excerpts(docs))
+        return self.label_excerpts(self.score_excerpts(self.extract_excerpts(docs)))
 
-        docs = self.search_retrieval.identify_terms_query()
-        if len(docs) > 0:
-            # for each run, create a NamedEntityHistory record and a list of associated NamedEntity records
-            history_record = NamedEntityHistory(
-                id=None, # Set to None for now, will be updated later
-                feature_name_entity=self.args.feature_name,
-                feature_type_entity=self.args.feature_type,
-                target_entity=self.args.target,
-            )
-            for i, doc in enumerate(docs):
-                # for each doc temp list of NamedEntity records and the corresponding llm and knowledge graph scores
-                # identify the entity label and confidence score for the average of these scores
-                identified_docs: List[NamedEntity] = []
-                local_llm_scores_doc = []
-                knowledge_graph_scores_doc = []
-
-                _, excerpts = self.match_excerpt.forward(doc, self.adsabs_ner)
-                if excerpts:
-                    paper_relevance_score = self.get_paper_relevance_score(doc)
-
-                    # process each excerpt
-                    item_id = 1
-                    for excerpt in excerpts:
-                        excerpt_keywords = self.extract_keywords.forward(excerpt, num_keywords=10)
-                        if excerpt_keywords:
-                            knowledge_graph_score = self.get_knowledge_graph_score(excerpt_keywords)
-                            local_llm_score = self.get_local_llm_score(doc, excerpt)
-                            identified_docs.append(NamedEntity(
-                                history_id=None,  # Set to None for now, will be updated later
-                                bibcode=doc['bibcode'],
-                                database=doc['database'],
-                                excerpt=excerpt,
-                                keywords_item_id=item_id,
-                                keywords=excerpt_keywords,
-                                special_keywords=self.extract_keywords.forward_special(excerpt),
-                                knowledge_graph_score=None,   # Set to None for now, will be updated later
-                                paper_relevance_score=paper_relevance_score,
-                                local_llm_score=None,  # Set to None for now, will be updated later
-                                confidence_score=None,  # Set to None for now, will be updated later
-                                named_entity_label=None,  # Set to None for now, will be updated later
-                            ))
-                            knowledge_graph_scores_doc.append(knowledge_graph_score)
-                            local_llm_scores_doc.append(local_llm_score)
-                            item_id += 1
-
-                    # get the confidence score and named entity label, update the records,
-                    # and add them to the named entity
-                    if item_id > 1:
-                        avg_knowledge_graph_scores = float(self.score_format % (sum(knowledge_graph_scores_doc) / len(knowledge_graph_scores_doc)))
-                        avg_local_llm_scores = float(self.score_format % (sum(local_llm_scores_doc) / len(local_llm_scores_doc)))
-                        # give the three scores to the keras model and get back label and confidence
-                        label, score = self.label_and_confidence.forward(avg_knowledge_graph_scores,
-                                                                         paper_relevance_score,
-                                                                         avg_local_llm_scores)
-                        # add newly acquired label/score to all the identified records
-                        # also update the knowledge graph score and local llm score to the aggregated ones
-                        for doc in identified_docs:
-                            doc.named_entity_label = label
-                            doc.confidence_score = score
-                            doc.knowledge_graph_score = avg_knowledge_graph_scores
-                            doc.local_llm_score = avg_local_llm_scores
-                        # queue for getting saved to db
-                        identified.append((history_record, identified_docs))
+    def resume_and_score_excerpts(self, docs: List[Dict]) -> List[Dict]:
+        """
+        same as score_excerpts(extract_excerpts(docs)), taking the docs processed by an earlier attempt of the task
+        from the checkpoint, if set, and processing the rest one doc at a time, so that each is saved to the checkpoint
+        once scored, and no new doc is taken once the budget, if set, is spent, the docs not taken are left in the budget
 
-        return identified
+        :param docs: list of solr documents
+        :return: list of dicts for the docs with any excerpts, in the order of the docs, as returned by score_excerpts
+        """
+        resumed = self.checkpoint.load(docs) if self.checkpoint else {}
+        docs_left = [doc for doc in docs if doc['bibcode'] not in resumed]
+        if self.budget:
+            docs_left = self.budget.take(docs_left)
+
+        if config.get('PLANETARYNAMES_PIPELINE_IDENTIFY_THREADS', 0) > 0:
+            scored = self.extract_and_score_excerpts(docs_left)
+        else:
+            scored = [self.score_doc_excerpts((doc, self.extract_doc_excerpts(doc))) for doc in docs_left]
+        scored = {doc['bibcode']: doc for doc in scored if doc}
+
+        return [doc for doc in (resumed.get(doc['bibcode']) or scored.get(doc['bibcode']) for doc in docs) if doc]
+
+    def extract_and_score_excerpts(self, docs: List[Dict]) -> List[Dict]:
+        """
+        same as score_excerpts(extract_excerpts(docs)), with the docs going through the steps as a stage pipeline,
+        so that the remote steps of a doc, in a pool of threads, overlap the local steps of the next docs, in one thread,
+        the local steps share the models and the end_to_end context of the pipeline, so they are not run in other processes
+
+        :param docs: list of solr documents
+        :return: list of dicts for the docs with any excerpts, in the order of the docs, as returned by score_excerpts
+        """
+        num_threads = config.get('PLANETARYNAMES_PIPELINE_IDENTIFY_THREADS', 0)
+
+        local_executor = ThreadPoolExecutor(max_workers=1)
+        remote_executor = ThreadPoolExecutor(max_workers=num_threads)
+        with local_executor, remote_executor:
+            scored = StagePipeline([(lambda doc: (doc, self.extract_doc_excerpts(doc)), local_executor),
+                                    (self.score_doc_excerpts, remote_executor)]).map(docs)
+        return [doc for doc in scored if doc]
+
+    def score_doc_excerpts(self, doc_excerpts: Tuple[Dict, List[Dict]]) -> Dict:
+        """
+        score the paper and the excerpts of a doc, the second stage of extract_and_score_excerpts
+
+        :param doc_excerpts: tuple of the solr document and the list of dicts returned by extract_doc_excerpts
+        :return: dict for the doc, as returned by score_excerpts, or None if the doc has no excerpts,
+                 saved to the checkpoint, if set
+        """
+        doc, excerpts_keywords = doc_excerpts
+        scored = self.score_excerpts([self.get_extracted_doc(doc, excerpts_keywords)])[0] if excerpts_keywords else None
+        if self.checkpoint:
+            self.checkpoint.save(doc, scored)
+        return scored
+
+    def extract_excerpts(self, docs: List[Dict]) -> List[Dict]:
+        """
+        the local steps of the pipeline, extract the excerpts of the docs and their keywords, and score the papers
+
+        :param docs: list of solr documents
+        :return: list of dicts for the docs with any excerpts, containing bibcode, database, title, abstract,
+                 paper_relevance_score, and excerpts, a list of dicts with excerpt and keywords
+        """
+        extracted = []
+        for doc in docs:
+            excerpts_keywords = self.extract_doc_excerpts(doc)
+            if excerpts_keywords:
+                extracted.append(self.get_extracted_doc(doc, excerpts_keywords))
+        return extracted
+
+    def extract_doc_excerpts(self, doc: Dict) -> List[Dict]:
+        """
+        extract the excerpts of a doc and their keywords
+
+        :param doc: solr document
+        :return: list of dicts with excerpt and keywords, only for the excerpts that got keywords
+        """
+        _, excerpts = self.get_excerpts(doc)
+
+        # process each excerpt, keep it only if got keywords
+        excerpts_keywords = []
+        for excerpt in excerpts:
+            excerpt_keywords = self.get_excerpt_keywords(excerpt)
+            if excerpt_keywords:
+                excerpts_keywords.append({'excerpt': excerpt, 'keywords': excerpt_keywords})
+        return excerpts_keywords
+
+    def get_extracted_doc(self, doc: Dict, excerpts_keywords: List[Dict]) -> Dict:
+        """
+        score the paper and put it together with its excerpts
+
+        :param doc: solr document
+        :param excerpts_keywords: list of dicts returned by extract_doc_excerpts
+        :return: dict containing bibcode, database, title, abstract, paper_relevance_score, and excerpts
+        """
+        return {
+            'bibcode': doc['bibcode'],
+            'database': doc['database'],
+            'title': doc['title'],
+            'abstract': doc.get('abstract', None),
+            'paper_relevance_score': self.get_paper_relevance_score(doc),
+            'excerpts': excerpts_keywords,
+        }
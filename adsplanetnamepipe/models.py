@@ -6,7 +6,7 @@ from datetime import datetime, timezone
 from typing import Tuple
 
 from sqlalchemy import Integer, String, Column, ForeignKey, DateTime, Float, ForeignKeyConstraint
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -569,4 +569,230 @@ class NamedEntity(Base):
         self.paper_relevance_score = paper_relevance_score
         self.local_llm_score = local_llm_score
         self.confidence_score = confidence_score
-        self.named_entity_label = named_entity_label
\ No newline at end of file
+        self.named_entity_label = named_entity_label
+
+
+class PaperRelevanceScore(Base):
+    """
+    this table holds the paper relevance scores computed for a record, for a target and feature type,
+    since the score does not depend on the feature name it is computed once and reused for all the feature names
+    the record is retrieved for, as long as the fulltext of the record has not changed
+    """
+    __tablename__ = 'paper_relevance_score'
+    __table_args__ = (ForeignKeyConstraint(
+        ['feature_type_entity', 'target_entity'], ['feature_type.entity', 'feature_type.target_entity']
+    ),)
+
+    # the bibcode of the record, serving as part of the primary key
+    bibcode = Column(String(19), primary_key=True)
+    # the fulltext modification timestamp of the record as returned by solr, serving as part of the primary key
+    fulltext_mtime = Column(String(32), primary_key=True)
+    # the target entity, serving as part of the primary key
+    target_entity = Column(String(32), primary_key=True)
+    # the type of the feature, serving as part of the primary key
+    feature_type_entity = Column(String(32), primary_key=True)
+    # the relevance score computed from the paper characteristics
+    paper_relevance_score = Column(Float, nullable=False)
+    # the date and time the score was computed
+    date = Column(DateTime(timezone=True), nullable=False)
+
+    def __init__(self, bibcode: str, fulltext_mtime: str, target_entity: str, feature_type_entity: str,
+                 paper_relevance_score: float, date: datetime = None):
+        """
+        initialize a new PaperRelevanceScore instance
+
+        :param bibcode: the bibcode of the record
+        :param fulltext_mtime: the fulltext modification timestamp of the record
+        :param target_entity: the target entity
+        :param feature_type_entity: the type of the feature
+        :param paper_relevance_score: the relevance score computed from the paper characteristics
+        :param date: the date and time the score was computed, defaults to the current UTC time if not provided
+        """
+        self.bibcode = bibcode
+        self.fulltext_mtime = fulltext_mtime
+        self.target_entity = target_entity
+        self.feature_type_entity = feature_type_entity
+        self.paper_relevance_score = paper_relevance_score
+        if not date:
+            self.date = datetime.now(timezone.utc)
+        else:
+            self.date = date
+
+
+class KnowledgeGraphPathWeights(Base):
+    """
+    this table holds the path weights of the knowledge graph built from the knowledge base records of a history entry,
+    so that the graph is not rebuilt for every identify task, the record is removed whenever the knowledge base records
+    of the history entry are modified
+    """
+    __tablename__ = 'knowledge_graph_path_weights'
+    __table_args__ = (ForeignKeyConstraint(
+        ['history_id'], ['knowledge_base_history.id']
+    ),)
+
+    # the ID of the history entry the knowledge graph was built from, serving as the primary key
+    history_id = Column(Integer, ForeignKey('knowledge_base_history.id'), primary_key=True)
+    # the average path weight between each keyword and the feature name in the knowledge graph
+    path_weights = Column(JSONB, nullable=False)
+    # the date and time the knowledge graph was built
+    date = Column(DateTime(timezone=True), nullable=False)
+
+    def __init__(self, history_id: int, path_weights: dict, date: datetime = None):
+        """
+        initialize a new KnowledgeGraphPathWeights instance
+
+        :param history_id: the ID of the history entry the knowledge graph was built from
+        :param path_weights: the average path weight between each keyword and the feature name
+        :param date: the date and time the knowledge graph was built, defaults to the current UTC time if not provided
+        """
+        self.history_id = history_id
+        self.path_weights = path_weights
+        if not date:
+            self.date = datetime.now(timezone.utc)
+        else:
+            self.date = date
+
+
+class IdentifyWatermark(Base):
+    """
+    this table holds, for each feature name, the most recent fulltext modification timestamp of the records identified
+    by the last successful incremental run, the next run only queries the records modified since
+    """
+    __tablename__ = 'identify_watermark'
+    __table_args__ = (ForeignKeyConstraint(
+        ['feature_name_entity', 'feature_type_entity', 'target_entity'],
+        ['feature_name.entity', 'feature_name.feature_type_entity', 'feature_name.target_entity']
+    ),)
+
+    # the name of the feature, serving as part of the primary key
+    feature_name_entity = Column(String(32), primary_key=True)
+    # the type of the feature, serving as part of the primary key
+    feature_type_entity = Column(String(32), primary_key=True)
+    # the target entity, serving as part of the primary key
+    target_entity = Column(String(32), primary_key=True)
+    # the most recent fulltext modification timestamp of the records identified, as returned by solr
+    fulltext_mtime = Column(String(32), nullable=False)
+    # the date and time of the last successful run
+    date = Column(DateTime(timezone=True), nullable=False)
+
+    def __init__(self, feature_name_entity: str, feature_type_entity: str, target_entity: str, fulltext_mtime: str,
+                 date: datetime = None):
+        """
+        initialize a new IdentifyWatermark instance
+
+        :param feature_name_entity: the name of the feature
+        :param feature_type_entity: the type of the feature
+        :param target_entity: the target entity
+        :param fulltext_mtime: the most recent fulltext modification timestamp of the records identified
+        :param date: the date and time of the run, defaults to the current UTC time if not provided
+        """
+        self.feature_name_entity = feature_name_entity
+        self.feature_type_entity = feature_type_entity
+        self.target_entity = target_entity
+        self.fulltext_mtime = fulltext_mtime
+        if not date:
+            self.date = datetime.now(timezone.utc)
+        else:
+            self.date = date
+
+
+class IdentifiedFulltext(Base):
+    """
+    this table holds the version of the fulltext of each record identified by the incremental runs, for each feature name,
+    so that a record is identified again only if its fulltext has changed
+    """
+    __tablename__ = 'identified_fulltext'
+    __table_args__ = (ForeignKeyConstraint(
+        ['feature_name_entity', 'feature_type_entity', 'target_entity'],
+        ['feature_name.entity', 'feature_name.feature_type_entity', 'feature_name.target_entity']
+    ),)
+
+    # the name of the feature, serving as part of the primary key
+    feature_name_entity = Column(String(32), primary_key=True)
+    # the type of the feature, serving as part of the primary key
+    feature_type_entity = Column(String(32), primary_key=True)
+    # the target entity, serving as part of the primary key
+    target_entity = Column(String(32), primary_key=True)
+    # the bibcode of the record, serving as part of the primary key
+    bibcode = Column(String(19), primary_key=True)
+    # the fulltext modification timestamp of the record as returned by solr, serving as part of the primary key
+    fulltext_mtime = Column(String(32), primary_key=True)
+    # the date and time the record was identified
+    date = Column(DateTime(timezone=True), nullable=False)
+
+    def __init__(self, feature_name_entity: str, feature_type_entity: str, target_entity: str, bibcode: str,
+                 fulltext_mtime: str, date: datetime = None):
+        """
+        initialize a new IdentifiedFulltext instance
+
+        :param feature_name_entity: the name of the feature
+        :param feature_type_entity: the type of the feature
+        :param target_entity: the target entity
+        :param bibcode: the bibcode of the record
+        :param fulltext_mtime: the fulltext modification timestamp of the record
+        :param date: the date and time the record was identified, defaults to the current UTC time if not provided
+        """
+        self.feature_name_entity = feature_name_entity
+        self.feature_type_entity = feature_type_entity
+        self.target_entity = target_entity
+        self.bibcode = bibcode
+        self.fulltext_mtime = fulltext_mtime
+        if not date:
+            self.date = datetime.now(timezone.utc)
+        else:
+            self.date = date
+
+
+class IdentifyCheckpoint(Base):
+    """
+    this table holds the excerpts, keywords, and scores of each record an identify task has processed so far,
+    so that when the task is retried it resumes where it stopped, the records are removed once the task is done
+    """
+    __tablename__ = 'identify_checkpoint'
+    __table_args__ = (ForeignKeyConstraint(
+        ['feature_name_entity', 'feature_type_entity', 'target_entity'],
+        ['feature_name.entity', 'feature_name.feature_type_entity', 'feature_name.target_entity']
+    ),)
+
+    # the name of the feature, serving as part of the primary key
+    feature_name_entity = Column(String(32), primary_key=True)
+    # the type of the feature, serving as part of the primary key
+    feature_type_entity = Column(String(32), primary_key=True)
+    # the target entity, serving as part of the primary key
+    target_entity = Column(String(32), primary_key=True)
+    # the timestamp of the task, serving as part of the primary key
+    timestamp = Column(String(32), primary_key=True)
+    # the bibcode of the record, serving as part of the primary key
+    bibcode = Column(String(19), primary_key=True)
+    # the fulltext modification timestamp of the record as returned by solr, empty if not returned
+    fulltext_mtime = Column(String(32), nullable=False)
+    # the excerpts of the record with their keywords and scores, null if the record has no excerpts to identify
+    scored = Column(JSONB, nullable=True)
+    # the date and time the record was processed
+    date = Column(DateTime(timezone=True), nullable=False)
+
+    def __init__(self, feature_name_entity: str, feature_type_entity: str, target_entity: str, timestamp: str,
+                 bibcode: str, fulltext_mtime: str, scored: dict, date: datetime = None):
+        """
+        initialize a new IdentifyCheckpoint instance
+
+        :param feature_name_entity: the name of the feature
+        :param feature_type_entity: the type of the feature
+        :param target_entity: the target entity
+        :param timestamp: the timestamp of the task
+        :param bibcode: the bibcode of the record
+        :param fulltext_mtime: the fulltext modification timestamp of the record
+        :param scored: the excerpts of the record with their keywords and scores, or None
+        :param date: the date and time the record was processed, defaults to the current UTC time if not provided
+        """
+        self.feature_name_entity = feature_name_entity
+        self.feature_type_entity = feature_type_entity
+        self.target_entity = target_entity
+        self.timestamp = timestamp
+        self.bibcode = bibcode
+        self.fulltext_mtime = fulltext_mtime
+        self.scored = scored
+        if not date:
+            self.date = datetime.now(timezone.utc)
+        else:
+            self.date = date
@@ -2,10 +2,20 @@ from adsplanetnamepipe import app as app_module
 from kombu import Queue
 
 import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
 
 from adsplanetnamepipe.utils.common import PLANETARYNAMES_PIPELINE_ACTION, EntityArgs
+from adsplanetnamepipe.models import NamedEntity, NamedEntityHistory
+from adsplanetnamepipe.utils.knowledge_graph import get_knowledge_graph_class
+from adsplanetnamepipe.utils.pipeline_cache import PipelineCache
+from adsplanetnamepipe.utils.search_retrieval import SearchRetrieval
+from adsplanetnamepipe.utils.end_to_end_context import EndToEndContext
+from adsplanetnamepipe.utils.task_checkpoint import TaskCheckpoint
+from adsplanetnamepipe.utils.task_budget import TaskBudget
 from adsplanetnamepipe.collect import CollectKnowldegeBase
-from adsplanetnamepipe.identify import IdentifyPlanetaryEntities
+from adsplanetnamepipe.identify import IdentifyPlanetaryEntities, IdentifyScoreStage, IdentifyLabelStage
 
 from adsputils import load_config
 
@@ -17,10 +27,19 @@ app = app_module.ADSPlanetaryNamesPipelineCelery('planetary-names-pipeline',
 
 app.conf.CELERY_QUEUES = (
     Queue('task_process_planetary_nomenclature', app.exchange, routing_key='task_process_planetary_nomenclature'),
+    Queue('task_process_planetary_nomenclature_batch', app.exchange, routing_key='task_process_planetary_nomenclature_batch'),
+    # the stages of identify, each on its own queue, so that the workers of each can be scaled independently
+    Queue('task_identify_retrieve', app.exchange, routing_key='task_identify_retrieve'),
+    Queue('task_identify_extract', app.exchange, routing_key='task_identify_extract'),
+    Queue('task_identify_score', app.exchange, routing_key='task_identify_score'),
+    Queue('task_identify_label', app.exchange, routing_key='task_identify_label'),
 )
 
 logger = app.logger
 
+# pipelines setup earlier in this worker, reused for the feature names of the same target and feature type
+pipeline_cache = PipelineCache()
+
 
 class FailedRequest(Exception):
     """
@@ -29,6 +48,315 @@ class FailedRequest(Exception):
     pass
 
 
+def get_knowledge_graph_path_weights(entity_args: EntityArgs, named_entity_label: str) -> Dict[str, float]:
+    """
+    get the path weights of the knowledge graph built from the most recent knowledge base records,
+    if they have not been saved, build the graph and save them
+
+    :param entity_args: EntityArgs object containing task arguments
+    :param named_entity_label: the named entity label of the knowledge base records
+    :return: the average path weight between each keyword and the feature name, empty if there are no records
+    """
+    history_id, path_weights = app.get_knowledge_graph_path_weights(entity_args.feature_name,
+                                                                    entity_args.feature_type,
+                                                                    entity_args.target,
+                                                                    named_entity_label)
+    if path_weights or history_id == -1:
+        return path_weights
+
+    keywords = app.get_knowledge_base_keywords(entity_args.feature_name,
+                                               entity_args.feature_type,
+                                               entity_args.target,
+                                               named_entity_label)
+    path_weights = get_knowledge_graph_class()(entity_args, keywords, []).path_weights
+    if path_weights:
+        app.insert_knowledge_graph_path_weights(history_id, path_weights)
+    return path_weights
+
+
+def get_knowledge_graph_inputs(entity_args: EntityArgs) -> Tuple[List[List[str]], List[List[str]], Dict[str, float], Dict[str, float]]:
+    """
+    get what the positive and negative knowledge graphs of the identify step are setup from,
+    either the saved path weights if caching the knowledge graphs, or the keywords of the knowledge base
+
+    :param entity_args: EntityArgs object containing task arguments
+    :return: tuple of positive keywords, negative keywords, positive path weights, and negative path weights
+    """
+    if config['PLANETARYNAMES_PIPELINE_CACHE_KNOWLEDGE_GRAPH']:
+        # the knowledge graphs are built only when their knowledge base records have changed
+        path_weights_positive = get_knowledge_graph_path_weights(entity_args, entity_args.name_entity_labels[0]['label'])
+        path_weights_negative = get_knowledge_graph_path_weights(entity_args, entity_args.name_entity_labels[1]['label'])
+        return [], [], path_weights_positive, path_weights_negative
+
+    keywords_positive = app.get_knowledge_base_keywords(entity_args.feature_name,
+                                                        entity_args.feature_type,
+                                                        entity_args.target,
+                                                        entity_args.name_entity_labels[0]['label'])
+    keywords_negative = app.get_knowledge_base_keywords(entity_args.feature_name,
+                                                        entity_args.feature_type,
+                                                        entity_args.target,
+                                                        entity_args.name_entity_labels[1]['label'])
+    return keywords_positive, keywords_negative, None, None
+
+
+def get_paper_relevance_store():
+    """
+    the persistent store of the paper relevance scores, paper relevance scores do not depend on the feature name,
+    persisting them lets other feature names reuse them
+
+    :return: the app if persisting the paper relevance scores, None otherwise
+    """
+    return app if config['PLANETARYNAMES_PIPELINE_PERSIST_PAPER_RELEVANCE_SCORES'] else None
+
+
+def get_identify_pipeline(entity_args: EntityArgs, paper_relevance_store=None,
+                          knowledge_graph_inputs: Tuple = ([], [], None, None)) -> Tuple[Tuple, IdentifyPlanetaryEntities]:
+    """
+    get the identify pipeline for the feature name from the pipelines of this worker, or set it up
+
+    :param entity_args: EntityArgs object containing task arguments
+    :param paper_relevance_store: optional persistent store of the paper relevance scores
+    :param knowledge_graph_inputs: tuple returned by get_knowledge_graph_inputs, if not provided the knowledge graphs are empty
+    :return: the key to release the pipeline with once done, and the pipeline
+    """
+    keywords_positive, keywords_negative, path_weights_positive, path_weights_negative = knowledge_graph_inputs
+    pipeline_key = pipeline_cache.get_key(IdentifyPlanetaryEntities, entity_args, paper_relevance_store)
+    identify_planetary_entities = pipeline_cache.get(pipeline_key,
+                                                     setup=lambda: IdentifyPlanetaryEntities(entity_args, keywords_positive, keywords_negative,
+                                                                                             paper_relevance_store,
+                                                                                             path_weights_positive, path_weights_negative),
+                                                     update=lambda pipeline: pipeline.update_args(entity_args, keywords_positive, keywords_negative,
+                                                                                                  path_weights_positive, path_weights_negative))
+    return pipeline_key, identify_planetary_entities
+
+
+def get_identify_score_stage(entity_args: EntityArgs) -> Tuple[Tuple, IdentifyScoreStage]:
+    """
+    get the score stage of identify for the feature name from the pipelines of this worker, or set it up,
+    keyed with the same store as the other stages
+
+    :param entity_args: EntityArgs object containing task arguments
+    :return: the key to release the stage with once done, and the stage
+    """
+    pipeline_key = pipeline_cache.get_key(IdentifyScoreStage, entity_args, get_paper_relevance_store())
+    score_stage = pipeline_cache.get(pipeline_key,
+                                     setup=lambda: IdentifyScoreStage(entity_args),
+                                     update=lambda stage: stage.update_args(entity_args))
+    return pipeline_key, score_stage
+
+
+def get_identify_label_stage(entity_args: EntityArgs, knowledge_graph_inputs: Tuple) -> Tuple[Tuple, IdentifyLabelStage]:
+    """
+    get the label stage of identify for the feature name from the pipelines of this worker, or set it up,
+    keyed with the same store as the other stages
+
+    :param entity_args: EntityArgs object containing task arguments
+    :param knowledge_graph_inputs: tuple returned by get_knowledge_graph_inputs
+    :return: the key to release the stage with once done, and the stage
+    """
+    keywords_positive, keywords_negative, path_weights_positive, path_weights_negative = knowledge_graph_inputs
+    pipeline_key = pipeline_cache.get_key(IdentifyLabelStage, entity_args, get_paper_relevance_store())
+    label_stage = pipeline_cache.get(pipeline_key,
+                                     setup=lambda: IdentifyLabelStage(entity_args, keywords_positive, keywords_negative,
+                                                                      path_weights_positive, path_weights_negative),
+                                     update=lambda stage: stage.update_args(entity_args, keywords_positive, keywords_negative,
+                                                                            path_weights_positive, path_weights_negative))
+    return pipeline_key, label_stage
+
+
+def prefetch_identify_docs(entity_args_list: List[EntityArgs]) -> List[Future]:
+    """
+    start the identify retrieval of end_to_end in the background, it does not depend on the knowledge base records
+    collect is about to save, so it runs while collect is scoring
+
+    :param entity_args_list: list of EntityArgs objects of the feature names to identify
+    :return: list of futures of the solr documents, one for each feature name
+    """
+    executor = ThreadPoolExecutor(max_workers=1)
+    futures = [executor.submit(SearchRetrieval(entity_args).identify_terms_query) for entity_args in entity_args_list]
+    # the thread exits once the queries are done
+    executor.shutdown(wait=False)
+    return futures
+
+
+def is_incremental_identify(action_type: PLANETARYNAMES_PIPELINE_ACTION) -> bool:
+    """
+    identify_recent only identifies the records new or modified since its last successful run, if enabled
+
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION enum value
+    :return: True if the action is to identify incrementally
+    """
+    return action_type == PLANETARYNAMES_PIPELINE_ACTION.identify_recent and \
+           config.get('PLANETARYNAMES_PIPELINE_INCREMENTAL_IDENTIFY', False)
+
+
+def get_incremental_identify_docs(search_retrieval: SearchRetrieval, entity_args: EntityArgs, fields: str = '') -> List[Dict]:
+    """
+    retrieve the docs modified since the watermark of the feature name, and drop the ones already identified
+    with the same version of the fulltext
+
+    :param search_retrieval: the SearchRetrieval of the pipeline
+    :param entity_args: EntityArgs object of the feature name
+    :param fields: optional, fields of the docs to return from solr, default is all the fields identify needs
+    :return: list of solr documents that are new or whose fulltext has been modified since the last successful run
+    """
+    watermark = app.get_identify_watermark(entity_args.feature_name, entity_args.feature_type, entity_args.target)
+    docs = search_retrieval.identify_terms_query(watermark, fields)
+    identified = app.get_identified_fulltexts(entity_args.feature_name, entity_args.feature_type, entity_args.target, watermark)
+    new_docs = [doc for doc in docs if (doc['bibcode'], doc.get('fulltext_mtime', '')) not in identified]
+    logger.info(f"Incremental identify for {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}: "
+                f"{len(new_docs)} of {len(docs)} docs are new or modified since {watermark or 'the first run'}.")
+    return new_docs
+
+
+def record_identified_docs(entity_args: EntityArgs, fulltexts: List[Tuple[str, str]], move_watermark: bool = True) -> bool:
+    """
+    record the fulltexts identified by a successful incremental run, and move the watermark of the feature name
+
+    :param entity_args: EntityArgs object of the feature name
+    :param fulltexts: list of (bibcode, fulltext_mtime) of the docs identified
+    :param move_watermark: if False, only the fulltexts are recorded, ie, when docs are left for a new task, since the docs
+                           are taken in bibcode order, the ones left can be older than the ones identified, and moving the
+                           watermark past them would lose them if the new task fails
+    :return: True if recorded successfully
+    """
+    return app.insert_identified_fulltexts(entity_args.feature_name, entity_args.feature_type, entity_args.target, fulltexts,
+                                           move_watermark=move_watermark)
+
+
+def get_fulltexts(docs: List[Dict]) -> List[Tuple[str, str]]:
+    """
+    the versions of the fulltexts of the docs
+
+    :param docs: list of solr documents
+    :return: list of (bibcode, fulltext_mtime)
+    """
+    return [(doc['bibcode'], doc.get('fulltext_mtime', '')) for doc in docs]
+
+
+def get_identify_checkpoint(entity_args: EntityArgs) -> TaskCheckpoint:
+    """
+    the checkpoint identify saves each doc to once scored, so that a retry of the task resumes where it stopped, if enabled
+
+    :param entity_args: EntityArgs object of the feature name
+    :return: TaskCheckpoint of the feature name, or None if not enabled
+    """
+    if config.get('PLANETARYNAMES_PIPELINE_IDENTIFY_CHECKPOINT', False):
+        return TaskCheckpoint(entity_args, app)
+    return None
+
+
+def get_task_budget() -> TaskBudget:
+    """
+    the budget of the task, identify stops taking new docs once it is spent, if enabled
+
+    :return: TaskBudget started now, or None if not enabled
+    """
+    max_seconds = config.get('PLANETARYNAMES_PIPELINE_TASK_TIME_BUDGET_SECONDS', 0)
+    max_docs = config.get('PLANETARYNAMES_PIPELINE_TASK_DOCS_BUDGET', 0)
+    if max_seconds > 0 or max_docs > 0:
+        return TaskBudget(max_seconds, max_docs)
+    return None
+
+
+def get_docs_taken(docs: List[Dict], budget: TaskBudget) -> List[Dict]:
+    """
+    the docs identify took within the budget of the task
+
+    :param docs: list of solr documents passed to identify
+    :param budget: the budget of the task, or None if not enabled
+    :return: the docs, without the ones left for a new task
+    """
+    if not budget or not budget.docs_left:
+        return docs
+    docs_left = set(doc['bibcode'] for doc in budget.docs_left)
+    return [doc for doc in docs if doc['bibcode'] not in docs_left]
+
+
+def get_continuation_docs(search_retrieval: SearchRetrieval, bibcodes: List[str]) -> List[Dict]:
+    """
+    retrieve the docs left by a task that spent its budget, querying solr for the bibcodes, instead of repeating the query
+    of the feature name
+
+    :param search_retrieval: the SearchRetrieval of the pipeline
+    :param bibcodes: list of the bibcodes of the docs left
+    :return: list of solr documents of the bibcodes
+    """
+    return search_retrieval.bibcodes_query(bibcodes)
+
+
+def continue_identify(action_type: PLANETARYNAMES_PIPELINE_ACTION, entity_args: EntityArgs, docs_left: List[Dict], budget: TaskBudget):
+    """
+    queue a new task to identify the docs left by a task that spent its budget
+
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION enum value of the task
+    :param entity_args: EntityArgs object of the feature name
+    :param docs_left: list of solr documents not taken by identify
+    :param budget: the budget of the task
+    :return:
+    """
+    budget.count_overrun(entity_args.feature_name, len(docs_left))
+    task_process_planetary_nomenclature.delay({'action_type': get_continuation_action_type(action_type).value,
+                                               'args': entity_args.toJSON(),
+                                               'bibcodes': [doc['bibcode'] for doc in docs_left]})
+
+
+def continue_identify_batch(action_type: PLANETARYNAMES_PIPELINE_ACTION, entity_args_list: List[EntityArgs]):
+    """
+    queue a new task to identify the feature names of a batch that were not started, once the task spent its budget
+
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION enum value of the task
+    :param entity_args_list: list of EntityArgs objects of the feature names not started
+    :return:
+    """
+    logger.warning(f"Task budget exceeded before identifying {', '.join(entity_args.feature_name for entity_args in entity_args_list)}, "
+                   f"continued in a new task.")
+    task_process_planetary_nomenclature_batch.delay({'action_type': get_continuation_action_type(action_type).value,
+                                                     'args': [entity_args.toJSON() for entity_args in entity_args_list]})
+
+
+def get_continuation_action_type(action_type: PLANETARYNAMES_PIPELINE_ACTION) -> PLANETARYNAMES_PIPELINE_ACTION:
+    """
+    the action of the task continuing a task that spent its budget
+
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION enum value of the task
+    :return: the same action, except that end_to_end is continued with identify, the knowledge base has already been collected
+    """
+    if action_type == PLANETARYNAMES_PIPELINE_ACTION.end_to_end:
+        return PLANETARYNAMES_PIPELINE_ACTION.identify
+    return action_type
+
+
+def log_estimated_cost(the_task: dict, start_time: float):
+    """
+    log the runtime of a task queued longest first next to its estimated cost, so that the two can be compared
+
+    :param the_task: the task, with estimated_docs if it was estimated
+    :param start_time: the time the task started
+    :return:
+    """
+    if the_task.get('estimated_docs', -1) < 0:
+        return
+    args_list = the_task['args'] if isinstance(the_task['args'], list) else [the_task['args']]
+    feature_names = [args['feature_name'] for args in args_list]
+    logger.info(f"Task {the_task.get('action_type')} for {', '.join(feature_names)} estimated at {the_task['estimated_docs']} docs "
+                f"ran in {time.time() - start_time:.2f} s.")
+
+
+def save_named_entity_records(named_entity_records: List[Tuple[NamedEntityHistory, List[NamedEntity]]],
+                              checkpoints: List[TaskCheckpoint]) -> bool:
+    """
+    save the identified records, and purge the checkpoints of the feature names in the same transaction
+
+    :param named_entity_records: list of tuples containing NamedEntityHistory and associated NamedEntity records
+    :param checkpoints: list of TaskCheckpoint of the feature names, empty if not enabled
+    :return: True if saved successfully
+    """
+    if checkpoints:
+        return bool(app.insert_named_entity_records(named_entity_records, [checkpoint.key for checkpoint in checkpoints]))
+    return bool(app.insert_named_entity_records(named_entity_records))
+
+
 @app.task(queue='task_process_planetary_nomenclature', max_retries=config['MAX_QUEUE_RETRIES'])
 def task_process_planetary_nomenclature(the_task: dict) -> bool:
     """
@@ -43,46 +371,337 @@ def task_process_planetary_nomenclature(the_task: dict) -> bool:
                      - 'args': EntityArgs object containing task arguments
     :return: bool, returns True if the task is processed successfully, False otherwise
     """
+    start_time = time.time()
     try:
         # deserialize
         action_type = PLANETARYNAMES_PIPELINE_ACTION(the_task['action_type'])
         entity_args = EntityArgs(**the_task["args"])
+        paper_relevance_store = get_paper_relevance_store()
+        # end_to_end collects and then identifies with the collected knowledge base
+        end_to_end = action_type == PLANETARYNAMES_PIPELINE_ACTION.end_to_end
+        identify_docs = prefetch_identify_docs([entity_args])[0] if end_to_end else None
+        # the excerpts and keywords computed by collect are reused by identify
+        end_to_end_context = EndToEndContext() if end_to_end else None
+        budget = get_task_budget()
 
         # either: action to collect data to setup KB graph
         if action_type in [PLANETARYNAMES_PIPELINE_ACTION.collect,
                            PLANETARYNAMES_PIPELINE_ACTION.end_to_end,
                            PLANETARYNAMES_PIPELINE_ACTION.collect_recent]:
-            knowledge_base_records = CollectKnowldegeBase(entity_args).collect()
+            pipeline_key = pipeline_cache.get_key(CollectKnowldegeBase, entity_args, paper_relevance_store)
+            collect_knowledge_base = pipeline_cache.get(pipeline_key,
+                                                        setup=lambda: CollectKnowldegeBase(entity_args, paper_relevance_store),
+                                                        update=lambda pipeline: pipeline.update_args(entity_args))
+            collect_knowledge_base.end_to_end_context = end_to_end_context
+            knowledge_base_records = collect_knowledge_base.collect()
+            collect_knowledge_base.end_to_end_context = None
+            pipeline_cache.release(pipeline_key, collect_knowledge_base)
             if knowledge_base_records:
-                return bool(app.insert_knowledge_base_records(knowledge_base_records))
-
-            logger.info(f"No knowledge base records found for: {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}")
-            return False
+                collected = bool(app.insert_knowledge_base_records(knowledge_base_records))
+            else:
+                logger.info(f"No knowledge base records found for: {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}")
+                collected = False
+            if not end_to_end:
+                return collected
 
         # or: action to identify and label entities
         if action_type in [PLANETARYNAMES_PIPELINE_ACTION.identify,
                            PLANETARYNAMES_PIPELINE_ACTION.end_to_end,
                            PLANETARYNAMES_PIPELINE_ACTION.identify_recent]:
-            keywords_positive = app.get_knowledge_base_keywords(entity_args.feature_name,
-                                                                entity_args.feature_type,
-                                                                entity_args.target,
-                                                                entity_args.name_entity_labels[0]['label'])
-            keywords_negative = app.get_knowledge_base_keywords(entity_args.feature_name,
-                                                                entity_args.feature_type,
-                                                                entity_args.target,
-                                                                entity_args.name_entity_labels[1]['label'])
-            named_entity_records = IdentifyPlanetaryEntities(entity_args, keywords_positive, keywords_negative).identify()
+            pipeline_key, identify_planetary_entities = get_identify_pipeline(entity_args, paper_relevance_store,
+                                                                              get_knowledge_graph_inputs(entity_args))
+            docs = identify_docs.result() if identify_docs else None
+            incremental = is_incremental_identify(action_type)
+            if 'bibcodes' in the_task:
+                # continuing a task that spent its budget
+                docs = get_continuation_docs(identify_planetary_entities.search_retrieval, the_task['bibcodes'])
+            elif incremental:
+                docs = get_incremental_identify_docs(identify_planetary_entities.search_retrieval, entity_args)
+            checkpoint = get_identify_checkpoint(entity_args)
+            identify_planetary_entities.end_to_end_context = end_to_end_context
+            identify_planetary_entities.checkpoint = checkpoint
+            identify_planetary_entities.budget = budget
+            named_entity_records = identify_planetary_entities.identify(docs)
+            identify_planetary_entities.end_to_end_context = None
+            identify_planetary_entities.checkpoint = None
+            identify_planetary_entities.budget = None
+            pipeline_cache.release(pipeline_key, identify_planetary_entities)
+            if end_to_end_context:
+                end_to_end_context.log_stats(entity_args.feature_name)
             if named_entity_records:
-                return bool(app.insert_named_entity_records(named_entity_records))
+                identified = save_named_entity_records(named_entity_records, [checkpoint] if checkpoint else [])
+            else:
+                logger.info(f"No records identified for: {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}")
+                identified = False
+                if checkpoint:
+                    checkpoint.purge()
+            # the run is successful, even if nothing was identified, as long as the records identified are saved
+            if incremental and (identified or not named_entity_records):
+                record_identified_docs(entity_args, get_fulltexts(get_docs_taken(docs, budget)), move_watermark=not (budget and budget.docs_left))
+            if budget and budget.docs_left:
+                continue_identify(action_type, entity_args, budget.docs_left, budget)
+            return identified
 
-            logger.info(f"No records identified for: {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}")
+        logger.error(f"Unhandled action: {action_type}")
+        return False
+
+    except KeyError as e:
+        logger.error(f"KeyError in task_process_planetary_nomenclature: {str(e)}")
+        return False
+    finally:
+        log_estimated_cost(the_task, start_time)
+
+
+@app.task(queue='task_process_planetary_nomenclature_batch', max_retries=config['MAX_QUEUE_RETRIES'])
+def task_process_planetary_nomenclature_batch(the_task: dict) -> bool:
+    """
+    processes planetary nomenclature tasks for a chunk of feature names of the same target and feature type
+
+    the pipeline components are setup once and reused for all the feature names,
+    and the records of all the feature names are saved in one transaction
+
+    :param the_task: PlanetaryNomenclatureTask, A typed dictionary containing:
+                     - 'action_type': PLANETARYNAMES_PIPELINE_ACTION enum value
+                     - 'args': list of EntityArgs objects containing task arguments, sharing target, feature type, and timestamp
+    :return: bool, returns True if the records of the chunk are saved successfully, False otherwise
+    """
+    start_time = time.time()
+    try:
+        # deserialize
+        action_type = PLANETARYNAMES_PIPELINE_ACTION(the_task['action_type'])
+        entity_args_list = [EntityArgs(**args) for args in the_task["args"]]
+        if not entity_args_list:
+            logger.info("No feature names in the batch.")
+            return False
+        if len(set((entity_args.target, entity_args.feature_type, entity_args.timestamp) for entity_args in entity_args_list)) > 1:
+            logger.error("The feature names of the batch have to share the target, feature type, and timestamp.")
             return False
+        paper_relevance_store = get_paper_relevance_store()
+        # end_to_end collects and then identifies with the collected knowledge base
+        end_to_end = action_type == PLANETARYNAMES_PIPELINE_ACTION.end_to_end
+        identify_docs = prefetch_identify_docs(entity_args_list) if end_to_end else [None] * len(entity_args_list)
+        # the excerpts and keywords computed by collect are reused by identify, for each feature name
+        end_to_end_contexts = [EndToEndContext() if end_to_end else None for _ in entity_args_list]
+        # shared by all the feature names, the ones left once it is spent are continued in new tasks
+        budget = get_task_budget()
+
+        # either: action to collect data to setup KB graph
+        if action_type in [PLANETARYNAMES_PIPELINE_ACTION.collect,
+                           PLANETARYNAMES_PIPELINE_ACTION.end_to_end,
+                           PLANETARYNAMES_PIPELINE_ACTION.collect_recent]:
+            knowledge_base_records = []
+            pipeline_key = pipeline_cache.get_key(CollectKnowldegeBase, entity_args_list[0], paper_relevance_store)
+            collect_knowledge_base = None
+            for entity_args, end_to_end_context in zip(entity_args_list, end_to_end_contexts):
+                if collect_knowledge_base:
+                    collect_knowledge_base.update_args(entity_args)
+                else:
+                    collect_knowledge_base = pipeline_cache.get(pipeline_key,
+                                                                setup=lambda: CollectKnowldegeBase(entity_args, paper_relevance_store),
+                                                                update=lambda pipeline: pipeline.update_args(entity_args))
+                collect_knowledge_base.end_to_end_context = end_to_end_context
+                records = collect_knowledge_base.collect()
+                if records:
+                    knowledge_base_records += records
+                else:
+                    logger.info(f"No knowledge base records found for: {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}")
+            collect_knowledge_base.end_to_end_context = None
+            pipeline_cache.release(pipeline_key, collect_knowledge_base)
+            collected = bool(app.insert_knowledge_base_records(knowledge_base_records)) if knowledge_base_records else False
+            if not end_to_end:
+                return collected
+
+        # or: action to identify and label entities
+        if action_type in [PLANETARYNAMES_PIPELINE_ACTION.identify,
+                           PLANETARYNAMES_PIPELINE_ACTION.end_to_end,
+                           PLANETARYNAMES_PIPELINE_ACTION.identify_recent]:
+            named_entity_records = []
+            pipeline_key, identify_planetary_entities = None, None
+            incremental = is_incremental_identify(action_type)
+            fulltexts = []
+            checkpoints = []
+            continuations = []
+            not_started = []
+            for i, (entity_args, docs, end_to_end_context) in enumerate(zip(entity_args_list, identify_docs, end_to_end_contexts)):
+                if budget and budget.is_exceeded():
+                    # not worth setting up the feature names left only to have all their docs left, continue them as they are
+                    not_started = entity_args_list[i:]
+                    break
+                knowledge_graph_inputs = get_knowledge_graph_inputs(entity_args)
+                if identify_planetary_entities:
+                    identify_planetary_entities.update_args(entity_args, *knowledge_graph_inputs)
+                else:
+                    pipeline_key, identify_planetary_entities = get_identify_pipeline(entity_args, paper_relevance_store,
+                                                                                      knowledge_graph_inputs)
+                docs = docs.result() if docs else None
+                if incremental:
+                    docs = get_incremental_identify_docs(identify_planetary_entities.search_retrieval, entity_args)
+                checkpoint = get_identify_checkpoint(entity_args)
+                if checkpoint:
+                    checkpoints.append(checkpoint)
+                identify_planetary_entities.end_to_end_context = end_to_end_context
+                identify_planetary_entities.checkpoint = checkpoint
+                identify_planetary_entities.budget = budget
+                records = identify_planetary_entities.identify(docs)
+                if incremental:
+                    fulltexts.append((entity_args, get_fulltexts(get_docs_taken(docs, budget)), not (budget and budget.docs_left)))
+                if budget and budget.docs_left:
+                    continuations.append((entity_args, budget.docs_left))
+                if records:
+                    named_entity_records += records
+                else:
+                    logger.info(f"No records identified for: {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}")
+                if end_to_end_context:
+                    end_to_end_context.log_stats(entity_args.feature_name)
+            if identify_planetary_entities:
+                identify_planetary_entities.end_to_end_context = None
+                identify_planetary_entities.checkpoint = None
+                identify_planetary_entities.budget = None
+                pipeline_cache.release(pipeline_key, identify_planetary_entities)
+            if named_entity_records:
+                identified = save_named_entity_records(named_entity_records, checkpoints)
+            else:
+                identified = False
+                for checkpoint in checkpoints:
+                    checkpoint.purge()
+            # the run is successful, even if nothing was identified, as long as the records identified are saved
+            if identified or not named_entity_records:
+                for entity_args, docs_fulltexts, move_watermark in fulltexts:
+                    record_identified_docs(entity_args, docs_fulltexts, move_watermark)
+            for entity_args, docs_left in continuations:
+                continue_identify(action_type, entity_args, docs_left, budget)
+            if not_started:
+                continue_identify_batch(action_type, not_started)
+            return identified
 
         logger.error(f"Unhandled action: {action_type}")
         return False
 
     except KeyError as e:
-        logger.error(f"KeyError in task_process_planetary_nomenclature: {str(e)}")
+        logger.error(f"KeyError in task_process_planetary_nomenclature_batch: {str(e)}")
+        return False
+    finally:
+        log_estimated_cost(the_task, start_time)
+
+
+@app.task(queue='task_identify_retrieve', max_retries=config['MAX_QUEUE_RETRIES'])
+def task_identify_retrieve(the_task: dict) -> bool:
+    """
+    first stage of identify, query solr for the bibcodes of the docs of the feature name and queue them for the next stage,
+    the docs are retrieved by the next stage, so that the messages do not carry the fulltexts
+
+    :param the_task: PlanetaryNomenclatureTask, A typed dictionary containing:
+                     - 'action_type': PLANETARYNAMES_PIPELINE_ACTION enum value
+                     - 'args': EntityArgs object containing task arguments
+    :return: bool, returns True if any docs were retrieved and queued, False otherwise
+    """
+    try:
+        entity_args = EntityArgs(**the_task["args"])
+        search_retrieval = SearchRetrieval(entity_args)
+        if is_incremental_identify(PLANETARYNAMES_PIPELINE_ACTION(the_task['action_type'])):
+            docs = get_incremental_identify_docs(search_retrieval, entity_args, search_retrieval.bibcode_fields)
+            # passed along the stages, to be recorded once the last stage is done with them
+            the_task = dict(the_task, fulltexts=get_fulltexts(docs))
+        else:
+            docs = search_retrieval.identify_terms_query(fields=search_retrieval.bibcode_fields)
+        if docs:
+            task_identify_extract.delay(dict(the_task, bibcodes=[doc['bibcode'] for doc in docs]))
+            return True
+
+        logger.info(f"No records identified for: {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}")
+        return False
+
+    except KeyError as e:
+        logger.error(f"KeyError in task_identify_retrieve: {str(e)}")
+        return False
+
+
+@app.task(queue='task_identify_extract', max_retries=config['MAX_QUEUE_RETRIES'])
+def task_identify_extract(the_task: dict) -> bool:
+    """
+    second stage of identify, the cpu bound nlp, extract the excerpts and their keywords, and queue them for the next stage
+
+    :param the_task: PlanetaryNomenclatureTask, A typed dictionary containing:
+                     - 'action_type': PLANETARYNAMES_PIPELINE_ACTION enum value
+                     - 'args': EntityArgs object containing task arguments
+                     - 'bibcodes': list of the bibcodes of the solr documents
+    :return: bool, returns True if any excerpts were extracted and queued, False otherwise
+    """
+    try:
+        entity_args = EntityArgs(**the_task["args"])
+        docs = SearchRetrieval(entity_args).bibcodes_query(the_task['bibcodes'])
+        paper_relevance_store = get_paper_relevance_store()
+        pipeline_key, identify_planetary_entities = get_identify_pipeline(entity_args, paper_relevance_store)
+        extracted = identify_planetary_entities.extract_excerpts(docs)
+        pipeline_cache.release(pipeline_key, identify_planetary_entities)
+        if extracted:
+            task_identify_score.delay(dict(the_task, docs=extracted))
+            return True
+
+        logger.info(f"No records identified for: {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}")
+        # nothing to identify in these docs, the run ends here
+        if 'fulltexts' in the_task:
+            record_identified_docs(entity_args, the_task['fulltexts'])
+        return False
+
+    except KeyError as e:
+        logger.error(f"KeyError in task_identify_extract: {str(e)}")
+        return False
+
+
+@app.task(queue='task_identify_score', max_retries=config['MAX_QUEUE_RETRIES'])
+def task_identify_score(the_task: dict) -> bool:
+    """
+    third stage of identify, the network bound scoring, get the local llm scores and the special keywords of the excerpts,
+    and queue them for the last stage
+
+    :param the_task: PlanetaryNomenclatureTask, A typed dictionary containing:
+                     - 'action_type': PLANETARYNAMES_PIPELINE_ACTION enum value
+                     - 'args': EntityArgs object containing task arguments
+                     - 'docs': list of dicts returned by the extract stage
+    :return: bool, returns True if the excerpts were scored and queued, False otherwise
+    """
+    try:
+        entity_args = EntityArgs(**the_task["args"])
+        pipeline_key, score_stage = get_identify_score_stage(entity_args)
+        scored = score_stage.score_excerpts(the_task['docs'])
+        pipeline_cache.release(pipeline_key, score_stage)
+        task_identify_label.delay(dict(the_task, docs=scored))
+        return True
+
+    except KeyError as e:
+        logger.error(f"KeyError in task_identify_score: {str(e)}")
+        return False
+
+
+@app.task(queue='task_identify_label', max_retries=config['MAX_QUEUE_RETRIES'])
+def task_identify_label(the_task: dict) -> bool:
+    """
+    last stage of identify, score the excerpts with the knowledge graphs, get the labels and confidences, and save the records
+
+    :param the_task: PlanetaryNomenclatureTask, A typed dictionary containing:
+                     - 'action_type': PLANETARYNAMES_PIPELINE_ACTION enum value
+                     - 'args': EntityArgs object containing task arguments
+                     - 'docs': list of dicts returned by the score stage
+    :return: bool, returns True if the records are saved successfully, False otherwise
+    """
+    try:
+        entity_args = EntityArgs(**the_task["args"])
+        pipeline_key, label_stage = get_identify_label_stage(entity_args, get_knowledge_graph_inputs(entity_args))
+        named_entity_records = label_stage.label_excerpts(the_task['docs'])
+        pipeline_cache.release(pipeline_key, label_stage)
+        if named_entity_records:
+            identified = bool(app.insert_named_entity_records(named_entity_records))
+        else:
+            logger.info(f"No records identified for: {entity_args.feature_name}/{entity_args.feature_type}/{entity_args.target}")
+            identified = False
+        # the run is successful, even if nothing was identified, as long as the records identified are saved
+        if 'fulltexts' in the_task and (identified or not named_entity_records):
+            record_identified_docs(entity_args, the_task['fulltexts'])
+        return identified
+
+    except KeyError as e:
+        logger.error(f"KeyError in task_identify_label: {str(e)}")
         return False
 
 
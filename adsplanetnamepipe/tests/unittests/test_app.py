@@ -131,6 +131,20 @@ class TesADSPlanetaryNamesPipelineCelery(unittest.TestCase):
         ]
         self.assertTrue(self.app.get_target_entities() == expected_result)
 
+    def test_get_gazetteer_snapshot(self):
+        """ test get_gazetteer_snapshot sets up the same arguments as the app methods """
+
+        snapshot = self.app.get_gazetteer_snapshot()
+        timestamp = datetime(2000, 1, 1)
+        for feature_name, feature_type in [('Airy', 'Crater'), ('Rayleigh', 'Crater'), ('some_feature_name', 'Large ringed feature')]:
+            entity_args = snapshot.get_entity_args(feature_name, 'Mars', feature_type, timestamp)
+            self.assertEqual(entity_args.feature_type_plural, self.app.get_plural_feature_type_entity(feature_type))
+            self.assertCountEqual(entity_args.context_ambiguous_feature_names, self.app.get_context_ambiguous_feature_name(feature_name))
+            self.assertEqual(entity_args.multi_token_containing_feature_names, self.app.get_multi_token_containing_feature_name(feature_name))
+            self.assertEqual(entity_args.name_entity_labels, self.app.get_named_entity_label())
+            self.assertEqual(entity_args.all_targets, self.app.get_target_entities())
+            self.assertEqual(entity_args.timestamp, '2000-01-01')
+
     def test_insert_knowledge_base_records(self):
         """ test insert_knowledge_base_records method """
 
@@ -705,6 +719,136 @@ class TesADSPlanetaryNamesPipelineCelery(unittest.TestCase):
         # ensure expected record is not returned
         self.assertNotIn(('Pluto', 'Cavus', 'Hekla Cavus'), feature_name_info)
 
+    def test_paper_relevance_score(self):
+        """ test insert_paper_relevance_score and get_paper_relevance_score methods """
+
+        # not computed yet
+        self.assertEqual(self.app.get_paper_relevance_score('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z', 'Moon', 'Crater'), -1)
+
+        self.assertTrue(self.app.insert_paper_relevance_score('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z', 'Moon', 'Crater', 0.8))
+        self.assertEqual(self.app.get_paper_relevance_score('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z', 'Moon', 'Crater'), 0.8)
+
+        # inserting again, from another worker for example, is not an error and keeps the existing score
+        self.assertTrue(self.app.insert_paper_relevance_score('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z', 'Moon', 'Crater', 0.6))
+        self.assertEqual(self.app.get_paper_relevance_score('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z', 'Moon', 'Crater'), 0.8)
+
+        # fulltext has changed since, or a different target/feature type
+        self.assertEqual(self.app.get_paper_relevance_score('2022ApJ...931L..24C', '2023-01-01T00:00:00.000Z', 'Moon', 'Crater'), -1)
+        self.assertEqual(self.app.get_paper_relevance_score('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z', 'Mars', 'Crater'), -1)
+
+
+    def test_identified_fulltexts(self):
+        """ test insert_identified_fulltexts, get_identified_fulltexts, and get_identify_watermark methods """
+
+        # no incremental run yet
+        self.assertEqual(self.app.get_identify_watermark('Rayleigh', 'Crater', 'Moon'), '')
+        self.assertEqual(self.app.get_identified_fulltexts('Rayleigh', 'Crater', 'Moon'), set())
+
+        self.assertTrue(self.app.insert_identified_fulltexts('Rayleigh', 'Crater', 'Moon',
+                                                             [('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z'),
+                                                              ('2023Icar..39115524S', '2023-01-01T00:00:00.000Z'),
+                                                              ('2023Icar..39115525S', '')]))
+        self.assertEqual(self.app.get_identify_watermark('Rayleigh', 'Crater', 'Moon'), '2023-01-01T00:00:00.000Z')
+        self.assertEqual(self.app.get_identified_fulltexts('Rayleigh', 'Crater', 'Moon'),
+                         {('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z'), ('2023Icar..39115524S', '2023-01-01T00:00:00.000Z')})
+        self.assertEqual(self.app.get_identified_fulltexts('Rayleigh', 'Crater', 'Moon', '2023-01-01T00:00:00.000Z'),
+                         {('2023Icar..39115524S', '2023-01-01T00:00:00.000Z')})
+
+        # the fulltext changed, and a run that saw only older fulltexts does not move the watermark back
+        self.assertTrue(self.app.insert_identified_fulltexts('Rayleigh', 'Crater', 'Moon',
+                                                             [('2022ApJ...931L..24C', '2023-06-01T00:00:00.000Z')]))
+        self.assertEqual(self.app.get_identify_watermark('Rayleigh', 'Crater', 'Moon'), '2023-06-01T00:00:00.000Z')
+        self.assertTrue(self.app.insert_identified_fulltexts('Rayleigh', 'Crater', 'Moon',
+                                                             [('2023Icar..39115524S', '2023-01-01T00:00:00.000Z')]))
+        self.assertEqual(self.app.get_identify_watermark('Rayleigh', 'Crater', 'Moon'), '2023-06-01T00:00:00.000Z')
+        self.assertEqual(len(self.app.get_identified_fulltexts('Rayleigh', 'Crater', 'Moon')), 3)
+
+        # docs are left for a new task, the fulltexts are recorded, but the watermark is not moved
+        self.assertTrue(self.app.insert_identified_fulltexts('Rayleigh', 'Crater', 'Moon',
+                                                             [('2024Icar..39115526S', '2024-01-01T00:00:00.000Z')], move_watermark=False))
+        self.assertEqual(self.app.get_identify_watermark('Rayleigh', 'Crater', 'Moon'), '2023-06-01T00:00:00.000Z')
+        self.assertEqual(len(self.app.get_identified_fulltexts('Rayleigh', 'Crater', 'Moon')), 4)
+
+        # nothing to record
+        self.assertTrue(self.app.insert_identified_fulltexts('Rayleigh', 'Crater', 'Moon', []))
+
+    def test_identify_checkpoints(self):
+        """ test insert_identify_checkpoint, get_identify_checkpoints, and remove_identify_checkpoints methods """
+
+        key = ('Rayleigh', 'Crater', 'Moon', '2000-01-01')
+        scored = {'bibcode': '2022ApJ...931L..24C', 'paper_relevance_score': 0.8,
+                  'excerpts': [{'excerpt': 'Rayleigh crater', 'keywords': ['crater'], 'local_llm_score': 1, 'special_keywords': []}]}
+
+        # nothing processed yet
+        self.assertEqual(self.app.get_identify_checkpoints(*key), {})
+
+        self.assertTrue(self.app.insert_identify_checkpoint(*key, '2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z', scored))
+        self.assertTrue(self.app.insert_identify_checkpoint(*key, '2023Icar..39115524S', '', None))
+        self.assertEqual(self.app.get_identify_checkpoints(*key),
+                         {'2022ApJ...931L..24C': ('2022-06-01T00:00:00.000Z', scored), '2023Icar..39115524S': ('', None)})
+        # other tasks do not see them, nor do the ones resuming from later records only
+        self.assertEqual(self.app.get_identify_checkpoints('Rayleigh', 'Crater', 'Moon', '2001-01-01'), {})
+        self.assertEqual(self.app.get_identify_checkpoints(*key, datetime(2100, 1, 1, tzinfo=timezone.utc)), {})
+
+        # processed again, replaces the earlier one
+        self.assertTrue(self.app.insert_identify_checkpoint(*key, '2023Icar..39115524S', '2023-01-01T00:00:00.000Z', scored))
+        self.assertEqual(self.app.get_identify_checkpoints(*key)['2023Icar..39115524S'], ('2023-01-01T00:00:00.000Z', scored))
+
+        self.assertEqual(self.app.remove_identify_checkpoints(*key), 2)
+        self.assertEqual(self.app.get_identify_checkpoints(*key), {})
+
+    def test_insert_named_entity_records_purge_checkpoints(self):
+        """ test that insert_named_entity_records removes the identify checkpoints along with saving the records """
+
+        key = ('Rayleigh', 'Crater', 'Moon', '2000-01-01')
+        self.assertTrue(self.app.insert_identify_checkpoint(*key, '2022ApJ...931L..24C', '', None))
+
+        records: List[Tuple[NamedEntityHistory, List[NamedEntity]]] = [
+            (named_entity_history_records[0].clone(), named_entity_records[0])
+        ]
+        self.assertTrue(self.app.insert_named_entity_records(records, [key]))
+        self.assertEqual(self.app.get_identify_checkpoints(*key), {})
+
+    def test_knowledge_graph_path_weights(self):
+        """ test insert_knowledge_graph_path_weights and get_knowledge_graph_path_weights methods, and that the path weights are invalidated """
+
+        history_record = knowledge_base_history_records[0].clone()
+        feature_name_entity, target_entity = history_record.feature_name_entity, history_record.target_entity
+        args = (feature_name_entity, history_record.feature_type_entity, target_entity, history_record.named_entity_label)
+        path_weights = {'crater': 2.5, 'lunar': 1.0, 'Antoniadi': 0}
+
+        # no knowledge base records yet
+        self.assertEqual(self.app.get_knowledge_graph_path_weights(*args), (-1, {}))
+
+        self.assertTrue(self.app.insert_knowledge_base_records([(history_record, knowledge_base_records[0])]))
+        # the graph has not been saved yet
+        history_id, result = self.app.get_knowledge_graph_path_weights(*args)
+        self.assertNotEqual(history_id, -1)
+        self.assertEqual(result, {})
+        self.assertTrue(self.app.insert_knowledge_graph_path_weights(history_id, path_weights))
+        self.assertEqual(self.app.get_knowledge_graph_path_weights(*args), (history_id, path_weights))
+
+        # appending a keyword invalidates the path weights
+        self.assertEqual(self.app.append_to_knowledge_base_keywords(feature_name_entity, target_entity, 'larger'), 2)
+        self.assertEqual(self.app.get_knowledge_graph_path_weights(*args), (history_id, {}))
+
+        # and so does removing a keyword
+        self.assertTrue(self.app.insert_knowledge_graph_path_weights(history_id, path_weights))
+        self.assertEqual(self.app.remove_from_knowledge_base_keywords(feature_name_entity, target_entity, 'crater'), 3)
+        self.assertEqual(self.app.get_knowledge_graph_path_weights(*args), (history_id, {}))
+
+        # and so does inserting new knowledge base records, the graph is now built from the new history entry
+        self.assertTrue(self.app.insert_knowledge_graph_path_weights(history_id, path_weights))
+        new_history_record = knowledge_base_history_records[0].clone()
+        self.assertTrue(self.app.insert_knowledge_base_records([(new_history_record, knowledge_base_records[0])]))
+        new_history_id, result = self.app.get_knowledge_graph_path_weights(*args)
+        self.assertNotEqual(new_history_id, history_id)
+        self.assertEqual(result, {})
+
+        # and removing the records of a history entry removes its path weights as well
+        self.assertTrue(self.app.insert_knowledge_graph_path_weights(new_history_id, path_weights))
+        self.assertNotEqual(self.app.remove_knowledge_base_records([new_history_id]), (-1, -1))
+        self.assertEqual(self.app.get_knowledge_graph_path_weights(*args), (history_id, {}))
 
 class TestADSPlanetaryNamesPipelineCeleryNoStubdata(unittest.TestCase):
 
@@ -1153,6 +1297,91 @@ class TestADSPlanetaryNamesPipelineCeleryNoStubdata(unittest.TestCase):
             self.assertEqual(result, [])
             mock_error.assert_called_with(f"No entities require updating for the knowledge graph.")
 
+    def test_insert_paper_relevance_score_exception(self):
+        """ test insert_paper_relevance_score method when there is a exception """
+
+        with patch.object(self.app, "session_scope") as mock_session_scope:
+            mock_session = mock_session_scope.return_value.__enter__.return_value
+            mock_session.execute.side_effect = SQLAlchemyError("Mocked SQLAlchemyError")
+
+            with patch.object(self.app.logger, 'error') as mock_error:
+                result = self.app.insert_paper_relevance_score('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z', 'Moon', 'Crater', 0.8)
+
+                self.assertFalse(result)
+                mock_session.rollback.assert_called_once()
+                mock_error.assert_called_once_with("Error occurred while inserting `PaperRelevanceScore` record for 2022ApJ...931L..24C/Moon/Crater: Mocked SQLAlchemyError")
+
+    def test_insert_identified_fulltexts_exception(self):
+        """ test insert_identified_fulltexts method when there is a exception """
+
+        with patch.object(self.app, "session_scope") as mock_session_scope:
+            mock_session = mock_session_scope.return_value.__enter__.return_value
+            mock_session.execute.side_effect = SQLAlchemyError("Mocked SQLAlchemyError")
+
+            with patch.object(self.app.logger, 'error') as mock_error:
+                result = self.app.insert_identified_fulltexts('Rayleigh', 'Crater', 'Moon', [('2022ApJ...931L..24C', '2022-06-01T00:00:00.000Z')])
+
+                self.assertFalse(result)
+                mock_session.rollback.assert_called_once()
+                mock_error.assert_called_once_with("Error occurred while inserting `IdentifiedFulltext` records for Rayleigh/Crater/Moon: Mocked SQLAlchemyError")
+
+    def test_insert_identify_checkpoint_exception(self):
+        """ test insert_identify_checkpoint method when there is a exception """
+
+        with patch.object(self.app, "session_scope") as mock_session_scope:
+            mock_session = mock_session_scope.return_value.__enter__.return_value
+            mock_session.execute.side_effect = SQLAlchemyError("Mocked SQLAlchemyError")
+
+            with patch.object(self.app.logger, 'error') as mock_error:
+                result = self.app.insert_identify_checkpoint('Rayleigh', 'Crater', 'Moon', '2000-01-01', '2022ApJ...931L..24C', '', None)
+
+                self.assertFalse(result)
+                mock_session.rollback.assert_called_once()
+                mock_error.assert_called_once_with("Error occurred while inserting `IdentifyCheckpoint` record for 2022ApJ...931L..24C/Rayleigh/Crater/Moon: Mocked SQLAlchemyError")
+
+    def test_remove_identify_checkpoints_exception(self):
+        """ test remove_identify_checkpoints method when there is a exception """
+
+        with patch.object(self.app, "session_scope") as mock_session_scope:
+            mock_session = mock_session_scope.return_value.__enter__.return_value
+            mock_session.execute.side_effect = SQLAlchemyError("Mocked SQLAlchemyError")
+
+            with patch.object(self.app.logger, 'error') as mock_error:
+                result = self.app.remove_identify_checkpoints('Rayleigh', 'Crater', 'Moon', '2000-01-01')
+
+                self.assertEqual(result, -1)
+                mock_session.rollback.assert_called_once()
+                mock_error.assert_called_once_with("Error occurred while removing `IdentifyCheckpoint` records for Rayleigh/Crater/Moon: Mocked SQLAlchemyError")
+
+    def test_get_gazetteer_snapshot_exception(self):
+        """ test get_gazetteer_snapshot method when there is a exception """
+
+        with patch.object(self.app, "session_scope") as mock_session_scope:
+            mock_session = mock_session_scope.return_value.__enter__.return_value
+            mock_session.query.side_effect = SQLAlchemyError("Mocked SQLAlchemyError")
+
+            with patch.object(self.app.logger, 'error') as mock_error:
+                result = self.app.get_gazetteer_snapshot()
+
+                self.assertIsNone(result)
+                mock_session.rollback.assert_called_once()
+                mock_error.assert_called_once_with("Error occurred while loading the gazetteer snapshot: Mocked SQLAlchemyError")
+
+    def test_insert_knowledge_graph_path_weights_exception(self):
+        """ test insert_knowledge_graph_path_weights method when there is a exception """
+
+        with patch.object(self.app, "session_scope") as mock_session_scope:
+            mock_session = mock_session_scope.return_value.__enter__.return_value
+            mock_session.execute.side_effect = SQLAlchemyError("Mocked SQLAlchemyError")
+
+            with patch.object(self.app.logger, 'error') as mock_error:
+                result = self.app.insert_knowledge_graph_path_weights(1, {'crater': 2.5})
+
+                self.assertFalse(result)
+                mock_session.rollback.assert_called_once()
+                mock_error.assert_called_once_with("Error occurred while inserting `KnowledgeGraphPathWeights` record for history id 1: Mocked SQLAlchemyError")
+
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -4,14 +4,16 @@ if project_home not in sys.path:
     sys.path.insert(0, project_home)
 
 
+import threading
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import MagicMock, patch, call
 
 from typing import List, Tuple
 
 from adsplanetnamepipe.collect import CollectKnowldegeBase
 from adsplanetnamepipe.models import KnowledgeBase, KnowledgeBaseHistory
 from adsplanetnamepipe.utils.common import EntityArgs
+from adsplanetnamepipe.utils.collect_gates import CollectGates
 
 from adsplanetnamepipe.tests.unittests.stubdata import solrdata
 from adsplanetnamepipe.tests.unittests.stubdata import excerpts
@@ -39,10 +41,26 @@ class TestCollectKnowldegeBase(unittest.TestCase):
         )
         self.collect_knowldegebase = CollectKnowldegeBase(self.args)
 
+    def test_update_args(self):
+        """ test update_args points the components to the new feature name, reusing them """
+
+        extract_keywords = self.collect_knowldegebase.extract_keywords
+        args = EntityArgs(**dict(self.args.toJSON(), feature_name='Galle'))
+        self.collect_knowldegebase.update_args(args)
+
+        self.assertIs(self.collect_knowldegebase.extract_keywords, extract_keywords)
+        for component in [self.collect_knowldegebase, self.collect_knowldegebase.search_retrieval,
+                          self.collect_knowldegebase.match_excerpt, self.collect_knowldegebase.adsabs_ner,
+                          self.collect_knowldegebase.extract_keywords, self.collect_knowldegebase.paper_relevance,
+                          self.collect_knowldegebase.local_llm]:
+            self.assertEqual(component.args.feature_name, 'Galle')
+        self.assertIn('galle', self.collect_knowldegebase.vocabulary)
+        self.assertNotIn('rayleigh', self.collect_knowldegebase.vocabulary)
+
     def test_get_paper_relevance_score(self):
         """ test get_paper_relevance_score method """
 
-        self.collect_knowldegebase.paper_relevance.forward = MagicMock(return_value=0.8)
+        self.collect_knowldegebase.paper_relevance.forward_doc = MagicMock(return_value=0.8)
         score = self.collect_knowldegebase.get_paper_relevance_score(solrdata.doc_1)
         self.assertEqual(score, 0.8)
 
@@ -94,6 +112,42 @@ class TestCollectKnowldegeBase(unittest.TestCase):
         self.assertEqual(collected_doc[0].special_keywords, [])
         self.assertEqual(collected_doc[1].special_keywords, keywords_forward_special)
 
+    def test_collect_KB_positive_gated(self):
+        """ test that collect_KB_positive skips the expensive steps once a doc cannot pass the thresholds """
+
+        stats = dict(CollectGates.stats)
+        self.collect_knowldegebase.search_retrieval.collect_usgs_terms_query = MagicMock(return_value=[solrdata.doc_1])
+        self.collect_knowldegebase.match_excerpt.forward = MagicMock(return_value=(True, ['excerpt 1', 'excerpt 2', 'excerpt 3', 'excerpt 4']))
+        self.collect_knowldegebase.extract_keywords.forward_doc = MagicMock(return_value=['crater', 'rayleigh'])
+        self.collect_knowldegebase.extract_keywords.forward = MagicMock(return_value=['ripple', 'mars'])
+        self.collect_knowldegebase.extract_keywords.forward_special = MagicMock(return_value=['topography'])
+        self.collect_knowldegebase.get_local_llm_score = MagicMock(return_value=0.0)
+
+        # the paper relevance score is too low, no keywords are extracted
+        self.collect_knowldegebase.get_paper_relevance_score = MagicMock(return_value=0.5)
+        self.assertEqual(self.collect_knowldegebase.collect_KB_positive(), [])
+        self.collect_knowldegebase.extract_keywords.forward_doc.assert_not_called()
+        self.collect_knowldegebase.extract_keywords.forward.assert_not_called()
+        self.collect_knowldegebase.get_local_llm_score.assert_not_called()
+
+        # after three llm scores of 0, the last excerpt cannot lift the average to 0.5
+        self.collect_knowldegebase.get_paper_relevance_score = MagicMock(return_value=0.8)
+        self.assertEqual(self.collect_knowldegebase.collect_KB_positive(), [])
+        self.assertEqual(self.collect_knowldegebase.extract_keywords.forward.call_count, 3)
+        self.assertEqual(self.collect_knowldegebase.get_local_llm_score.call_count, 3)
+
+        gated = CollectGates.stats
+        self.assertEqual(gated['docs'] - stats['docs'], 2)
+        self.assertEqual(gated['gated_paper_relevance'] - stats['gated_paper_relevance'], 1)
+        self.assertEqual(gated['gated_local_llm'] - stats['gated_local_llm'], 1)
+        self.assertEqual(gated['fulltext_keywords_calls_saved'] - stats['fulltext_keywords_calls_saved'], 1)
+        self.assertEqual(gated['local_llm_calls_saved'] - stats['local_llm_calls_saved'], 4 + 1)
+
+        # with the last score high enough the doc passes, so all the excerpts are scored
+        self.collect_knowldegebase.get_local_llm_score = MagicMock(side_effect=[0.0, 0.0, 1.0, 1.0])
+        self.assertEqual(len(self.collect_knowldegebase.collect_KB_positive()), 1)
+        self.assertEqual(self.collect_knowldegebase.get_local_llm_score.call_count, 4)
+
     def test_collect_KB_negative(self):
         """ test collect_KB_positive method """
 
@@ -102,7 +156,7 @@ class TestCollectKnowldegeBase(unittest.TestCase):
                                 'thick', 'decrease', 'ten', 'increase', 'crystal']
 
         self.collect_knowldegebase.search_retrieval.collect_non_usgs_terms_query = MagicMock(return_value=[solrdata.doc_2])
-        self.collect_knowldegebase.extract_keywords.forward_doc = MagicMock(return_value=keywords_forward_doc)
+        self.collect_knowldegebase.extract_keywords.forward_docs = MagicMock(return_value=[keywords_forward_doc])
 
         result = self.collect_knowldegebase.collect_KB_negative()
 
@@ -133,13 +187,59 @@ class TestCollectKnowldegeBase(unittest.TestCase):
 
         mock_collect_KB_positive.return_value = positive_result
         mock_collect_KB_negative.return_value = negative_result
+        self.collect_knowldegebase.search_retrieval.collect_usgs_terms_query = MagicMock(return_value=[solrdata.doc_1])
+        self.collect_knowldegebase.search_retrieval.collect_non_usgs_terms_query = MagicMock(return_value=[solrdata.doc_2])
+        self.collect_knowldegebase.extract_keywords.update_corpus = MagicMock()
 
         result = self.collect_knowldegebase.collect()
         self.assertEqual(len(result), 2)
+        # both sides are processed with the docs retrieved at the same time, added to the corpus idf in a fixed order
+        mock_collect_KB_positive.assert_called_once_with([solrdata.doc_1], update_corpus=False)
+        mock_collect_KB_negative.assert_called_once_with([solrdata.doc_2], update_corpus=False)
+        self.assertEqual(self.collect_knowldegebase.extract_keywords.update_corpus.call_args_list,
+                         [call([solrdata.doc_1]), call([solrdata.doc_2])])
 
         self.assertEqual(result[0], positive_result[0])
         self.assertEqual(result[1], negative_result[0])
 
+    def test_collect_concurrent(self):
+        """ test that the solr queries, and then the two sides, overlap, and the records are the same as running them in order """
+
+        positive_query_started = threading.Event()
+        negative_query_started = threading.Event()
+        positive_scoring_started = threading.Event()
+        def collect_non_usgs_terms_query():
+            # runs while the positive side is retrieved
+            negative_query_started.set()
+            self.assertTrue(positive_query_started.wait(timeout=5))
+            return [solrdata.doc_2]
+        def collect_usgs_terms_query():
+            positive_query_started.set()
+            self.assertTrue(negative_query_started.wait(timeout=5))
+            return [solrdata.doc_1]
+        def forward_docs(docs, vocabulary, usgs_term):
+            # runs while the positive side is scored
+            self.assertTrue(positive_scoring_started.wait(timeout=5))
+            return [['ripple', 'dune']]
+        def get_local_llm_score(doc, excerpt):
+            positive_scoring_started.set()
+            return 0.7
+
+        self.collect_knowldegebase.search_retrieval.collect_usgs_terms_query = MagicMock(side_effect=collect_usgs_terms_query)
+        self.collect_knowldegebase.search_retrieval.collect_non_usgs_terms_query = MagicMock(side_effect=collect_non_usgs_terms_query)
+        self.collect_knowldegebase.match_excerpt.forward = MagicMock(return_value=(True, [excerpts.doc_1_excerpts[0]['excerpt']]))
+        self.collect_knowldegebase.extract_keywords.forward_doc = MagicMock(return_value=['crater', 'rayleigh'])
+        self.collect_knowldegebase.extract_keywords.forward_docs = MagicMock(side_effect=forward_docs)
+        self.collect_knowldegebase.extract_keywords.forward = MagicMock(return_value=['ripple', 'mars'])
+        self.collect_knowldegebase.extract_keywords.forward_special = MagicMock(return_value=['topography'])
+        self.collect_knowldegebase.get_paper_relevance_score = MagicMock(return_value=0.8)
+        self.collect_knowldegebase.get_local_llm_score = MagicMock(side_effect=get_local_llm_score)
+
+        result = self.collect_knowldegebase.collect()
+        self.assertEqual([history.named_entity_label for history, _ in result], ['planetary', 'non planetary'])
+        self.assertEqual([[record.bibcode for record in records] for _, records in result],
+                         [[solrdata.doc_1['bibcode']] * 2, [solrdata.doc_2['bibcode']]])
+
 
 if __name__ == '__main__':
     unittest.main()
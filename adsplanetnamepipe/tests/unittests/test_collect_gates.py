@@ -0,0 +1,67 @@
+import sys, os
+project_home = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+if project_home not in sys.path:
+    sys.path.insert(0, project_home)
+
+
+import unittest
+from unittest.mock import patch
+
+from adsplanetnamepipe.utils.collect_gates import CollectGates
+
+
+class TestCollectGates(unittest.TestCase):
+
+    def setUp(self):
+        """ Set up and clear the stats of the process """
+
+        self.collect_gates = CollectGates()
+        for key in CollectGates.stats:
+            CollectGates.stats[key] = 0
+
+    def test_check_paper_relevance(self):
+        """ test check_paper_relevance method """
+
+        self.assertTrue(self.collect_gates.check_paper_relevance(0.6, 3))
+        self.assertFalse(self.collect_gates.check_paper_relevance(0.59, 3))
+
+        stats = self.collect_gates.get_stats()
+        self.assertEqual((stats['docs'], stats['gated_paper_relevance']), (2, 1))
+        self.assertEqual((stats['fulltext_keywords_calls_saved'], stats['keywords_calls_saved'], stats['local_llm_calls_saved']), (1, 3, 3))
+
+    def test_check_excerpts_left(self):
+        """ test check_excerpts_left method """
+
+        # nothing processed yet
+        self.assertTrue(self.collect_gates.check_excerpts_left(0, [], 4, 4))
+        # two excerpts left, at best (0.2 + 2) / 3 is above 0.5
+        self.assertTrue(self.collect_gates.check_excerpts_left(2, [0.2], 4, 2))
+        # one excerpt left, at best (0.2 + 0.1 + 1) / 3 is below 0.5
+        self.assertFalse(self.collect_gates.check_excerpts_left(3, [0.2, 0.1], 4, 1))
+        # one excerpt left, at best 2 of 6 excerpts are kept
+        self.assertFalse(self.collect_gates.check_excerpts_left(1, [], 6, 1))
+
+        stats = self.collect_gates.get_stats()
+        self.assertEqual((stats['gated_local_llm'], stats['gated_excerpts']), (1, 1))
+        self.assertEqual((stats['fulltext_keywords_calls_saved'], stats['keywords_calls_saved']), (0, 2))
+
+    def test_check(self):
+        """ test check method, the thresholds collect_KB_positive applied at the end """
+
+        self.assertTrue(self.collect_gates.check(0.6, 2, [0.5, 0.5], 4))
+        self.assertFalse(self.collect_gates.check(0.6, 2, [0.5, 0.4], 4))
+        self.assertFalse(self.collect_gates.check(0.5, 2, [0.5, 0.5], 4))
+        self.assertFalse(self.collect_gates.check(0.6, 2, [0.5, 0.5], 5))
+        self.assertFalse(self.collect_gates.check(0.6, 1, [], 1))
+
+    def test_log_stats(self):
+        """ test log_stats method """
+
+        self.collect_gates.check_paper_relevance(0.1, 2)
+        with patch('adsplanetnamepipe.utils.collect_gates.logger.info') as mock_info_logger:
+            self.collect_gates.log_stats('Rayleigh')
+            self.assertTrue(mock_info_logger.call_args.args[0].startswith("Collect gates after Rayleigh: {'docs': 1, 'gated_paper_relevance': 1"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import sys, os
+project_home = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+if project_home not in sys.path:
+    sys.path.insert(0, project_home)
+
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from adsplanetnamepipe.utils.end_to_end_context import EndToEndContext
+
+from adsplanetnamepipe.tests.unittests.stubdata import solrdata
+
+
+class TestEndToEndContext(unittest.TestCase):
+
+    def test_get_excerpts(self):
+        """ test that the excerpts of a doc are computed once, by whichever phase gets them first """
+
+        context = EndToEndContext()
+        collect_match_excerpt = MagicMock(forward=MagicMock(return_value=(True, ['an excerpt'])))
+        identify_match_excerpt = MagicMock(forward=MagicMock(return_value=(True, ['another excerpt'])))
+
+        self.assertEqual(context.get_excerpts(collect_match_excerpt, solrdata.doc_1, None), (True, ['an excerpt']))
+        self.assertEqual(context.get_excerpts(identify_match_excerpt, solrdata.doc_1, None), (True, ['an excerpt']))
+        identify_match_excerpt.forward.assert_not_called()
+
+        self.assertEqual(context.get_excerpts(identify_match_excerpt, solrdata.doc_2, None), (True, ['another excerpt']))
+        self.assertEqual((context.stats['excerpts_hits'], context.stats['excerpts_misses']), (1, 2))
+
+    def test_get_keywords(self):
+        """ test that the keywords and special keywords of an excerpt are computed once """
+
+        context = EndToEndContext()
+        extract_keywords = MagicMock(forward=MagicMock(return_value=['ripple', 'mars']),
+                                     forward_special=MagicMock(return_value=['topography']))
+
+        for _ in range(3):
+            self.assertEqual(context.get_keywords(extract_keywords, 'an excerpt', num_keywords=10), ['ripple', 'mars'])
+            self.assertEqual(context.get_special_keywords(extract_keywords, 'an excerpt'), ['topography'])
+        extract_keywords.forward.assert_called_once_with('an excerpt', num_keywords=10)
+        extract_keywords.forward_special.assert_called_once_with('an excerpt')
+
+        # a different number of keywords is another result
+        context.get_keywords(extract_keywords, 'an excerpt', num_keywords=20)
+        self.assertEqual(extract_keywords.forward.call_count, 2)
+
+        # no keywords is kept as well
+        extract_keywords.forward.return_value = []
+        self.assertEqual(context.get_keywords(extract_keywords, 'no keywords', num_keywords=10), [])
+        self.assertEqual(context.get_keywords(extract_keywords, 'no keywords', num_keywords=10), [])
+        self.assertEqual(extract_keywords.forward.call_count, 3)
+
+    def test_log_stats(self):
+        """ test log_stats method """
+
+        context = EndToEndContext()
+        with patch('adsplanetnamepipe.utils.end_to_end_context.logger.info') as mock_info_logger:
+            context.log_stats('Rayleigh')
+            self.assertTrue(mock_info_logger.call_args.args[0].startswith("End to end context for Rayleigh: {'excerpts_hits': 0"))
+
+
+if __name__ == '__main__':
+    unittest.main()
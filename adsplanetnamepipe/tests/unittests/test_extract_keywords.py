@@ -6,8 +6,9 @@ if project_home not in sys.path:
 
 import unittest
 from unittest.mock import MagicMock, patch
+import tempfile
 
-from adsplanetnamepipe.utils.extract_keywords import ExtractKeywords
+from adsplanetnamepipe.utils.extract_keywords import ExtractKeywords, CorpusIdf, TfidfWrapper
 from adsplanetnamepipe.utils.common import EntityArgs, Synonyms
 
 from adsplanetnamepipe.tests.unittests.stubdata import solrdata
@@ -122,6 +123,27 @@ class TestExtractKeywords(unittest.TestCase):
         result = self.extract_keywords.forward_doc(solrdata.doc_3, vocabulary, usgs_term=False)
         self.assertEqual(sorted(result), sorted(['ripple', 'figure', 'exposed', 'rockingham', 'drake']))
 
+    def test_forward_docs(self):
+        """ test forward_docs method -- extracting keywords from the fulltext of multiple docs in one batch """
+
+        self.extract_keywords.tfidf.extract_top_keywords_docs = MagicMock(return_value=[
+            ['crater', 'rayleigh', 'ripple', 'figure', 'exposed'],
+            ['ripple', 'figure', 'exposed', 'rockingham', 'drake'],
+        ])
+        vocabulary = Synonyms().add_synonyms([self.args.target,
+                                              self.args.feature_type, self.args.feature_type_plural,
+                                              self.args.feature_name])
+        # only the second doc has no match with the vocabulary, hence is included for non usgs term
+        result = self.extract_keywords.forward_docs([solrdata.doc_1, solrdata.doc_3], vocabulary, usgs_term=False)
+        self.assertEqual(result, [[], ['ripple', 'figure', 'exposed', 'rockingham', 'drake']])
+
+        # and only the first doc is included for usgs term
+        result = self.extract_keywords.forward_docs([solrdata.doc_1, solrdata.doc_3], vocabulary, usgs_term=True, num_keywords=3)
+        self.assertEqual(result, [['crater', 'rayleigh', 'ripple'], []])
+
+        # the vocabulary regex is compiled once
+        self.assertEqual(len(self.extract_keywords.re_vocabulary), 1)
+
     def test_spacy_extract_top_keywords(self):
         """ test SpacyWrapper's extract_top_keywords """
 
@@ -168,6 +190,85 @@ class TestExtractKeywords(unittest.TestCase):
         result = self.extract_keywords.tfidf.extract_top_keywords(solrdata.doc_1)
         self.assertEqual(sorted(result), sorted(expected_keywords))
 
+    def test_tfidf_extract_top_keywords_docs(self):
+        """ test TfidfWrapper's extract_top_keywords_docs returns the same keywords as extract_top_keywords per doc """
+
+        docs = [solrdata.doc_1, solrdata.doc_2, solrdata.doc_3]
+        result = self.extract_keywords.tfidf.extract_top_keywords_docs(docs)
+        self.assertEqual(result, [self.extract_keywords.tfidf.extract_top_keywords(doc) for doc in docs])
+
+        # no docs, or docs with no tokens
+        self.assertEqual(self.extract_keywords.tfidf.extract_top_keywords_docs([]), [])
+        self.assertEqual(self.extract_keywords.tfidf.extract_top_keywords_docs([{'title': [''], 'body': ''}]), [[]])
+
+    def test_corpus_idf(self):
+        """ test CorpusIdf's incremental update and persistence """
+
+        with tempfile.TemporaryDirectory() as idf_path:
+            corpus_idf = CorpusIdf(idf_path)
+            self.assertEqual(corpus_idf.num_docs, 0)
+            self.assertFalse(corpus_idf.is_ready())
+            self.assertFalse(corpus_idf.update([]))
+
+            self.assertTrue(corpus_idf.update([solrdata.doc_1, solrdata.doc_2]))
+            self.assertTrue(corpus_idf.update([solrdata.doc_3]))
+            self.assertEqual(corpus_idf.num_docs, 3)
+
+            # the docs already counted are not counted again, unless their fulltext has been modified
+            self.assertFalse(corpus_idf.update([solrdata.doc_1, solrdata.doc_3, solrdata.doc_3]))
+            self.assertEqual(corpus_idf.num_docs, 3)
+            self.assertTrue(corpus_idf.update([dict(solrdata.doc_1, fulltext_mtime='2024-01-01T00:00:00Z')]))
+            self.assertEqual(corpus_idf.num_docs, 4)
+            self.assertEqual(len(corpus_idf.load_counted()), 4)
+
+            # read back from the files, idf of a term in all the docs, in two docs (doc_1 is counted twice), and in no docs
+            corpus_idf = CorpusIdf(idf_path)
+            self.assertEqual(corpus_idf.num_docs, 4)
+            idf = corpus_idf.idf(['the', 'rockingham', 'notaterminthecorpus'])
+            self.assertAlmostEqual(idf[0], 1.0)
+            self.assertAlmostEqual(idf[1], 1.5108, places=4)
+            self.assertAlmostEqual(idf[2], 2.6094, places=4)
+
+    def test_corpus_idf_refresh(self):
+        """ test that CorpusIdf reloads the table once another process has updated it """
+
+        with tempfile.TemporaryDirectory() as idf_path:
+            corpus_idf = CorpusIdf(idf_path)
+            corpus_idf.min_num_docs = 2
+            self.assertFalse(corpus_idf.is_ready())
+
+            CorpusIdf(idf_path).update([solrdata.doc_1, solrdata.doc_2])
+            self.assertEqual(corpus_idf.num_docs, 0)
+            self.assertTrue(corpus_idf.is_ready())
+            self.assertEqual(corpus_idf.num_docs, 2)
+
+    def test_tfidf_extract_top_keywords_corpus_idf(self):
+        """ test TfidfWrapper's extract_top_keywords with corpus idf """
+
+        with tempfile.TemporaryDirectory() as idf_path:
+            corpus_idf = CorpusIdf(idf_path)
+            corpus_idf.update([solrdata.doc_1, solrdata.doc_2, solrdata.doc_3])
+            tfidf = TfidfWrapper(corpus_idf)
+
+            # not enough docs in the corpus yet, so idf is computed per doc
+            self.assertEqual(tfidf.extract_top_keywords(solrdata.doc_1), self.extract_keywords.tfidf.extract_top_keywords(solrdata.doc_1))
+
+            # now use the corpus idf
+            corpus_idf.min_num_docs = 3
+            result = tfidf.extract_top_keywords(solrdata.doc_1)
+            self.assertEqual(result[:5], ['crater', 'rayleigh', 'ripple', 'figure', 'rockingham'])
+            self.assertEqual(tfidf.extract_top_keywords_docs([solrdata.doc_2, solrdata.doc_1])[1], result)
+
+    def test_update_corpus(self):
+        """ test update_corpus method, when corpus idf is not enabled and when it is """
+
+        self.assertFalse(self.extract_keywords.update_corpus([solrdata.doc_1]))
+
+        with tempfile.TemporaryDirectory() as idf_path:
+            self.extract_keywords.tfidf.corpus_idf = CorpusIdf(idf_path)
+            self.assertTrue(self.extract_keywords.update_corpus([solrdata.doc_1]))
+            self.assertEqual(self.extract_keywords.tfidf.corpus_idf.num_docs, 1)
+
     def test_validate_feature_name_spacy(self):
         """ test SpacyWrapper's validate_feature_name """
 
@@ -0,0 +1,65 @@
+import sys, os
+project_home = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+if project_home not in sys.path:
+    sys.path.insert(0, project_home)
+
+
+import unittest
+from datetime import datetime
+
+from adsplanetnamepipe.utils.gazetteer_snapshot import GazetteerSnapshot
+
+
+class TestGazetteerSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        """ Set up the snapshot """
+
+        self.snapshot = GazetteerSnapshot(
+            plural_feature_types={'Crater': 'Craters', 'Large ringed feature': ''},
+            context_ambiguous_feature_names={'Rayleigh': ['asteroid', 'main belt asteroid', 'Moon', 'Mars']},
+            multi_token_containing_feature_names={'Rayleigh': ['Rayleigh A', 'Rayleigh B', 'Rayleigh C', 'Rayleigh D']},
+            name_entity_labels=[{'label': 'planetary', 'value': 1}, {'label': 'non planetary', 'value': 0}],
+            all_targets=['Mars', 'Mercury', 'Moon', 'Venus']
+        )
+
+    def test_get_entity_args(self):
+        """ test get_entity_args method """
+
+        entity_args = self.snapshot.get_entity_args('Rayleigh', 'Mars', 'Crater', datetime(2000, 1, 1))
+        self.assertEqual(entity_args.toJSON(), {
+            'target': 'Mars',
+            'feature_type': 'Crater',
+            'feature_type_plural': 'Craters',
+            'feature_name': 'Rayleigh',
+            'context_ambiguous_feature_names': ['asteroid', 'main belt asteroid', 'Moon', 'Mars'],
+            'multi_token_containing_feature_names': ['Rayleigh A', 'Rayleigh B', 'Rayleigh C', 'Rayleigh D'],
+            'name_entity_labels': [{'label': 'planetary', 'value': 1}, {'label': 'non planetary', 'value': 0}],
+            'timestamp': '2000-01-01',
+            'all_targets': ['Mars', 'Mercury', 'Moon', 'Venus']
+        })
+
+        # the lists are not shared with the snapshot
+        entity_args.all_targets.append('Pluto')
+        entity_args.context_ambiguous_feature_names.clear()
+        self.assertEqual(len(self.snapshot.all_targets), 4)
+        self.assertEqual(len(self.snapshot.context_ambiguous_feature_names['Rayleigh']), 4)
+
+    def test_get_entity_args_not_found(self):
+        """ test get_entity_args method for the entities that are not in the tables """
+
+        entity_args = self.snapshot.get_entity_args('Galle', 'Mars', 'Mons', datetime(2000, 1, 1))
+        self.assertEqual(entity_args.feature_type_plural, '')
+        self.assertEqual(entity_args.context_ambiguous_feature_names, [])
+        self.assertEqual(entity_args.multi_token_containing_feature_names, [])
+
+    def test_get_stats(self):
+        """ test get_stats method """
+
+        self.assertEqual(self.snapshot.get_stats(), {'plural_feature_types': 2, 'context_ambiguous_feature_names': 1,
+                                                     'multi_token_containing_feature_names': 1, 'name_entity_labels': 2,
+                                                     'all_targets': 4})
+
+
+if __name__ == '__main__':
+    unittest.main()
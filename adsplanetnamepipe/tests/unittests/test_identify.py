@@ -5,13 +5,16 @@ if project_home not in sys.path:
 
 
 import unittest
+import json
 from unittest.mock import MagicMock, patch
 
 from typing import List, Tuple
 
-from adsplanetnamepipe.identify import IdentifyPlanetaryEntities
+from adsplanetnamepipe.identify import IdentifyPlanetaryEntities, IdentifyScoreStage, IdentifyLabelStage
 from adsplanetnamepipe.models import NamedEntity, NamedEntityHistory
 from adsplanetnamepipe.utils.common import EntityArgs
+from adsplanetnamepipe.utils.task_checkpoint import TaskCheckpoint
+from adsplanetnamepipe.utils.task_budget import TaskBudget
 
 from adsplanetnamepipe.tests.unittests.stubdata import solrdata
 from adsplanetnamepipe.tests.unittests.stubdata import excerpts
@@ -39,6 +42,23 @@ class TestCollectKnowldegeBase(unittest.TestCase):
         )
         self.identify_planetary_entities = IdentifyPlanetaryEntities(self.args, [[]], [[]])
 
+    def test_update_args(self):
+        """ test update_args points the components to the new feature name, reusing them, and rebuilds the knowledge graphs """
+
+        extract_keywords = self.identify_planetary_entities.extract_keywords
+        args = EntityArgs(**dict(self.args.toJSON(), feature_name='Galle'))
+        self.identify_planetary_entities.update_args(args, [['crater', 'rim']], [], path_weights_negative={'Galle': 0, 'bond': 1.0})
+
+        self.assertIs(self.identify_planetary_entities.extract_keywords, extract_keywords)
+        for component in [self.identify_planetary_entities, self.identify_planetary_entities.search_retrieval,
+                          self.identify_planetary_entities.match_excerpt, self.identify_planetary_entities.adsabs_ner,
+                          self.identify_planetary_entities.extract_keywords, self.identify_planetary_entities.paper_relevance,
+                          self.identify_planetary_entities.local_llm, self.identify_planetary_entities.label_and_confidence]:
+            self.assertEqual(component.args.feature_name, 'Galle')
+        self.assertEqual(self.identify_planetary_entities.knowledge_graph_positive.path_weights, {'Galle': 0, 'crater': 1.0, 'rim': 1.0})
+        self.assertEqual(self.identify_planetary_entities.knowledge_graph_negative.path_weights, {'Galle': 0, 'bond': 1.0})
+        self.assertIn('galle', self.identify_planetary_entities.vocabulary)
+
     def test_get_knowledge_graph_score(self):
         """ test get_knowledge_graph_score method """
 
@@ -47,10 +67,18 @@ class TestCollectKnowldegeBase(unittest.TestCase):
         score = self.identify_planetary_entities.get_knowledge_graph_score([])
         self.assertEqual(score, 0.7)
 
+    def test_get_knowledge_graph_scores(self):
+        """ test get_knowledge_graph_scores method """
+
+        self.identify_planetary_entities.knowledge_graph_positive.forward_many = MagicMock(return_value=[0.7, 2.4])
+        self.identify_planetary_entities.knowledge_graph_negative.forward_many = MagicMock(return_value=[0.3, 0.6])
+        scores = self.identify_planetary_entities.get_knowledge_graph_scores([['crater'], ['ripple']])
+        self.assertEqual(scores, [0.7, 0.8])
+
     def test_get_paper_relevance_score(self):
         """ test get_paper_relevance_score method """
 
-        self.identify_planetary_entities.paper_relevance.forward = MagicMock(return_value=0.8)
+        self.identify_planetary_entities.paper_relevance.forward_doc = MagicMock(return_value=0.8)
         score = self.identify_planetary_entities.get_paper_relevance_score(solrdata.doc_1)
         self.assertEqual(score, 0.8)
 
@@ -75,7 +103,7 @@ class TestCollectKnowldegeBase(unittest.TestCase):
         self.identify_planetary_entities.knowledge_graph_positive.forward = MagicMock(return_value=0.7)
         self.identify_planetary_entities.knowledge_graph_negative.forward = MagicMock(return_value=0.3)
 
-        self.identify_planetary_entities.get_knowledge_graph_score = MagicMock(return_value=0.7)
+        self.identify_planetary_entities.get_knowledge_graph_scores = MagicMock(return_value=[0.7])
         self.identify_planetary_entities.get_paper_relevance_score = MagicMock(return_value=0.8)
         self.identify_planetary_entities.get_local_llm_score = MagicMock(return_value=0.7)
 
@@ -94,6 +122,201 @@ class TestCollectKnowldegeBase(unittest.TestCase):
         self.assertEqual(identified_doc[0].excerpt, excerpts.doc_1_excerpts[0]['excerpt'])
         self.assertEqual(identified_doc[0].keywords, keywords_forward)
         self.assertEqual(identified_doc[0].special_keywords, special_keywords_forward)
+        self.assertEqual(identified_doc[0].knowledge_graph_score, 0.7)
+        self.assertEqual(identified_doc[0].local_llm_score, 0.7)
+        self.assertEqual(identified_doc[0].named_entity_label, 'planetary')
+        self.assertEqual(identified_doc[0].confidence_score, 0.98)
+
+    def test_identify_stages(self):
+        """ test that running the stages of identify one after the other is the same as identify """
+
+        self.identify_planetary_entities.match_excerpt.forward = MagicMock(return_value=(True, [excerpts.doc_1_excerpts[0]['excerpt'], 'no keywords']))
+        self.identify_planetary_entities.extract_keywords.forward = MagicMock(side_effect=lambda excerpt, num_keywords: ['ripple', 'mars'] if excerpt != 'no keywords' else [])
+        self.identify_planetary_entities.extract_keywords.forward_special = MagicMock(return_value=['ejecta'])
+        self.identify_planetary_entities.get_knowledge_graph_scores = MagicMock(return_value=[0.7])
+        self.identify_planetary_entities.get_paper_relevance_score = MagicMock(return_value=0.8)
+        self.identify_planetary_entities.get_local_llm_score = MagicMock(return_value=0.5)
+
+        extracted = self.identify_planetary_entities.extract_excerpts([solrdata.doc_1])
+        self.assertEqual(extracted, [{
+            'bibcode': solrdata.doc_1['bibcode'],
+            'database': solrdata.doc_1['database'],
+            'title': solrdata.doc_1['title'],
+            'abstract': solrdata.doc_1.get('abstract', None),
+            'paper_relevance_score': 0.8,
+            'excerpts': [{'excerpt': excerpts.doc_1_excerpts[0]['excerpt'], 'keywords': ['ripple', 'mars']}],
+        }])
+        scored = self.identify_planetary_entities.score_excerpts(extracted)
+        self.assertEqual(scored[0]['excerpts'][0]['local_llm_score'], 0.5)
+        self.assertEqual(scored[0]['excerpts'][0]['special_keywords'], ['ejecta'])
+        staged = self.identify_planetary_entities.label_excerpts(scored)
+
+        self.identify_planetary_entities.search_retrieval.identify_terms_query = MagicMock(return_value=[solrdata.doc_1])
+        identified = self.identify_planetary_entities.identify()
+        columns = ['bibcode', 'excerpt', 'keywords_item_id', 'keywords', 'special_keywords', 'knowledge_graph_score',
+                   'paper_relevance_score', 'local_llm_score', 'confidence_score', 'named_entity_label']
+        self.assertEqual([[getattr(record, column) for column in columns] for _, records in staged for record in records],
+                         [[getattr(record, column) for column in columns] for _, records in identified for record in records])
+        self.assertEqual(len(staged), 1)
+
+        # nothing to label
+        self.assertEqual(self.identify_planetary_entities.label_excerpts([]), [])
+
+    def test_identify_stage_components(self):
+        """ test that the score and label stages, set up on their own, give the same records as the pipeline """
+
+        extracted = [{'bibcode': solrdata.doc_1['bibcode'], 'database': solrdata.doc_1['database'], 'title': solrdata.doc_1['title'],
+                      'abstract': solrdata.doc_1.get('abstract', None), 'paper_relevance_score': 0.8,
+                      'excerpts': [{'excerpt': excerpts.doc_1_excerpts[0]['excerpt'], 'keywords': ['ripple', 'mars']}]}]
+
+        score_stage = IdentifyScoreStage(self.args)
+        self.assertFalse(hasattr(score_stage, 'extract_keywords'))
+        score_stage.local_llm.forward = MagicMock(return_value=0.5)
+        score_stage.nasa.forward = MagicMock(return_value=['ejecta'])
+        scored = score_stage.score_excerpts(json.loads(json.dumps(extracted)))
+        self.assertEqual(scored[0]['excerpts'][0]['local_llm_score'], 0.5)
+        self.assertEqual(scored[0]['excerpts'][0]['special_keywords'], ['ejecta'])
+
+        label_stage = IdentifyLabelStage(self.args, [[]], [[]])
+        self.assertFalse(hasattr(label_stage, 'match_excerpt'))
+        label_stage.get_knowledge_graph_scores = MagicMock(return_value=[0.7])
+        self.identify_planetary_entities.get_knowledge_graph_scores = MagicMock(return_value=[0.7])
+        columns = ['bibcode', 'excerpt', 'keywords', 'special_keywords', 'knowledge_graph_score',
+                   'paper_relevance_score', 'local_llm_score', 'confidence_score', 'named_entity_label']
+        self.assertEqual([[getattr(record, column) for column in columns] for _, records in label_stage.label_excerpts(scored) for record in records],
+                         [[getattr(record, column) for column in columns] for _, records in self.identify_planetary_entities.label_excerpts(scored) for record in records])
+
+        # pointed to another feature name
+        args = EntityArgs(**dict(self.args.toJSON(), feature_name='Galle'))
+        score_stage.update_args(args)
+        label_stage.update_args(args, [['crater', 'rim']], [])
+        for component in [score_stage, score_stage.local_llm, label_stage, label_stage.label_and_confidence]:
+            self.assertEqual(component.args.feature_name, 'Galle')
+        self.assertEqual(label_stage.knowledge_graph_positive.path_weights, {'Galle': 0, 'crater': 1.0, 'rim': 1.0})
+
+    def test_identify_overlapped(self):
+        """ test that running the docs through the stage pipeline gives the same records, in the same order, as identify """
+
+        docs = [dict(solrdata.doc_1, bibcode=str(i)) for i in range(5)]
+        self.identify_planetary_entities.search_retrieval.identify_terms_query = MagicMock(return_value=docs)
+        # every other doc has no excerpts with keywords
+        self.identify_planetary_entities.match_excerpt.forward = MagicMock(return_value=(True, [excerpts.doc_1_excerpts[0]['excerpt']]))
+        self.identify_planetary_entities.extract_keywords.forward = MagicMock(side_effect=[['ripple', 'mars'], []] * 3)
+        self.identify_planetary_entities.extract_keywords.forward_special = MagicMock(return_value=['ejecta'])
+        self.identify_planetary_entities.get_knowledge_graph_scores = MagicMock(return_value=[0.7])
+        self.identify_planetary_entities.get_paper_relevance_score = MagicMock(side_effect=lambda doc: int(doc['bibcode']) / 10)
+        self.identify_planetary_entities.get_local_llm_score = MagicMock(return_value=0.5)
+
+        serial = self.identify_planetary_entities.identify()
+        self.identify_planetary_entities.extract_keywords.forward.side_effect = [['ripple', 'mars'], []] * 3
+        with patch.dict('adsplanetnamepipe.identify.config', {'PLANETARYNAMES_PIPELINE_IDENTIFY_THREADS': 3}):
+            overlapped = self.identify_planetary_entities.identify()
+
+        columns = ['bibcode', 'excerpt', 'keywords', 'special_keywords', 'knowledge_graph_score',
+                   'paper_relevance_score', 'local_llm_score', 'confidence_score', 'named_entity_label']
+        self.assertEqual([[getattr(record, column) for column in columns] for _, records in serial for record in records],
+                         [[getattr(record, column) for column in columns] for _, records in overlapped for record in records])
+        self.assertEqual([records[0].bibcode for _, records in overlapped], ['0', '2', '4'])
+
+    def test_identify_resume_from_checkpoint(self):
+        """ test that when identify is retried, the docs saved to the checkpoint are not processed again """
+
+        class CheckpointStore():
+            """ stand in for the app, keeping the checkpoints in memory """
+            def __init__(self):
+                self.checkpoints = {}
+            def get_identify_checkpoints(self, *key):
+                return dict(self.checkpoints)
+            def insert_identify_checkpoint(self, feature_name, feature_type, target, timestamp, bibcode, fulltext_mtime, scored):
+                self.checkpoints[bibcode] = (fulltext_mtime, json.loads(json.dumps(scored)))
+                return True
+            def remove_identify_checkpoints(self, *key):
+                count = len(self.checkpoints)
+                self.checkpoints.clear()
+                return count
+
+        docs = [dict(solrdata.doc_1, bibcode=str(i), fulltext_mtime='2023-01-01T00:00:00.000Z') for i in range(5)]
+        self.identify_planetary_entities.search_retrieval.identify_terms_query = MagicMock(return_value=docs)
+        # every other doc has no excerpts with keywords
+        self.identify_planetary_entities.match_excerpt.forward = MagicMock(return_value=(True, [excerpts.doc_1_excerpts[0]['excerpt']]))
+        self.identify_planetary_entities.extract_keywords.forward = MagicMock(side_effect=[['ripple', 'mars'], []] * 3)
+        self.identify_planetary_entities.extract_keywords.forward_special = MagicMock(return_value=['ejecta'])
+        self.identify_planetary_entities.get_knowledge_graph_scores = MagicMock(return_value=[0.7])
+        self.identify_planetary_entities.get_paper_relevance_score = MagicMock(side_effect=lambda doc: int(doc['bibcode']) / 10)
+        self.identify_planetary_entities.get_local_llm_score = MagicMock(return_value=0.5)
+        serial = self.identify_planetary_entities.identify()
+
+        store = CheckpointStore()
+        self.identify_planetary_entities.checkpoint = TaskCheckpoint(self.args, store)
+        # the task fails on the last doc
+        def get_local_llm_score(doc, excerpt):
+            if doc['bibcode'] == '4':
+                raise ConnectionError()
+            return 0.5
+        self.identify_planetary_entities.extract_keywords.forward.side_effect = [['ripple', 'mars'], []] * 3
+        self.identify_planetary_entities.get_local_llm_score.side_effect = get_local_llm_score
+        with self.assertRaises(ConnectionError):
+            self.identify_planetary_entities.identify()
+        self.assertEqual(sorted(store.checkpoints.keys()), ['0', '1', '2', '3'])
+        self.assertIsNone(store.checkpoints['1'][1])
+
+        # the retry processes only the last doc, and the records are the same as of a run that did not fail
+        self.identify_planetary_entities.match_excerpt.forward.reset_mock()
+        self.identify_planetary_entities.extract_keywords.forward.side_effect = [['ripple', 'mars']]
+        self.identify_planetary_entities.get_local_llm_score.side_effect = None
+        with patch('adsplanetnamepipe.utils.task_checkpoint.logger.info') as mock_info_logger:
+            resumed = self.identify_planetary_entities.identify()
+            mock_info_logger.assert_called_once_with("Resuming identify for Rayleigh/Crater/Mars: 4 of 5 docs were processed earlier.")
+        self.assertEqual([call.args[0]['bibcode'] for call in self.identify_planetary_entities.match_excerpt.forward.call_args_list], ['4'])
+
+        columns = ['bibcode', 'excerpt', 'keywords', 'special_keywords', 'knowledge_graph_score',
+                   'paper_relevance_score', 'local_llm_score', 'confidence_score', 'named_entity_label']
+        self.assertEqual([[getattr(record, column) for column in columns] for _, records in serial for record in records],
+                         [[getattr(record, column) for column in columns] for _, records in resumed for record in records])
+
+        # a doc whose fulltext has been modified since is processed again
+        docs[0]['fulltext_mtime'] = '2024-01-01T00:00:00.000Z'
+        self.assertEqual(list(self.identify_planetary_entities.checkpoint.load(docs).keys()), ['1', '2', '3', '4'])
+        self.identify_planetary_entities.checkpoint = None
+
+    def test_identify_within_budget(self):
+        """ test that identify stops taking new docs once the budget is spent, and leaves them in the budget """
+
+        docs = [dict(solrdata.doc_1, bibcode=str(i)) for i in range(5)]
+        self.identify_planetary_entities.search_retrieval.identify_terms_query = MagicMock(return_value=docs)
+        self.identify_planetary_entities.match_excerpt.forward = MagicMock(return_value=(True, [excerpts.doc_1_excerpts[0]['excerpt']]))
+        self.identify_planetary_entities.extract_keywords.forward = MagicMock(return_value=['ripple', 'mars'])
+        self.identify_planetary_entities.extract_keywords.forward_special = MagicMock(return_value=['ejecta'])
+        self.identify_planetary_entities.get_knowledge_graph_scores = MagicMock(return_value=[0.7])
+        self.identify_planetary_entities.get_paper_relevance_score = MagicMock(return_value=0.8)
+        self.identify_planetary_entities.get_local_llm_score = MagicMock(return_value=0.5)
+
+        for num_threads in [0, 3]:
+            with patch.dict('adsplanetnamepipe.identify.config', {'PLANETARYNAMES_PIPELINE_IDENTIFY_THREADS': num_threads}):
+                budget = TaskBudget(max_seconds=0, max_docs=3)
+                self.identify_planetary_entities.budget = budget
+                result = self.identify_planetary_entities.identify()
+            self.assertEqual([records[0].bibcode for _, records in result], ['0', '1', '2'])
+            self.assertEqual([doc['bibcode'] for doc in budget.docs_left], ['3', '4'])
+        self.identify_planetary_entities.budget = None
+
+    def test_identify_labels_in_one_call(self):
+        """ test that identify gets the labels and confidences of all the docs with one call to the model """
+
+        self.identify_planetary_entities.search_retrieval.identify_terms_query = MagicMock(return_value=[solrdata.doc_1, solrdata.doc_1])
+        self.identify_planetary_entities.match_excerpt.forward = MagicMock(return_value=(True, [excerpts.doc_1_excerpts[0]['excerpt']]))
+        self.identify_planetary_entities.extract_keywords.forward = MagicMock(return_value=['ripple', 'mars'])
+        self.identify_planetary_entities.extract_keywords.forward_special = MagicMock(return_value=[])
+        self.identify_planetary_entities.get_knowledge_graph_scores = MagicMock(side_effect=[[0.7], [0.2]])
+        self.identify_planetary_entities.get_paper_relevance_score = MagicMock(return_value=0.8)
+        self.identify_planetary_entities.get_local_llm_score = MagicMock(return_value=0.5)
+        self.identify_planetary_entities.label_and_confidence.forward_many = MagicMock(return_value=[('planetary', 0.9), ('non planetary', 0.3)])
+
+        result = self.identify_planetary_entities.identify()
+
+        self.identify_planetary_entities.label_and_confidence.forward_many.assert_called_once_with([(0.7, 0.8, 0.5), (0.2, 0.8, 0.5)])
+        self.assertEqual([(identified_doc[0].named_entity_label, identified_doc[0].confidence_score) for _, identified_doc in result],
+                         [('planetary', 0.9), ('non planetary', 0.3)])
 
 
     def test_identify_no_special_keywords(self):
@@ -109,7 +332,7 @@ class TestCollectKnowldegeBase(unittest.TestCase):
         self.identify_planetary_entities.knowledge_graph_positive.forward = MagicMock(return_value=0.7)
         self.identify_planetary_entities.knowledge_graph_negative.forward = MagicMock(return_value=0.3)
 
-        self.identify_planetary_entities.get_knowledge_graph_score = MagicMock(return_value=0.7)
+        self.identify_planetary_entities.get_knowledge_graph_scores = MagicMock(return_value=[0.7])
         self.identify_planetary_entities.get_paper_relevance_score = MagicMock(return_value=0.8)
         self.identify_planetary_entities.get_local_llm_score = MagicMock(return_value=0.7)
 
@@ -4,11 +4,11 @@ if project_home not in sys.path:
     sys.path.insert(0, project_home)
 
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import networkx as nx
 
-from adsplanetnamepipe.utils.knowledge_graph import KnowledgeGraph
+from adsplanetnamepipe.utils.knowledge_graph import KnowledgeGraph, KnowledgeGraphCSR, get_knowledge_graph_class
 from adsplanetnamepipe.utils.common import EntityArgs
 
 from adsplanetnamepipe.tests.unittests.stubdata import keywords
@@ -78,6 +78,44 @@ class TestKnowledgeGraph(unittest.TestCase):
         self.assertEqual(result_positive, expected_result_positive)
         self.assertEqual(result_negative, expected_result_negative)
 
+    def test_path_weights(self):
+        """ test that the path weights computed at build time are the same as querying the path of each keyword """
+
+        for collect in [keywords.collect_positive, keywords.collect_negative]:
+            knowledge_graph = KnowledgeGraph(self.args, [row[2] for row in collect], [row[3] for row in collect])
+            self.assertEqual(set(knowledge_graph.path_weights.keys()), set(knowledge_graph.graph.nodes))
+            for keyword in knowledge_graph.graph.nodes:
+                self.assertEqual(knowledge_graph.path_weights[keyword], knowledge_graph.query_path(keyword))
+
+        # no graph, no path weights
+        self.assertEqual(KnowledgeGraph(self.args, [], []).path_weights, {})
+
+    def test_forward_many(self):
+        """ test that scoring all the keyword lists at once is the same as scoring them one at a time """
+
+        identify_keywords = [row[2] for row in keywords.identify]
+        for knowledge_graph_class in [KnowledgeGraph, KnowledgeGraphCSR]:
+            for collect in [keywords.collect_positive, keywords.collect_negative]:
+                knowledge_graph = knowledge_graph_class(self.args, [row[2] for row in collect], [row[3] for row in collect])
+                self.assertEqual(knowledge_graph.forward_many(identify_keywords),
+                                 [knowledge_graph.forward(identify_keyword) for identify_keyword in identify_keywords])
+            self.assertEqual(knowledge_graph.forward_many([]), [])
+
+        # no graph
+        self.assertEqual(KnowledgeGraph(self.args, [], []).forward_many(identify_keywords[:2]), [-1, -1])
+
+    def test_forward_from_path_weights(self):
+        """ test that a knowledge graph created from the path weights of an earlier graph scores the same """
+
+        knowledge_graph = KnowledgeGraph(self.args, [row[2] for row in keywords.collect_positive],
+                                                    [row[3] for row in keywords.collect_positive])
+        knowledge_graph_from_path_weights = KnowledgeGraph(self.args, [], [], knowledge_graph.path_weights)
+        self.assertIsNone(knowledge_graph_from_path_weights.graph)
+
+        identify_keywords = [row[2] for row in keywords.identify]
+        self.assertEqual([knowledge_graph_from_path_weights.forward(identify_keyword) for identify_keyword in identify_keywords],
+                         [knowledge_graph.forward(identify_keyword) for identify_keyword in identify_keywords])
+
     def test_query_path_exception(self):
         """  """
 
@@ -98,6 +136,36 @@ class TestKnowledgeGraph(unittest.TestCase):
             self.assertEqual(result, 0)
             mock_graph.has_node.assert_called_once_with(identify_keywords[0][0])
 
+    def test_csr_backend(self):
+        """ test that the array-backed graph has the same edges and scores as the networkx graph """
+
+        identify_keywords = [row[2] for row in keywords.identify]
+        for collect in [keywords.collect_positive, keywords.collect_negative]:
+            for special_keywords in [[row[3] for row in collect], []]:
+                knowledge_graph = KnowledgeGraph(self.args, [row[2] for row in collect], special_keywords)
+                knowledge_graph_csr = KnowledgeGraphCSR(self.args, [row[2] for row in collect], special_keywords)
+
+                # each undirected edge is kept in both directions
+                self.assertEqual(knowledge_graph_csr.graph.nnz, 2 * knowledge_graph.graph.number_of_edges())
+                for u, v, weight in knowledge_graph.graph.edges(data='weight'):
+                    self.assertEqual(knowledge_graph_csr.graph[knowledge_graph_csr.keyword_ids[u], knowledge_graph_csr.keyword_ids[v]], weight)
+
+                self.assertEqual(knowledge_graph_csr.path_weights, knowledge_graph.path_weights)
+                self.assertEqual([knowledge_graph_csr.forward(identify_keyword) for identify_keyword in identify_keywords],
+                                 [knowledge_graph.forward(identify_keyword) for identify_keyword in identify_keywords])
+                self.assertEqual(knowledge_graph_csr.query_path(identify_keywords[0][0]), knowledge_graph.query_path(identify_keywords[0][0]))
+                self.assertEqual(knowledge_graph_csr.query_path('notakeyword'), 0)
+
+        # no graph
+        self.assertEqual(KnowledgeGraphCSR(self.args, [], []).forward(identify_keywords[0]), -1)
+
+    def test_get_knowledge_graph_class(self):
+        """ test get_knowledge_graph_class returns the configured backend """
+
+        self.assertEqual(get_knowledge_graph_class(), KnowledgeGraph)
+        with patch.dict('adsplanetnamepipe.utils.knowledge_graph.config', {'PLANETARYNAMES_PIPELINE_KNOWLEDGE_GRAPH_BACKEND': 'csr'}):
+            self.assertEqual(get_knowledge_graph_class(), KnowledgeGraphCSR)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -5,12 +5,16 @@ if project_home not in sys.path:
 
 import unittest
 from unittest.mock import MagicMock, patch
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import pandas as pd
 
+from tensorflow import keras
 from tensorflow.keras.layers import Layer
 
-from adsplanetnamepipe.utils.label_and_confidence import LabelAndConfidence
+from adsplanetnamepipe.utils.label_and_confidence import LabelAndConfidence, NumpyModel, train_attempt
 from adsplanetnamepipe.utils.common import EntityArgs
 
 
@@ -35,11 +39,24 @@ class TestKerasModel(unittest.TestCase):
     def test_init(self):
         """ test the __init__ method """
 
-        # Test case 1: train_mode=False and model file exists, so load
-        with patch('tensorflow.keras.models.load_model') as mock_load_model:
+        # Test case 1: train_mode=False and weights file exists, so load, once per process
+        with patch.dict(LabelAndConfidence.inference_models, clear=True), \
+             patch('tensorflow.keras.models.load_model') as mock_load_model, \
+             patch.object(NumpyModel, 'load', wraps=NumpyModel.load) as mock_numpy_load:
             label_and_confidence = LabelAndConfidence(self.args, train_mode=False)
-            mock_load_model.assert_called_once_with(label_and_confidence.model_file)
-            self.assertIsNotNone(label_and_confidence.model)
+            mock_load_model.assert_not_called()
+            mock_numpy_load.assert_called_once_with(label_and_confidence.weights_file)
+            self.assertIsInstance(label_and_confidence.model, NumpyModel)
+            self.assertIs(LabelAndConfidence(self.args, train_mode=False).model, label_and_confidence.model)
+            mock_numpy_load.assert_called_once()
+
+        # Test case 1a: train_mode=False and weights file does not exist, so export it from the keras model first
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+             patch.dict(LabelAndConfidence.inference_models, clear=True), \
+             patch.object(LabelAndConfidence, 'weights_file', tmp_dir + '/model_weights.npz'):
+            label_and_confidence = LabelAndConfidence(self.args, train_mode=False)
+            self.assertTrue(os.path.exists(label_and_confidence.weights_file))
+            self.assertIsInstance(label_and_confidence.model, NumpyModel)
 
         # Test case 2: train_mode=True, so call train and save
         with patch.object(LabelAndConfidence, 'train_and_save') as mock_train_and_save:
@@ -50,7 +67,8 @@ class TestKerasModel(unittest.TestCase):
         """ test the __init__ method when failing """
 
         # Test case 1: train_mode=False and an exception occurs during loading
-        with patch('tensorflow.keras.models.load_model', side_effect=Exception('Loading failed')), \
+        with patch.dict(LabelAndConfidence.inference_models, clear=True), \
+             patch.object(NumpyModel, 'load', side_effect=Exception('Loading failed')), \
              patch('adsplanetnamepipe.utils.label_and_confidence.logger.error') as mock_error_logger:
             label_and_confidence = LabelAndConfidence(self.args, train_mode=False)
             self.assertIsNone(label_and_confidence.model)
@@ -79,12 +97,35 @@ class TestKerasModel(unittest.TestCase):
         self.assertEqual(('planetary', 0.58), self.label_and_confidence.forward(0.7, 0.2, 0.5))
         self.assertEqual(('non planetary', 0.34), self.label_and_confidence.forward(0.7, 0.8, 0.2))
 
+    def test_forward_many(self):
+        """ test forward_many method """
+
+        scores_list = [(0.7, 0.8, 0.5), (0.2, 0.8, 0.5), (0.7, 0.2, 0.5), (0.7, 0.8, 0.2)]
+        self.assertEqual(self.label_and_confidence.forward_many(scores_list),
+                         [self.label_and_confidence.forward(*scores) for scores in scores_list])
+        self.assertEqual(self.label_and_confidence.forward_many([]), [])
+
+    @patch('adsplanetnamepipe.utils.label_and_confidence.logger.error')
+    def test_forward_many_fail(self, mock_error_logger):
+        """ test forward_many method when failing """
+
+        # Test case 1: getting exception
+        with patch.object(NumpyModel, 'predict', side_effect=Exception('Prediction error')):
+            results = self.label_and_confidence.forward_many([(0.5, 0.6, 0.7), (0.7, 0.8, 0.5)])
+            self.assertEqual(results, [('', -1), ('', -1)])
+            mock_error_logger.assert_called_with('Exception in forward_many method of LabelAndConfidence: Prediction error')
+
+        # Text case 2: model was not loaded
+        self.label_and_confidence.model = None
+        results = self.label_and_confidence.forward_many([(0.7, 0.8, 0.5)])
+        self.assertEqual(results, [('', -1)])
+
     @patch('adsplanetnamepipe.utils.label_and_confidence.logger.error')
     def test_forward_fail(self, mock_error_logger):
         """ test forward method when failing """
 
         # Test case 1: getting exception
-        with patch('tensorflow.keras.Model.predict', side_effect=Exception('Prediction error')):
+        with patch.object(NumpyModel, 'predict', side_effect=Exception('Prediction error')):
             results = self.label_and_confidence.forward(0.5, 0.6, 0.7)
             self.assertEqual(results, ('', -1))
             mock_error_logger.assert_called_with('Exception in forward method of LabelAndConfidence: Prediction error')
@@ -94,6 +135,28 @@ class TestKerasModel(unittest.TestCase):
         results = self.label_and_confidence.forward(0.7, 0.8, 0.5)
         self.assertEqual(results, ('', -1))
 
+    def test_numpy_model(self):
+        """ test that the numpy inference matches the keras model it was exported from """
+
+        keras_model = keras.models.load_model(self.label_and_confidence.model_file)
+        numpy_model = NumpyModel.from_keras(keras_model)
+        self.assertEqual([weight.shape for weight in numpy_model.weights], [(3, 16), (16, 8), (8, 8), (8, 1)])
+
+        # grid of the scores, each between 0 and 1
+        grid = np.linspace(0, 1, 11)
+        scores = np.array(np.meshgrid(grid, grid, grid)).reshape(3, -1).T
+        self.assertTrue(np.allclose(numpy_model.predict(scores), keras_model.predict(scores, verbose=0), atol=1e-6))
+
+        # the shipped weights file is the export of the shipped keras model
+        self.assertTrue(np.allclose(NumpyModel.load(self.label_and_confidence.weights_file).predict(scores),
+                                    numpy_model.predict(scores)))
+
+        # save and load round trip
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            numpy_model.save(tmp_dir + '/model_weights.npz')
+            self.assertTrue(np.array_equal(NumpyModel.load(tmp_dir + '/model_weights.npz').predict(scores),
+                                           numpy_model.predict(scores)))
+
     def test_train(self):
         """ test train method """
 
@@ -158,6 +221,87 @@ class TestKerasModel(unittest.TestCase):
 
             self.assertIsInstance(self.label_and_confidence.test_accuracy, float)
             self.assertEqual(self.label_and_confidence.test_accuracy, 0.8)
+            self.assertEqual(mock_model.fit.call_args.kwargs['batch_size'], self.label_and_confidence.batch_size)
+
+            # with mini-batches and a seed
+            self.label_and_confidence.train(seed=1, batch_size=256, verbose=0)
+            self.assertEqual(mock_model.fit.call_args.kwargs['batch_size'], 256)
+            self.assertEqual(mock_model.fit.call_args.kwargs['verbose'], 0)
+
+    def test_train_parallel(self):
+        """ test train_parallel method keeps the model of the best attempt """
+
+        weights = []
+        for weight, bias in zip(self.label_and_confidence.model.weights, self.label_and_confidence.model.biases):
+            weights += [weight, bias]
+        attempts = {
+            0: {'seed': 0, 'accuracy': 0.92, 'elapsed': 3.1, 'weights': [weight * 0 for weight in weights]},
+            1: {'seed': 1, 'accuracy': 0.93, 'elapsed': 3.2, 'weights': weights},
+            2: {'seed': 2, 'accuracy': None, 'elapsed': 0.1, 'weights': None},
+        }
+
+        with patch('adsplanetnamepipe.utils.label_and_confidence.ProcessPoolExecutor',
+                   side_effect=lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)), \
+             patch('adsplanetnamepipe.utils.label_and_confidence.train_attempt',
+                   side_effect=lambda seed, batch_size: attempts[seed]) as mock_train_attempt, \
+             patch.object(LabelAndConfidence, 'max_build_retry', 3), \
+             patch('adsplanetnamepipe.utils.label_and_confidence.logger.info') as mock_info_logger, \
+             patch('adsplanetnamepipe.utils.label_and_confidence.logger.warning') as mock_warning_logger:
+            result = self.label_and_confidence.train_parallel()
+            self.assertEqual(result, [attempts[0], attempts[1], attempts[2]])
+            self.assertEqual(mock_train_attempt.call_count, 3)
+            self.assertEqual(mock_train_attempt.call_args.args[1], self.label_and_confidence.fast_batch_size)
+            mock_info_logger.assert_any_call("Training attempt with seed 1: accuracy 0.93 in 3.20 s.")
+            # the best attempt is below the threshold
+            mock_warning_logger.assert_called_once_with("None of the 3 training attempts went above the accuracy threshold 0.96, "
+                                                        "keeping the best one with accuracy 0.93.")
+
+            # the model of the attempt with seed 1 was kept
+            self.assertEqual(self.label_and_confidence.test_accuracy, 0.93)
+            scores = [[0.7, 0.8, 0.5], [0.7, 0.8, 0.2]]
+            self.assertTrue(np.allclose(self.label_and_confidence.model.predict(scores, verbose=0),
+                                        NumpyModel(weights[::2], weights[1::2]).predict(scores), atol=1e-6))
+
+        # none of the attempts succeeded
+        with patch('adsplanetnamepipe.utils.label_and_confidence.ProcessPoolExecutor',
+                   side_effect=lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)), \
+             patch('adsplanetnamepipe.utils.label_and_confidence.train_attempt', return_value=attempts[2]), \
+             patch.object(LabelAndConfidence, 'max_build_retry', 2):
+            self.label_and_confidence.train_parallel()
+            self.assertIsNone(self.label_and_confidence.model)
+
+        # train_and_save with fast_training trains in parallel
+        with patch.object(LabelAndConfidence, 'train_parallel') as mock_train_parallel, \
+             patch.object(LabelAndConfidence, 'model', create=True), \
+             patch.object(LabelAndConfidence, 'save') as mock_save:
+            LabelAndConfidence(self.args, train_mode=True, fast_training=True)
+            mock_train_parallel.assert_called_once()
+            mock_save.assert_called_once()
+
+    def test_train_attempt(self):
+        """ test train_attempt only trains a model, without loading the inference model """
+
+        with patch.object(LabelAndConfidence, 'load') as mock_load, \
+             patch.object(LabelAndConfidence, 'export_weights') as mock_export_weights, \
+             patch.object(LabelAndConfidence, 'train', return_value=0.97) as mock_train, \
+             patch.object(LabelAndConfidence, 'model', create=True) as mock_model:
+            mock_model.get_weights.return_value = ['weights']
+            attempt = train_attempt(1, 256)
+            mock_load.assert_not_called()
+            mock_export_weights.assert_not_called()
+            mock_train.assert_called_once_with(seed=1, batch_size=256, verbose=0)
+            self.assertEqual((attempt['seed'], attempt['accuracy'], attempt['weights']), (1, 0.97, ['weights']))
+
+    @patch('adsplanetnamepipe.utils.label_and_confidence.logger.warning')
+    def test_train_and_save_below_threshold(self, mock_warning_logger):
+        """ test train_and_save warns when none of the serial attempts goes above the threshold """
+
+        with patch.object(LabelAndConfidence, 'train', return_value=0.9) as mock_train, \
+             patch.object(LabelAndConfidence, 'save') as mock_save:
+            self.label_and_confidence.train_and_save()
+            self.assertEqual(mock_train.call_count, self.label_and_confidence.max_build_retry)
+            mock_warning_logger.assert_called_once()
+            mock_save.assert_called_once()
 
     @patch('adsplanetnamepipe.utils.label_and_confidence.logger.error')
     def test_train_failuare(self, mock_error_logger):
@@ -5,10 +5,11 @@ if project_home not in sys.path:
 
 
 import unittest
+import regex
 
 from unittest.mock import MagicMock, patch
 
-from adsplanetnamepipe.utils.paper_relevance import PaperRelevance
+from adsplanetnamepipe.utils.paper_relevance import PaperRelevance, DocumentFeatures, PaperRelevanceCache
 from adsplanetnamepipe.utils.common import EntityArgs
 
 from adsplanetnamepipe.tests.unittests.stubdata import solrdata
@@ -48,6 +49,116 @@ class TestPaperRelevance(unittest.TestCase):
         score = self.paper_relevance.forward(text, bibstem, databases, astronomy_main_journals, len_existing_wikidata)
         self.assertEqual(score, 1.0)
 
+    def test_forward_doc(self):
+        """ test forward_doc method, counting wikidata terms along with the other features, against the forward method """
+
+        re_wiki_vocab = regex.compile(r'\b(ripple|crater|Meridiani (Planum)|rover)\b')
+        text = f"{' '.join(solrdata.doc_1['title'])} {solrdata.doc_1['abstract']} {solrdata.doc_1['body']}"
+        bibstem = solrdata.doc_1['bibcode'][4:9].strip('.')
+        databases = ', '.join(solrdata.doc_1['database'])
+        astronomy_main_journals = ['JGRE', 'Icar']
+
+        wikidata_terms = set()
+        for match in re_wiki_vocab.findall(text):
+            wikidata_terms.update(item for item in match if item)
+
+        score = self.paper_relevance.forward_doc(solrdata.doc_1, astronomy_main_journals, re_wiki_vocab)
+        self.assertEqual(score, self.paper_relevance.forward(text, bibstem, databases, astronomy_main_journals, len(wikidata_terms)))
+        self.assertEqual(score, 1.0)
+
+        # not in the main journals and no wikidata terms
+        score = self.paper_relevance.forward_doc(solrdata.doc_1, ['ApJ'], regex.compile(r'\b(exoplanet)\b'))
+        self.assertAlmostEqual(score, 0.6)
+
+    def test_document_features(self):
+        """ test that DocumentFeatures stops counting once the counts pass the threshold """
+
+        # 2000 spaces, threshold is 2
+        text = ' '.join(['Mars crater ripple'] * 667)
+        features = DocumentFeatures(text,
+                                    self.paper_relevance.re_match_target,
+                                    self.paper_relevance.re_match_feature_type,
+                                    regex.compile(r'\b(ripple|crater|Mars|dune)\b'))
+        self.assertEqual(features.num_tokens, 2000)
+        self.assertEqual(features.threshold, 2.0)
+        # all capped at the first value above the threshold
+        self.assertEqual(features.target_terms_len, 3)
+        self.assertEqual(features.feature_type_terms_len, 1)
+        self.assertEqual(features.len_existing_wikidata, 3)
+
+        # below the threshold counts are exact, and without the wiki regex wikidata terms are not counted
+        features = DocumentFeatures(text.replace('Mars', 'Moon', 666),
+                                    self.paper_relevance.re_match_target,
+                                    self.paper_relevance.re_match_feature_type)
+        self.assertEqual(features.target_terms_len, 1)
+        self.assertEqual(features.len_existing_wikidata, 0)
+
+    def test_forward_doc_cached(self):
+        """ test that forward_doc reuses the score of a document already scored for the target and feature type """
+
+        PaperRelevanceCache.scores.clear()
+        re_wiki_vocab = regex.compile(r'\b(ripple|crater|Meridiani (Planum)|rover)\b')
+        doc = dict(solrdata.doc_1, fulltext_mtime='2021-03-05T00:00:00.000Z')
+
+        with patch('adsplanetnamepipe.utils.paper_relevance.DocumentFeatures', wraps=DocumentFeatures) as mock_features:
+            score = self.paper_relevance.forward_doc(doc, ['JGRE'], re_wiki_vocab)
+            # another feature name of the same target and feature type
+            self.args.feature_name = 'Airy'
+            self.assertEqual(PaperRelevance(self.args).forward_doc(doc, ['JGRE'], re_wiki_vocab), score)
+            self.assertEqual(mock_features.call_count, 1)
+
+            # fulltext has changed, so score again
+            self.paper_relevance.forward_doc(dict(doc, fulltext_mtime='2022-01-01T00:00:00.000Z'), ['JGRE'], re_wiki_vocab)
+            self.assertEqual(mock_features.call_count, 2)
+
+            # without fulltext mtime it is not known if the fulltext has changed, so not cached
+            self.paper_relevance.forward_doc(solrdata.doc_1, ['JGRE'], re_wiki_vocab)
+            self.paper_relevance.forward_doc(solrdata.doc_1, ['JGRE'], re_wiki_vocab)
+            self.assertEqual(mock_features.call_count, 4)
+        PaperRelevanceCache.scores.clear()
+
+    def test_forward_doc_cached_persistent_store(self):
+        """ test that forward_doc uses the persistent store when scores are not in process """
+
+        PaperRelevanceCache.scores.clear()
+        re_wiki_vocab = regex.compile(r'\b(ripple|crater)\b')
+        doc = dict(solrdata.doc_1, fulltext_mtime='2021-03-05T00:00:00.000Z')
+        key = (doc['bibcode'], doc['fulltext_mtime'], 'Mars', 'Crater')
+
+        # in the store, computed by another worker
+        mock_store = MagicMock()
+        mock_store.get_paper_relevance_score.return_value = 0.4
+        paper_relevance = PaperRelevance(self.args, mock_store)
+        self.assertEqual(paper_relevance.forward_doc(doc, ['JGRE'], re_wiki_vocab), 0.4)
+        mock_store.get_paper_relevance_score.assert_called_once_with(*key)
+        mock_store.insert_paper_relevance_score.assert_not_called()
+        # now it is in process as well
+        self.assertEqual(paper_relevance.forward_doc(doc, ['JGRE'], re_wiki_vocab), 0.4)
+        self.assertEqual(mock_store.get_paper_relevance_score.call_count, 1)
+
+        # not in the store, compute and save
+        PaperRelevanceCache.scores.clear()
+        mock_store.get_paper_relevance_score.return_value = -1
+        score = paper_relevance.forward_doc(doc, ['JGRE'], re_wiki_vocab)
+        mock_store.insert_paper_relevance_score.assert_called_once_with(*key, score)
+        PaperRelevanceCache.scores.clear()
+
+    def test_paper_relevance_cache_eviction(self):
+        """ test that the least recently used scores are evicted when the cache is full """
+
+        PaperRelevanceCache.scores.clear()
+        cache = PaperRelevanceCache()
+        with patch.object(PaperRelevanceCache, 'max_size', 2):
+            cache.set(('a', '', 'Mars', 'Crater'), 0.2)
+            cache.set(('b', '', 'Mars', 'Crater'), 0.4)
+            # use `a` so that `b` is the least recently used
+            self.assertEqual(cache.get(('a', '', 'Mars', 'Crater')), 0.2)
+            cache.set(('c', '', 'Mars', 'Crater'), 0.6)
+            self.assertEqual(cache.get(('b', '', 'Mars', 'Crater')), -1)
+            self.assertEqual(cache.get(('a', '', 'Mars', 'Crater')), 0.2)
+            self.assertEqual(cache.get(('c', '', 'Mars', 'Crater')), 0.6)
+        PaperRelevanceCache.scores.clear()
+
 
 if __name__ == '__main__':
     unittest.main()
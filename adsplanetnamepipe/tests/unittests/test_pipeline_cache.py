@@ -0,0 +1,115 @@
+import sys, os
+project_home = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+if project_home not in sys.path:
+    sys.path.insert(0, project_home)
+
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from adsplanetnamepipe.utils.pipeline_cache import PipelineCache
+from adsplanetnamepipe.utils.common import EntityArgs
+
+
+class Pipeline():
+    """ stand in for CollectKnowldegeBase and IdentifyPlanetaryEntities """
+
+    def __init__(self, args: EntityArgs):
+        self.args = args
+
+    def update_args(self, args: EntityArgs):
+        self.args = args
+
+
+class TestPipelineCache(unittest.TestCase):
+
+    def setUp(self):
+        """ Set up the config class and clear the pipelines of the process """
+
+        self.args = EntityArgs(
+            target="Mars",
+            feature_type="Crater",
+            feature_type_plural="Craters",
+            feature_name="Rayleigh",
+            context_ambiguous_feature_names=["asteroid", "main belt asteroid", "Moon", "Mars"],
+            multi_token_containing_feature_names=["Rayleigh A", "Rayleigh B", "Rayleigh C", "Rayleigh D"],
+            name_entity_labels=[{'label': 'planetary', 'value': 1}, {'label': 'non planetary', 'value': 0}],
+            timestamp='2000-01-01',
+            all_targets=["Mars", "Mercury", "Moon", "Venus"]
+        )
+        PipelineCache.pipelines.clear()
+        PipelineCache.stats.update({'hits': 0, 'misses': 0, 'evictions': 0, 'setup_time_ms': 0.0})
+
+    def get_pipeline(self, cache: PipelineCache, args: EntityArgs, setup: MagicMock):
+        """ get the pipeline for the args from the cache, the way the tasks do """
+
+        key = cache.get_key(Pipeline, args)
+        pipeline = cache.get(key, setup=lambda: setup(args), update=lambda pipeline: pipeline.update_args(args))
+        return key, pipeline
+
+    def test_get_key(self):
+        """ test get_key method """
+
+        cache = PipelineCache()
+        galle = EntityArgs(**dict(self.args.toJSON(), feature_name='Galle'))
+        moon = EntityArgs(**dict(self.args.toJSON(), target='Moon'))
+        store = MagicMock()
+
+        # feature name is not part of the key
+        self.assertEqual(cache.get_key(Pipeline, self.args), cache.get_key(Pipeline, galle))
+        self.assertNotEqual(cache.get_key(Pipeline, self.args), cache.get_key(Pipeline, moon))
+        self.assertNotEqual(cache.get_key(Pipeline, self.args), cache.get_key(Pipeline, self.args, store))
+        self.assertNotEqual(cache.get_key(Pipeline, self.args), cache.get_key(MagicMock, self.args))
+
+    def test_get_and_release(self):
+        """ test that the pipeline is setup once, reused for the next feature name, and is not shared while in use """
+
+        cache = PipelineCache()
+        setup = MagicMock(side_effect=Pipeline)
+
+        with patch('adsplanetnamepipe.utils.pipeline_cache.logger.info') as mock_info_logger:
+            key, pipeline = self.get_pipeline(cache, self.args, setup)
+            self.assertEqual(setup.call_count, 1)
+            self.assertTrue(mock_info_logger.call_args.args[0].startswith('Pipeline Pipeline for Mars/Crater setup in '))
+
+            # in use, so another one is setup
+            _, another_pipeline = self.get_pipeline(cache, self.args, setup)
+            self.assertIsNot(pipeline, another_pipeline)
+            self.assertEqual(setup.call_count, 2)
+
+            # once released, it is reused and pointed to the new feature name
+            cache.release(key, pipeline)
+            galle = EntityArgs(**dict(self.args.toJSON(), feature_name='Galle'))
+            _, reused_pipeline = self.get_pipeline(cache, galle, setup)
+            self.assertIs(reused_pipeline, pipeline)
+            self.assertEqual(reused_pipeline.args.feature_name, 'Galle')
+            self.assertEqual(setup.call_count, 2)
+            self.assertTrue(mock_info_logger.call_args.args[0].startswith('Pipeline Pipeline for Mars/Crater reused in '))
+
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 2, 0))
+        self.assertGreaterEqual(stats['setup_time_ms'], 0)
+
+    def test_release_evict(self):
+        """ test that the least recently used pipelines are evicted, and none are kept when disabled """
+
+        cache = PipelineCache()
+        setup = MagicMock(side_effect=Pipeline)
+        keys = []
+        with patch.object(PipelineCache, 'max_size', 2):
+            for target in ['Mars', 'Moon', 'Venus']:
+                key, pipeline = self.get_pipeline(cache, EntityArgs(**dict(self.args.toJSON(), target=target)), setup)
+                cache.release(key, pipeline)
+                keys.append(key)
+            self.assertEqual(list(PipelineCache.pipelines.keys()), keys[1:])
+            self.assertEqual(cache.get_stats()['evictions'], 1)
+
+        PipelineCache.pipelines.clear()
+        with patch.object(PipelineCache, 'max_size', 0):
+            key, pipeline = self.get_pipeline(cache, self.args, setup)
+            cache.release(key, pipeline)
+            self.assertEqual(len(PipelineCache.pipelines), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
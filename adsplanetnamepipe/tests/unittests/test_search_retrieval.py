@@ -93,9 +93,9 @@ class TestSearchRetrieval(unittest.TestCase):
         # the expected number of iterations
         self.assertEqual(mock_single_solr_query.call_count, 3)
         # the expected arguments passed to single_solr_query in each iteration
-        mock_single_solr_query.assert_any_call(start=0, rows=2000, query='*:*')
-        mock_single_solr_query.assert_any_call(start=2000, rows=2000, query='*:*')
-        mock_single_solr_query.assert_any_call(start=4000, rows=2000, query='*:*')
+        mock_single_solr_query.assert_any_call(start=0, rows=2000, query='*:*', fields='')
+        mock_single_solr_query.assert_any_call(start=2000, rows=2000, query='*:*', fields='')
+        mock_single_solr_query.assert_any_call(start=4000, rows=2000, query='*:*', fields='')
 
         self.assertEqual(len(docs), 4)
         self.assertEqual(docs, [{'bibcode': '2024arXiv240320332S'}, {'bibcode': '2024arXiv240320323T'},
@@ -125,9 +125,17 @@ class TestSearchRetrieval(unittest.TestCase):
         mock_solr_query.return_value = expected_result
         result = self.search_retrieval.identify_terms_query()
 
-        mock_solr_query.assert_called_once_with(expected_query)
+        mock_solr_query.assert_called_once_with(expected_query, '')
         self.assertEqual(result, expected_result)
 
+        # only the records modified since the watermark
+        self.search_retrieval.identify_terms_query('2024-03-01T00:00:00Z')
+        mock_solr_query.assert_called_with(expected_query + ' fulltext_mtime:["2024-03-01T00:00:00Z" TO *]', '')
+
+        # only the bibcodes
+        self.search_retrieval.identify_terms_query(fields=self.search_retrieval.bibcode_fields)
+        mock_solr_query.assert_called_with(expected_query, 'bibcode, fulltext_mtime')
+
     @patch('adsplanetnamepipe.utils.search_retrieval.SearchRetrieval.solr_query')
     def test_identify_terms_query_no_docs(self, mock_solr_query):
         """ test identify_terms_query when no documents are found or an error occurs """
@@ -146,6 +154,55 @@ class TestSearchRetrieval(unittest.TestCase):
         result = self.search_retrieval.identify_terms_query()
         self.assertEqual(result, [])
 
+    @patch('adsplanetnamepipe.utils.search_retrieval.SearchRetrieval.single_solr_query')
+    def test_bibcodes_query(self, mock_single_solr_query):
+        """ test bibcodes_query method, the bibcodes are queried in chunks and returned in order """
+
+        mock_single_solr_query.side_effect = [
+            ([{'bibcode': '2024arXiv240320332S'}, {'bibcode': '2024arXiv240320323T'}], 200),
+            (None, 500),
+        ]
+
+        with patch.object(self.search_retrieval, 'bibcode_chunk_size', 2), \
+             patch('adsplanetnamepipe.utils.search_retrieval.logger.error') as mock_error:
+            docs = self.search_retrieval.bibcodes_query(['2024arXiv240320323T', '2024arXiv240320332S', '2024arXiv240320321V'])
+
+        self.assertEqual(docs, [{'bibcode': '2024arXiv240320323T'}, {'bibcode': '2024arXiv240320332S'}])
+        mock_single_solr_query.assert_any_call(start=0, rows=2, query='bibcode:("2024arXiv240320323T" OR "2024arXiv240320332S")')
+        mock_single_solr_query.assert_any_call(start=0, rows=1, query='bibcode:("2024arXiv240320321V")')
+        mock_error.assert_called_once_with("From solr status code 500.")
+
+    @patch('adsplanetnamepipe.utils.search_retrieval.requests.get')
+    def test_count_identify_terms_query(self, mock_get):
+        """ test count_identify_terms_query method, counting the feature names in chunks with facet queries """
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.side_effect = [{'response': {'numFound': 120, 'docs': []},
+                                           'facet_counts': {'facet_queries': {'full:(="Rayleigh")': 100, 'full:(="Galle")': 20}}},
+                                          {'response': {'numFound': 3, 'docs': []},
+                                           'facet_counts': {'facet_queries': {'full:(="Huygens")': 3}}}]
+        mock_get.return_value = mock_response
+
+        with patch.object(SearchRetrieval, 'count_chunk_size', 2):
+            counts = self.search_retrieval.count_identify_terms_query(['Rayleigh', 'Galle', 'Huygens'])
+
+        self.assertEqual(counts, {'Rayleigh': 100, 'Galle': 20, 'Huygens': 3})
+        self.assertEqual(mock_get.call_count, 2)
+        params = mock_get.call_args_list[0].kwargs['params']
+        self.assertEqual(params['rows'], 0)
+        self.assertEqual(params['facet.query'], ['full:(="Rayleigh")', 'full:(="Galle")'])
+        self.assertEqual(params['q'], self.search_retrieval.identify_terms_filters())
+
+        # could not be counted
+        mock_response.status_code = 500
+        with patch('adsplanetnamepipe.utils.search_retrieval.logger.error') as mock_error_logger:
+            self.assertEqual(self.search_retrieval.count_identify_terms_query(['Rayleigh']), {'Rayleigh': -1})
+            mock_error_logger.assert_called_once_with("From solr status code 500.")
+
+        mock_get.side_effect = RequestException("Test Request Exception")
+        self.assertEqual(self.search_retrieval.count_identify_terms_query(['Rayleigh']), {'Rayleigh': -1})
+
     @patch('adsplanetnamepipe.utils.search_retrieval.SearchRetrieval.solr_query')
     def test_collect_usgs_terms_query(self, mock_solr_query):
         """ test collect_usgs_terms_query which returns the result of query for the collect step positive """
@@ -253,7 +310,7 @@ class TestSearchRetrieval(unittest.TestCase):
         result = self.search_retrieval.solr_query(expected_query)
 
         self.assertEqual(result, [])
-        mock_single_solr_query.assert_called_with(start=0, rows=2000, query=expected_query)
+        mock_single_solr_query.assert_called_with(start=0, rows=2000, query=expected_query, fields='')
         mock_logger.info.assert_called_with("Got 0 docs from solr.")
 
     @patch('requests.get')
@@ -0,0 +1,89 @@
+import sys, os
+project_home = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+if project_home not in sys.path:
+    sys.path.insert(0, project_home)
+
+
+import time
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from adsplanetnamepipe.utils.stage_pipeline import StagePipeline
+
+
+class TestStagePipeline(unittest.TestCase):
+
+    def test_map(self):
+        """ test that the items go through the stages, and come out in order even when the stages finish them out of order """
+
+        def slow_for_even(item):
+            time.sleep(0.02 if item % 2 == 0 else 0)
+            return item * 10
+
+        with ThreadPoolExecutor(max_workers=1) as first, ThreadPoolExecutor(max_workers=4) as second:
+            stage_pipeline = StagePipeline([(lambda item: item + 1, first), (slow_for_even, second)])
+            self.assertEqual(stage_pipeline.map(range(20)), [(item + 1) * 10 for item in range(20)])
+            self.assertEqual(stage_pipeline.map([]), [])
+
+    def test_map_overlap(self):
+        """ test that the second stage of an item runs while the first stage is working on the next items """
+
+        first_stage_threads = set()
+        second_stage_started = threading.Event()
+        next_item_started = threading.Event()
+        overlapped = threading.Event()
+        calls = []
+
+        def first_stage(item):
+            first_stage_threads.add(threading.current_thread())
+            if item > 0:
+                # so that the next items are in the first stage while item 0 is in the second stage
+                second_stage_started.wait(timeout=5)
+            calls.append(('first', item))
+            if item > 0:
+                next_item_started.set()
+            return item
+
+        def second_stage(item):
+            # the first stage starts on the next items while this one is still in the second stage,
+            # run serially, the wait would time out instead
+            if item == 0:
+                calls.append(('second started', item))
+                second_stage_started.set()
+                if next_item_started.wait(timeout=5):
+                    overlapped.set()
+                calls.append(('second done', item))
+            return item
+
+        with ThreadPoolExecutor(max_workers=1) as first, ThreadPoolExecutor(max_workers=2) as second:
+            self.assertEqual(StagePipeline([(first_stage, first), (second_stage, second)]).map(range(5)), list(range(5)))
+        self.assertTrue(overlapped.is_set())
+        # the first stage of item 1 ran between the start and the end of the second stage of item 0
+        self.assertLess(calls.index(('second started', 0)), calls.index(('first', 1)))
+        self.assertLess(calls.index(('first', 1)), calls.index(('second done', 0)))
+        self.assertEqual(len(first_stage_threads), 1)
+
+    def test_map_exception(self):
+        """ test that an exception in a stage is raised, once all the other items are done """
+
+        done = []
+
+        def fail_on_three(item):
+            if item == 3:
+                raise ValueError('three')
+            return item
+
+        def second_stage(item):
+            done.append(item)
+            return item
+
+        with ThreadPoolExecutor(max_workers=2) as first, ThreadPoolExecutor(max_workers=2) as second:
+            with self.assertRaises(ValueError) as context:
+                StagePipeline([(fail_on_three, first), (second_stage, second)]).map(range(30))
+        self.assertEqual(str(context.exception), 'three')
+        self.assertEqual(sorted(done), [item for item in range(30) if item != 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import sys, os
+project_home = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+if project_home not in sys.path:
+    sys.path.insert(0, project_home)
+
+
+import unittest
+from unittest.mock import patch
+
+from adsplanetnamepipe.utils.task_budget import TaskBudget
+
+
+class TestTaskBudget(unittest.TestCase):
+
+    def setUp(self):
+        """ Set up the docs and clear the stats of the process """
+
+        self.docs = [{'bibcode': str(i)} for i in range(5)]
+        TaskBudget.stats.update({'tasks': 0, 'overruns': 0, 'docs_continued': 0, 'overrun_seconds': 0.0})
+
+    def test_take_docs_budget(self):
+        """ test that the docs over the budget are not taken, and are left for a new task """
+
+        budget = TaskBudget(max_seconds=0, max_docs=3)
+        self.assertEqual(list(budget.take(self.docs)), self.docs[:3])
+        self.assertEqual(budget.docs_left, self.docs[3:])
+        self.assertTrue(budget.is_exceeded())
+
+        # all the docs within the budget
+        budget = TaskBudget(max_seconds=0, max_docs=0)
+        self.assertEqual(list(budget.take(self.docs)), self.docs)
+        self.assertEqual(budget.docs_left, [])
+        self.assertFalse(budget.is_exceeded())
+
+    def test_take_time_budget(self):
+        """ test that once the time is spent no new doc is taken """
+
+        with patch('adsplanetnamepipe.utils.task_budget.time.time', side_effect=[100, 101, 102, 112, 113]):
+            budget = TaskBudget(max_seconds=10, max_docs=0)
+            self.assertEqual(list(budget.take(self.docs)), self.docs[:2])
+            self.assertEqual(budget.docs_left, self.docs[2:])
+
+            with patch('adsplanetnamepipe.utils.task_budget.logger.warning') as mock_warning_logger:
+                budget.count_overrun('Rayleigh', len(budget.docs_left))
+                mock_warning_logger.assert_called_once_with("Task budget exceeded for Rayleigh after 2 docs in 13.00 s, "
+                                                            "3 docs continued in a new task.")
+
+        self.assertEqual(budget.get_stats(), {'tasks': 1, 'overruns': 1, 'docs_continued': 3, 'overrun_seconds': 3.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
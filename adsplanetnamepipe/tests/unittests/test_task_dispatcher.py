@@ -0,0 +1,89 @@
+import sys, os
+project_home = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../'))
+if project_home not in sys.path:
+    sys.path.insert(0, project_home)
+
+
+import unittest
+import tempfile
+from unittest.mock import MagicMock, patch
+
+from adsplanetnamepipe.utils.task_dispatcher import TaskDispatcher
+
+
+class TestTaskDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        """ Set up the progress file and the tasks, each completing one poll after it is queued """
+
+        self.progress_file = os.path.join(tempfile.mkdtemp(), 'progress.txt')
+        self.max_in_flight = 0
+        self.queued = []
+
+    def tearDown(self):
+        """ Remove the progress file """
+
+        if os.path.exists(self.progress_file):
+            os.remove(self.progress_file)
+        os.rmdir(os.path.dirname(self.progress_file))
+
+    def get_tasks(self, dispatcher: TaskDispatcher, keys: list, failed: list = []):
+        """ the tasks to dispatch, recording the most tasks in flight at once """
+
+        def queue_task(key):
+            self.queued.append(key)
+            self.max_in_flight = max(self.max_in_flight, len(dispatcher.in_flight) + 1)
+            return MagicMock(ready=MagicMock(return_value=True), successful=MagicMock(return_value=key not in failed))
+        return [(key, lambda key=key: queue_task(key)) for key in keys]
+
+    @patch.object(TaskDispatcher, 'poll_interval', 0)
+    def test_dispatch(self):
+        """ test that at most a window of tasks are in flight, and the completed ones are recorded """
+
+        dispatcher = TaskDispatcher(window=2, progress_file=self.progress_file)
+        keys = ['identify/Mars/Crater/%d' % i for i in range(5)]
+        with patch('adsplanetnamepipe.utils.task_dispatcher.logger') as mock_logger:
+            self.assertTrue(dispatcher.dispatch(self.get_tasks(dispatcher, keys, failed=[keys[3]]), len(keys)))
+            mock_logger.error.assert_called_once()
+            self.assertTrue(mock_logger.info.call_args.args[0].startswith(
+                "Dispatched 5 of 5 tasks {'queued': 5, 'succeeded': 4, 'failed': 1, 'skipped': 0}, 0 in flight, "))
+
+        self.assertEqual(self.queued, keys)
+        self.assertEqual(self.max_in_flight, 2)
+        with open(self.progress_file) as f:
+            self.assertEqual(f.read().split(), keys[:3] + keys[4:])
+
+        # resumed, only the failed task is queued again
+        self.queued = []
+        dispatcher = TaskDispatcher(window=2, progress_file=self.progress_file)
+        self.assertTrue(dispatcher.dispatch(self.get_tasks(dispatcher, keys), len(keys)))
+        self.assertEqual(self.queued, [keys[3]])
+        self.assertEqual(dispatcher.stats, {'queued': 1, 'succeeded': 1, 'failed': 0, 'skipped': 4})
+
+    @patch.object(TaskDispatcher, 'poll_interval', 0)
+    def test_dispatch_stop(self):
+        """ test that once stopped no more tasks are queued, the ones in flight are waited for """
+
+        dispatcher = TaskDispatcher(window=2, progress_file=self.progress_file)
+        keys = ['identify/Mars/Crater/%d' % i for i in range(5)]
+        tasks = self.get_tasks(dispatcher, keys)
+        queue_task = tasks[1][1]
+        def queue_task_and_stop():
+            result = queue_task()
+            dispatcher.stop(None, None)
+            return result
+        tasks[1] = (keys[1], queue_task_and_stop)
+
+        self.assertFalse(dispatcher.dispatch(tasks, len(keys)))
+        self.assertEqual(self.queued, keys[:2])
+        self.assertEqual(dispatcher.in_flight, {})
+        with open(self.progress_file) as f:
+            self.assertEqual(f.read().split(), keys[:2])
+
+        # a second signal exits without waiting
+        with self.assertRaises(KeyboardInterrupt):
+            dispatcher.stop(None, None)
+
+
+if __name__ == '__main__':
+    unittest.main()
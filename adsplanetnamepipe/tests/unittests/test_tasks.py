@@ -7,8 +7,11 @@ if project_home not in sys.path:
 import unittest
 from unittest.mock import MagicMock, patch
 
-from adsplanetnamepipe.tasks import task_process_planetary_nomenclature, FailedRequest
+from adsplanetnamepipe.tasks import task_process_planetary_nomenclature, task_process_planetary_nomenclature_batch, \
+    task_identify_retrieve, task_identify_extract, task_identify_score, task_identify_label, \
+    get_knowledge_graph_path_weights, FailedRequest
 from adsplanetnamepipe.utils.common import PLANETARYNAMES_PIPELINE_ACTION, EntityArgs
+from adsplanetnamepipe.utils.end_to_end_context import EndToEndContext
 
 
 class TestPlanetaryNomenclature(unittest.TestCase):
@@ -81,6 +84,513 @@ class TestPlanetaryNomenclature(unittest.TestCase):
         mock_app.insert_named_entity_records.assert_called_once_with([mock_named_entity_record])
         self.assertTrue(result)
 
+    @patch.dict('adsplanetnamepipe.tasks.config', {'PLANETARYNAMES_PIPELINE_CACHE_KNOWLEDGE_GRAPH': True})
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.IdentifyPlanetaryEntities')
+    def test_task_process_planetary_nomenclature_identify_cached_knowledge_graph(self, mock_identify_planetary_entities, mock_app):
+        """ calling task queue when in identifying stage, with the path weights of the knowledge graphs saved """
+
+        mock_identify_instance = MagicMock()
+        mock_identify_instance.identify.return_value = [MagicMock()]
+        mock_identify_planetary_entities.return_value = mock_identify_instance
+
+        path_weights_positive = {'crater': 2.5, 'Rayleigh': 0}
+        path_weights_negative = {'scattering': 1.0, 'Rayleigh': 0}
+        mock_app.get_knowledge_graph_path_weights.side_effect = [(1, path_weights_positive), (2, path_weights_negative)]
+        mock_app.insert_named_entity_records.return_value = True
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': self.args.toJSON()}
+
+        result = task_process_planetary_nomenclature(the_task)
+
+        # graphs are not built, so no need for keywords
+        mock_app.get_knowledge_base_keywords.assert_not_called()
+        self.assertEqual(mock_identify_planetary_entities.call_args[0][4:], (path_weights_positive, path_weights_negative))
+        self.assertTrue(result)
+
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.SearchRetrieval')
+    @patch('adsplanetnamepipe.tasks.IdentifyPlanetaryEntities')
+    @patch('adsplanetnamepipe.tasks.CollectKnowldegeBase')
+    def test_task_process_planetary_nomenclature_end_to_end(self, mock_collect_knowledgebase, mock_identify_planetary_entities,
+                                                            mock_search_retrieval, mock_app):
+        """ calling task queue for end_to_end, collect and then identify with the docs retrieved while collecting """
+
+        calls = []
+        contexts = []
+        mock_collect_instance = mock_collect_knowledgebase.return_value
+        mock_identify_instance = mock_identify_planetary_entities.return_value
+        mock_search_retrieval.return_value.identify_terms_query.side_effect = lambda: calls.append('retrieve') or [{'bibcode': '1'}]
+        mock_collect_instance.collect.side_effect = lambda: calls.append('collect') or contexts.append(mock_collect_instance.end_to_end_context) or [MagicMock()]
+        mock_identify_instance.identify.side_effect = lambda docs: contexts.append(mock_identify_instance.end_to_end_context) or [MagicMock()]
+        mock_app.get_knowledge_base_keywords.side_effect = [['positive_keyword'], ['negative_keyword']]
+        mock_app.insert_knowledge_base_records.side_effect = lambda records: calls.append('insert knowledge base') or True
+        mock_app.insert_named_entity_records.return_value = True
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.end_to_end.value, 'args': self.args.toJSON()}
+        result = task_process_planetary_nomenclature(the_task)
+
+        self.assertTrue(result)
+        # the knowledge base is saved before the knowledge graphs of identify are read
+        self.assertEqual(calls[-1], 'insert knowledge base')
+        self.assertEqual(sorted(calls[:-1]), ['collect', 'retrieve'])
+        mock_identify_instance.identify.assert_called_once_with([{'bibcode': '1'}])
+        mock_app.insert_named_entity_records.assert_called_once()
+        # both phases shared the same context, and the cached pipelines no longer hold it
+        self.assertIsInstance(contexts[0], EndToEndContext)
+        self.assertIs(contexts[0], contexts[1])
+        self.assertIsNone(mock_collect_instance.end_to_end_context)
+        self.assertIsNone(mock_identify_instance.end_to_end_context)
+
+    @patch('adsplanetnamepipe.tasks.app')
+    def test_get_knowledge_graph_path_weights(self, mock_app):
+        """ test get_knowledge_graph_path_weights when the path weights have not been saved, and when there are no records """
+
+        mock_app.get_knowledge_graph_path_weights.return_value = (1, {})
+        mock_app.get_knowledge_base_keywords.return_value = [['crater', 'impact'], ['crater', 'rim']]
+
+        path_weights = get_knowledge_graph_path_weights(self.args, 'planetary')
+        self.assertEqual(path_weights, {'Rayleigh': 0, 'crater': 2.0, 'impact': 1.0, 'rim': 1.0})
+        mock_app.insert_knowledge_graph_path_weights.assert_called_once_with(1, path_weights)
+
+        mock_app.reset_mock()
+        mock_app.get_knowledge_graph_path_weights.return_value = (-1, {})
+        self.assertEqual(get_knowledge_graph_path_weights(self.args, 'planetary'), {})
+        mock_app.get_knowledge_base_keywords.assert_not_called()
+        mock_app.insert_knowledge_graph_path_weights.assert_not_called()
+
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.CollectKnowldegeBase')
+    def test_task_process_planetary_nomenclature_reuse_pipeline(self, mock_collect_knowledgebase, mock_app):
+        """ the pipeline setup for a feature name is reused by the next task of the same target and feature type """
+
+        mock_collect_instance = mock_collect_knowledgebase.return_value
+        mock_collect_instance.collect.return_value = [MagicMock()]
+        mock_app.insert_knowledge_base_records.return_value = True
+
+        galle = EntityArgs(**dict(self.args.toJSON(), feature_name='Galle'))
+        for args in [self.args, galle]:
+            the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.collect.value, 'args': args.toJSON()}
+            self.assertTrue(task_process_planetary_nomenclature(the_task))
+
+        mock_collect_knowledgebase.assert_called_once()
+        mock_collect_instance.update_args.assert_called_once()
+        self.assertEqual(mock_collect_instance.update_args.call_args.args[0].feature_name, 'Galle')
+        self.assertEqual(mock_collect_instance.collect.call_count, 2)
+
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.CollectKnowldegeBase')
+    def test_task_process_planetary_nomenclature_batch_collect(self, mock_collect_knowledgebase, mock_app):
+        """ calling batch task queue when in collecting stage, the pipeline is setup once and the records are saved at once """
+
+        mock_records = [MagicMock(), MagicMock()]
+        mock_collect_instance = mock_collect_knowledgebase.return_value
+        mock_collect_instance.collect.side_effect = [[mock_records[0]], [], [mock_records[1]]]
+        mock_app.insert_knowledge_base_records.return_value = True
+
+        args_list = [EntityArgs(**dict(self.args.toJSON(), feature_name=feature_name)) for feature_name in ['Rayleigh', 'Galle', 'Huygens']]
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.collect.value, 'args': [args.toJSON() for args in args_list]}
+
+        result = task_process_planetary_nomenclature_batch(the_task)
+
+        mock_collect_knowledgebase.assert_called_once()
+        self.assertEqual([call.args[0].feature_name for call in mock_collect_instance.update_args.call_args_list], ['Galle', 'Huygens'])
+        self.assertEqual(mock_collect_instance.collect.call_count, 3)
+        mock_app.insert_knowledge_base_records.assert_called_once_with(mock_records)
+        self.assertTrue(result)
+
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.IdentifyPlanetaryEntities')
+    def test_task_process_planetary_nomenclature_batch_identify(self, mock_identify_planetary_entities, mock_app):
+        """ calling batch task queue when in identifying stage, the pipeline is setup once and the records are saved at once """
+
+        mock_records = [MagicMock(), MagicMock()]
+        mock_identify_instance = mock_identify_planetary_entities.return_value
+        mock_identify_instance.identify.side_effect = [[mock_records[0]], [mock_records[1]]]
+        mock_app.get_knowledge_base_keywords.side_effect = [[['crater']], [['bond']], [['rim']], [['scattering']]]
+        mock_app.insert_named_entity_records.return_value = True
+
+        args_list = [EntityArgs(**dict(self.args.toJSON(), feature_name=feature_name)) for feature_name in ['Rayleigh', 'Galle']]
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': [args.toJSON() for args in args_list]}
+
+        result = task_process_planetary_nomenclature_batch(the_task)
+
+        mock_identify_planetary_entities.assert_called_once()
+        self.assertEqual(mock_identify_planetary_entities.call_args.args[0].feature_name, 'Rayleigh')
+        self.assertEqual(mock_identify_planetary_entities.call_args.args[1:3], ([['crater']], [['bond']]))
+        mock_identify_instance.update_args.assert_called_once()
+        self.assertEqual(mock_identify_instance.update_args.call_args.args[0].feature_name, 'Galle')
+        self.assertEqual(mock_identify_instance.update_args.call_args.args[1:], ([['rim']], [['scattering']], None, None))
+        mock_app.insert_named_entity_records.assert_called_once_with(mock_records)
+        self.assertTrue(result)
+
+        # nothing identified
+        mock_app.reset_mock()
+        mock_app.get_knowledge_base_keywords.side_effect = None
+        mock_identify_instance.identify.side_effect = [[], None]
+        self.assertFalse(task_process_planetary_nomenclature_batch(the_task))
+        mock_app.insert_named_entity_records.assert_not_called()
+
+    @patch('adsplanetnamepipe.tasks.logger')
+    def test_task_process_planetary_nomenclature_batch_invalid(self, mock_logger):
+        """ calling batch task queue with no feature names, mixed targets, missing keys, or invalid action """
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': []}
+        self.assertFalse(task_process_planetary_nomenclature_batch(the_task))
+
+        args_list = [self.args, EntityArgs(**dict(self.args.toJSON(), target='Moon'))]
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': [args.toJSON() for args in args_list]}
+        self.assertFalse(task_process_planetary_nomenclature_batch(the_task))
+        mock_logger.error.assert_called_with("The feature names of the batch have to share the target, feature type, and timestamp.")
+
+        self.assertFalse(task_process_planetary_nomenclature_batch({}))
+        mock_logger.error.assert_called_with("KeyError in task_process_planetary_nomenclature_batch: 'action_type'")
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.invalid.value, 'args': [self.args.toJSON()]}
+        self.assertFalse(task_process_planetary_nomenclature_batch(the_task))
+        mock_logger.error.assert_called_with(f"Unhandled action: {PLANETARYNAMES_PIPELINE_ACTION.invalid}")
+
+    @patch('adsplanetnamepipe.tasks.task_identify_extract')
+    @patch('adsplanetnamepipe.tasks.SearchRetrieval')
+    def test_task_identify_retrieve(self, mock_search_retrieval, mock_task_identify_extract):
+        """ first stage of identify queues the bibcodes of the docs for the extract stage """
+
+        docs = [{'bibcode': '2000Icar..100..100A', 'fulltext_mtime': '2024-01-01T00:00:00Z'}]
+        mock_search_retrieval.return_value.identify_terms_query.return_value = docs
+        mock_search_retrieval.return_value.bibcode_fields = 'bibcode, fulltext_mtime'
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': self.args.toJSON()}
+
+        self.assertTrue(task_identify_retrieve(the_task))
+        # only the bibcodes are retrieved and queued, not the fulltexts
+        mock_search_retrieval.return_value.identify_terms_query.assert_called_once_with(fields='bibcode, fulltext_mtime')
+        mock_task_identify_extract.delay.assert_called_once_with(dict(the_task, bibcodes=['2000Icar..100..100A']))
+
+        # nothing retrieved
+        mock_task_identify_extract.reset_mock()
+        mock_search_retrieval.return_value.identify_terms_query.return_value = []
+        self.assertFalse(task_identify_retrieve(the_task))
+        mock_task_identify_extract.delay.assert_not_called()
+
+        self.assertFalse(task_identify_retrieve({}))
+
+    @patch('adsplanetnamepipe.tasks.task_identify_label')
+    @patch('adsplanetnamepipe.tasks.task_identify_score')
+    @patch('adsplanetnamepipe.tasks.SearchRetrieval')
+    @patch('adsplanetnamepipe.tasks.IdentifyScoreStage')
+    @patch('adsplanetnamepipe.tasks.IdentifyPlanetaryEntities')
+    def test_task_identify_extract_and_score(self, mock_identify_planetary_entities, mock_identify_score_stage,
+                                             mock_search_retrieval, mock_task_identify_score, mock_task_identify_label):
+        """ second and third stages of identify queue their results for the next stage """
+
+        docs = [{'bibcode': '2000Icar..100..100A'}]
+        bibcodes = ['2000Icar..100..100A']
+        mock_search_retrieval.return_value.bibcodes_query.return_value = docs
+        extracted = [{'bibcode': '2000Icar..100..100A', 'excerpts': [{'excerpt': 'the Rayleigh crater', 'keywords': ['crater']}]}]
+        scored = [{'bibcode': '2000Icar..100..100A', 'excerpts': [{'excerpt': 'the Rayleigh crater', 'keywords': ['crater'],
+                                                                   'local_llm_score': 0.7, 'special_keywords': []}]}]
+        mock_identify_instance = mock_identify_planetary_entities.return_value
+        mock_identify_instance.extract_excerpts.return_value = extracted
+        mock_identify_score_stage.return_value.score_excerpts.return_value = scored
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': self.args.toJSON()}
+        self.assertTrue(task_identify_extract(dict(the_task, bibcodes=bibcodes)))
+        # the extract stage retrieves the docs of the bibcodes
+        mock_search_retrieval.return_value.bibcodes_query.assert_called_once_with(bibcodes)
+        mock_identify_instance.extract_excerpts.assert_called_once_with(docs)
+        mock_task_identify_score.delay.assert_called_once_with(dict(the_task, bibcodes=bibcodes, docs=extracted))
+
+        self.assertTrue(task_identify_score(dict(the_task, docs=extracted)))
+        # the score stage sets up only the components it calls
+        self.assertEqual(mock_identify_score_stage.call_args.args[0].toJSON(), self.args.toJSON())
+        mock_identify_score_stage.return_value.score_excerpts.assert_called_once_with(extracted)
+        mock_identify_instance.score_excerpts.assert_not_called()
+        mock_task_identify_label.delay.assert_called_once_with(dict(the_task, docs=scored))
+
+        # nothing extracted
+        mock_task_identify_score.reset_mock()
+        mock_identify_instance.extract_excerpts.return_value = []
+        self.assertFalse(task_identify_extract(dict(the_task, bibcodes=bibcodes)))
+        mock_task_identify_score.delay.assert_not_called()
+
+        self.assertFalse(task_identify_extract(the_task))
+        self.assertFalse(task_identify_score(the_task))
+
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.IdentifyLabelStage')
+    def test_task_identify_label(self, mock_identify_label_stage, mock_app):
+        """ last stage of identify builds the knowledge graphs, labels the excerpts, and saves the records """
+
+        mock_record = MagicMock()
+        mock_identify_instance = mock_identify_label_stage.return_value
+        mock_identify_instance.label_excerpts.return_value = [mock_record]
+        mock_app.get_knowledge_base_keywords.side_effect = [[['crater']], [['bond']]]
+        mock_app.insert_named_entity_records.return_value = True
+
+        scored = [{'bibcode': '2000Icar..100..100A'}]
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': self.args.toJSON(), 'docs': scored}
+        self.assertTrue(task_identify_label(the_task))
+        self.assertEqual(mock_identify_label_stage.call_args.args[1:3], ([['crater']], [['bond']]))
+        mock_identify_instance.label_excerpts.assert_called_once_with(scored)
+        mock_app.insert_named_entity_records.assert_called_once_with([mock_record])
+
+        # nothing labeled
+        mock_app.reset_mock()
+        mock_app.get_knowledge_base_keywords.side_effect = None
+        mock_identify_instance.label_excerpts.return_value = []
+        self.assertFalse(task_identify_label(the_task))
+        mock_app.insert_named_entity_records.assert_not_called()
+
+        self.assertFalse(task_identify_label({}))
+
+    @patch.dict('adsplanetnamepipe.tasks.config', {'PLANETARYNAMES_PIPELINE_INCREMENTAL_IDENTIFY': True})
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.IdentifyPlanetaryEntities')
+    def test_task_process_planetary_nomenclature_identify_incremental(self, mock_identify_planetary_entities, mock_app):
+        """ identify_recent only identifies the docs new or modified since the last run, and records them once saved """
+
+        docs = [{'bibcode': '2000Icar..100..100A', 'fulltext_mtime': '2024-01-01T00:00:00Z'},
+                {'bibcode': '2000Icar..100..101A', 'fulltext_mtime': '2024-01-01T00:00:00Z'},
+                {'bibcode': '2000Icar..100..102A', 'fulltext_mtime': '2024-02-01T00:00:00Z'}]
+        mock_identify_instance = mock_identify_planetary_entities.return_value
+        mock_identify_instance.search_retrieval.identify_terms_query.return_value = docs
+        mock_identify_instance.identify.return_value = [MagicMock()]
+        mock_app.get_knowledge_base_keywords.return_value = [['crater']]
+        mock_app.get_identify_watermark.return_value = '2024-01-01T00:00:00Z'
+        mock_app.get_identified_fulltexts.return_value = {('2000Icar..100..100A', '2024-01-01T00:00:00Z')}
+        mock_app.insert_named_entity_records.return_value = True
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify_recent.value, 'args': self.args.toJSON()}
+        self.assertTrue(task_process_planetary_nomenclature(the_task))
+
+        mock_identify_instance.search_retrieval.identify_terms_query.assert_called_once_with('2024-01-01T00:00:00Z', '')
+        mock_identify_instance.identify.assert_called_once_with(docs[1:])
+        mock_app.insert_identified_fulltexts.assert_called_once_with('Rayleigh', 'Crater', 'Mars',
+                                                                     [('2000Icar..100..101A', '2024-01-01T00:00:00Z'),
+                                                                      ('2000Icar..100..102A', '2024-02-01T00:00:00Z')],
+                                                                     move_watermark=True)
+
+        # the records were not saved, so the docs are identified again in the next run
+        mock_app.insert_identified_fulltexts.reset_mock()
+        mock_app.insert_named_entity_records.return_value = False
+        self.assertFalse(task_process_planetary_nomenclature(the_task))
+        mock_app.insert_identified_fulltexts.assert_not_called()
+
+        # nothing identified in the new docs, the run is still recorded
+        mock_identify_instance.identify.return_value = []
+        self.assertFalse(task_process_planetary_nomenclature(the_task))
+        mock_app.insert_identified_fulltexts.assert_called_once()
+
+        # identify is not incremental
+        mock_app.get_identify_watermark.reset_mock()
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': self.args.toJSON()}
+        task_process_planetary_nomenclature(the_task)
+        mock_app.get_identify_watermark.assert_not_called()
+        mock_identify_instance.identify.assert_called_with(None)
+
+    @patch.dict('adsplanetnamepipe.tasks.config', {'PLANETARYNAMES_PIPELINE_IDENTIFY_CHECKPOINT': True})
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.IdentifyPlanetaryEntities')
+    def test_task_process_planetary_nomenclature_identify_checkpoint(self, mock_identify_planetary_entities, mock_app):
+        """ identify saves to the checkpoint of the task, which is purged along with saving the records """
+
+        mock_records = [MagicMock(), MagicMock()]
+        mock_identify_instance = mock_identify_planetary_entities.return_value
+        checkpoints = []
+        def identify(docs):
+            checkpoints.append(mock_identify_instance.checkpoint)
+            return [mock_records[len(checkpoints) - 1]]
+        mock_identify_instance.identify.side_effect = identify
+        mock_app.get_knowledge_base_keywords.return_value = [['crater']]
+        mock_app.insert_named_entity_records.return_value = True
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': self.args.toJSON()}
+        self.assertTrue(task_process_planetary_nomenclature(the_task))
+        self.assertEqual(checkpoints[0].key, ('Rayleigh', 'Crater', 'Mars', '2000-01-01'))
+        self.assertIsNone(mock_identify_instance.checkpoint)
+        mock_app.insert_named_entity_records.assert_called_once_with([mock_records[0]], [('Rayleigh', 'Crater', 'Mars', '2000-01-01')])
+
+        # in batch, the checkpoints of all the feature names are purged with the records
+        checkpoints.clear()
+        mock_app.reset_mock()
+        mock_app.insert_named_entity_records.return_value = True
+        args_list = [EntityArgs(**dict(self.args.toJSON(), feature_name=feature_name)) for feature_name in ['Rayleigh', 'Galle']]
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': [args.toJSON() for args in args_list]}
+        self.assertTrue(task_process_planetary_nomenclature_batch(the_task))
+        mock_app.insert_named_entity_records.assert_called_once_with(mock_records, [('Rayleigh', 'Crater', 'Mars', '2000-01-01'),
+                                                                                    ('Galle', 'Crater', 'Mars', '2000-01-01')])
+
+        # nothing identified, the checkpoint is purged on its own
+        mock_identify_instance.identify.side_effect = None
+        mock_identify_instance.identify.return_value = []
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': self.args.toJSON()}
+        self.assertFalse(task_process_planetary_nomenclature(the_task))
+        mock_app.remove_identify_checkpoints.assert_called_once_with('Rayleigh', 'Crater', 'Mars', '2000-01-01')
+
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.CollectKnowldegeBase')
+    def test_task_process_planetary_nomenclature_estimated_cost(self, mock_collect_knowledgebase, mock_app):
+        """ the runtime of a task queued with its estimated cost is logged next to the estimate """
+
+        mock_collect_knowledgebase.return_value.collect.return_value = [MagicMock()]
+        mock_app.insert_knowledge_base_records.return_value = True
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.collect.value, 'args': self.args.toJSON(), 'estimated_docs': 120}
+        with patch('adsplanetnamepipe.tasks.logger.info') as mock_info_logger:
+            self.assertTrue(task_process_planetary_nomenclature(the_task))
+            self.assertRegex(mock_info_logger.call_args.args[0], r'^Task collect for Rayleigh estimated at 120 docs ran in [0-9.]+ s\.$')
+
+            # in batch
+            the_task['args'] = [self.args.toJSON(), dict(self.args.toJSON(), feature_name='Galle')]
+            self.assertTrue(task_process_planetary_nomenclature_batch(the_task))
+            self.assertRegex(mock_info_logger.call_args.args[0], r'^Task collect for Rayleigh, Galle estimated at 120 docs ran in [0-9.]+ s\.$')
+
+            # not estimated
+            mock_info_logger.reset_mock()
+            del the_task['estimated_docs']
+            task_process_planetary_nomenclature_batch(the_task)
+            mock_info_logger.assert_not_called()
+
+    @patch.dict('adsplanetnamepipe.tasks.config', {'PLANETARYNAMES_PIPELINE_TASK_DOCS_BUDGET': 2})
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.task_process_planetary_nomenclature.delay')
+    @patch('adsplanetnamepipe.tasks.IdentifyPlanetaryEntities')
+    def test_task_process_planetary_nomenclature_identify_budget(self, mock_identify_planetary_entities, mock_delay, mock_app):
+        """ once the budget is spent, the records identified are saved and the docs left are continued in a new task """
+
+        docs = [{'bibcode': '2000Icar..100..100A'}, {'bibcode': '2000Icar..100..101A'}, {'bibcode': '2000Icar..100..102A'}]
+        mock_record = MagicMock()
+        mock_identify_instance = mock_identify_planetary_entities.return_value
+        mock_identify_instance.search_retrieval.identify_terms_query.return_value = docs
+        def identify(docs):
+            list(mock_identify_instance.budget.take(docs or mock_identify_instance.search_retrieval.identify_terms_query()))
+            return [mock_record]
+        mock_identify_instance.identify.side_effect = identify
+        mock_app.get_knowledge_base_keywords.return_value = [['crater']]
+        mock_app.insert_named_entity_records.return_value = True
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': self.args.toJSON()}
+        self.assertTrue(task_process_planetary_nomenclature(the_task))
+        mock_app.insert_named_entity_records.assert_called_once_with([mock_record])
+        continuation = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value,
+                        'args': self.args.toJSON(),
+                        'bibcodes': ['2000Icar..100..102A']}
+        mock_delay.assert_called_once_with(continuation)
+        self.assertIsNone(mock_identify_instance.budget)
+
+        # the continuation identifies only the docs left, retrieved by their bibcodes, with a budget of its own
+        mock_delay.reset_mock()
+        mock_identify_instance.search_retrieval.identify_terms_query.reset_mock()
+        mock_identify_instance.search_retrieval.bibcodes_query.return_value = [docs[2]]
+        self.assertTrue(task_process_planetary_nomenclature(continuation))
+        mock_identify_instance.search_retrieval.bibcodes_query.assert_called_once_with(['2000Icar..100..102A'])
+        mock_identify_instance.search_retrieval.identify_terms_query.assert_not_called()
+        mock_identify_instance.identify.assert_called_with([docs[2]])
+        mock_delay.assert_not_called()
+
+        # in batch, the docs left of the feature name the budget is spent in are continued in a new task,
+        # and the feature names not started yet in a new batch task, without setting them up
+        mock_identify_instance.identify.reset_mock()
+        mock_identify_instance.search_retrieval.identify_terms_query.return_value = docs
+        args_list = [EntityArgs(**dict(self.args.toJSON(), feature_name=feature_name)) for feature_name in ['Rayleigh', 'Galle', 'Airy']]
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value, 'args': [args.toJSON() for args in args_list]}
+        with patch('adsplanetnamepipe.tasks.task_process_planetary_nomenclature_batch.delay') as mock_batch_delay, \
+             patch('adsplanetnamepipe.tasks.CollectKnowldegeBase'), \
+             patch('adsplanetnamepipe.tasks.prefetch_identify_docs', return_value=[None, None, None]):
+            self.assertTrue(task_process_planetary_nomenclature_batch(the_task))
+            self.assertEqual(mock_identify_instance.identify.call_count, 1)
+            self.assertEqual([(call.args[0]['args']['feature_name'], call.args[0]['bibcodes']) for call in mock_delay.call_args_list],
+                             [('Rayleigh', ['2000Icar..100..102A'])])
+            mock_batch_delay.assert_called_once_with({'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value,
+                                                      'args': [args_list[1].toJSON(), args_list[2].toJSON()]})
+
+            # end_to_end is continued with identify, and when the budget is spent before any feature name, all are continued
+            mock_batch_delay.reset_mock()
+            mock_identify_instance.identify.reset_mock()
+            the_task['action_type'] = PLANETARYNAMES_PIPELINE_ACTION.end_to_end.value
+            with patch('adsplanetnamepipe.tasks.TaskBudget.is_exceeded', return_value=True):
+                task_process_planetary_nomenclature_batch(the_task)
+            mock_identify_instance.identify.assert_not_called()
+            mock_batch_delay.assert_called_once_with({'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify.value,
+                                                      'args': [args.toJSON() for args in args_list]})
+
+    @patch.dict('adsplanetnamepipe.tasks.config', {'PLANETARYNAMES_PIPELINE_TASK_DOCS_BUDGET': 2,
+                                                   'PLANETARYNAMES_PIPELINE_INCREMENTAL_IDENTIFY': True})
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.task_process_planetary_nomenclature.delay')
+    @patch('adsplanetnamepipe.tasks.IdentifyPlanetaryEntities')
+    def test_task_process_planetary_nomenclature_identify_budget_incremental(self, mock_identify_planetary_entities, mock_delay, mock_app):
+        """ when docs are left for a new task, the docs identified are recorded without moving the watermark """
+
+        docs = [{'bibcode': '2000Icar..100..102A', 'fulltext_mtime': '2024-03-01T00:00:00Z'},
+                {'bibcode': '2000Icar..100..101A', 'fulltext_mtime': '2024-02-01T00:00:00Z'},
+                {'bibcode': '2000Icar..100..100A', 'fulltext_mtime': '2024-01-01T00:00:00Z'}]
+        mock_identify_instance = mock_identify_planetary_entities.return_value
+        mock_identify_instance.search_retrieval.identify_terms_query.return_value = docs
+        mock_identify_instance.search_retrieval.bibcodes_query.return_value = docs[2:]
+        def identify(docs):
+            list(mock_identify_instance.budget.take(docs))
+            return [MagicMock()]
+        mock_identify_instance.identify.side_effect = identify
+        mock_app.get_knowledge_base_keywords.return_value = [['crater']]
+        mock_app.get_identify_watermark.return_value = ''
+        mock_app.get_identified_fulltexts.return_value = set()
+        mock_app.insert_named_entity_records.return_value = True
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify_recent.value, 'args': self.args.toJSON()}
+        self.assertTrue(task_process_planetary_nomenclature(the_task))
+        mock_app.insert_identified_fulltexts.assert_called_once_with('Rayleigh', 'Crater', 'Mars',
+                                                                     [('2000Icar..100..102A', '2024-03-01T00:00:00Z'),
+                                                                      ('2000Icar..100..101A', '2024-02-01T00:00:00Z')],
+                                                                     move_watermark=False)
+
+        # the continuation takes all the docs left, so it moves the watermark
+        mock_app.insert_identified_fulltexts.reset_mock()
+        self.assertTrue(task_process_planetary_nomenclature(mock_delay.call_args.args[0]))
+        mock_app.insert_identified_fulltexts.assert_called_once_with('Rayleigh', 'Crater', 'Mars',
+                                                                     [('2000Icar..100..100A', '2024-01-01T00:00:00Z')],
+                                                                     move_watermark=True)
+
+        # in batch
+        mock_app.insert_identified_fulltexts.reset_mock()
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify_recent.value, 'args': [self.args.toJSON()]}
+        self.assertTrue(task_process_planetary_nomenclature_batch(the_task))
+        self.assertFalse(mock_app.insert_identified_fulltexts.call_args.kwargs['move_watermark'])
+
+    @patch.dict('adsplanetnamepipe.tasks.config', {'PLANETARYNAMES_PIPELINE_INCREMENTAL_IDENTIFY': True})
+    @patch('adsplanetnamepipe.tasks.app')
+    @patch('adsplanetnamepipe.tasks.task_identify_extract')
+    @patch('adsplanetnamepipe.tasks.SearchRetrieval')
+    @patch('adsplanetnamepipe.tasks.IdentifyLabelStage')
+    @patch('adsplanetnamepipe.tasks.IdentifyPlanetaryEntities')
+    def test_task_identify_stages_incremental(self, mock_identify_planetary_entities, mock_identify_label_stage,
+                                              mock_search_retrieval, mock_task_identify_extract, mock_app):
+        """ the identified fulltexts are passed along the stages, and recorded by the stage the run ends in """
+
+        docs = [{'bibcode': '2000Icar..100..100A', 'fulltext_mtime': '2024-01-01T00:00:00Z'}]
+        mock_search_retrieval.return_value.identify_terms_query.return_value = docs
+        mock_app.get_identify_watermark.return_value = ''
+        mock_app.get_identified_fulltexts.return_value = set()
+
+        the_task = {'action_type': PLANETARYNAMES_PIPELINE_ACTION.identify_recent.value, 'args': self.args.toJSON()}
+        self.assertTrue(task_identify_retrieve(the_task))
+        fulltexts = [('2000Icar..100..100A', '2024-01-01T00:00:00Z')]
+        bibcodes = ['2000Icar..100..100A']
+        mock_task_identify_extract.delay.assert_called_once_with(dict(the_task, fulltexts=fulltexts, bibcodes=bibcodes))
+
+        # nothing extracted, the run ends in the extract stage
+        mock_search_retrieval.return_value.bibcodes_query.return_value = docs
+        mock_identify_planetary_entities.return_value.extract_excerpts.return_value = []
+        self.assertFalse(task_identify_extract(dict(the_task, fulltexts=fulltexts, bibcodes=bibcodes)))
+        mock_app.insert_identified_fulltexts.assert_called_once_with('Rayleigh', 'Crater', 'Mars', fulltexts, move_watermark=True)
+
+        # or in the label stage once the records are saved
+        mock_app.reset_mock()
+        mock_app.get_knowledge_base_keywords.return_value = [['crater']]
+        mock_identify_label_stage.return_value.label_excerpts.return_value = [MagicMock()]
+        mock_app.insert_named_entity_records.return_value = True
+        self.assertTrue(task_identify_label(dict(the_task, fulltexts=fulltexts, docs=[])))
+        mock_app.insert_identified_fulltexts.assert_called_once_with('Rayleigh', 'Crater', 'Mars', fulltexts, move_watermark=True)
+
     def test_task_process_planetary_nomenclature_invalid_task(self):
         """ calling tasks queue when in collecting stage and fails """
 
@@ -0,0 +1,124 @@
+import threading
+from typing import Dict, List
+
+from adsputils import setup_logging, load_config
+
+logger = setup_logging('utils')
+config = {}
+config.update(load_config())
+
+
+class CollectGates(object):
+    """
+    a class that checks the thresholds a doc has to pass for its records to be collected as positive knowledge base entries
+
+    each threshold is checked as soon as its score is known, the cheap paper relevance score first, then, before each
+    excerpt, whether the excerpts left can still lift the kept records and the average of the local llm scores to the
+    thresholds, so that once a doc cannot pass, the expensive steps left for it (fulltext and excerpt keywords, nasa
+    concepts, and local llm scores) are skipped, the outcome is the same as checking all the thresholds at the end
+    """
+
+    # experimented and 0.6 is a good threshold
+    min_paper_relevance_score = 0.6
+    # experimented and 0.5 is a good threshold, the local llm scores are between 0 and 1
+    min_avg_local_llm_score = 0.5
+    # at least half of the original excerpts has to remain, counting the fulltext record
+    min_kept_ratio = 0.5
+
+    # counts of the docs checked and gated, and of the calls saved, shared by all the instances in the process
+    stats = {'docs': 0, 'gated_paper_relevance': 0, 'gated_excerpts': 0, 'gated_local_llm': 0,
+             'fulltext_keywords_calls_saved': 0, 'keywords_calls_saved': 0,
+             'special_keywords_calls_saved': 0, 'local_llm_calls_saved': 0}
+    # guards the shared stats, instances can be used from multiple threads
+    lock = threading.Lock()
+
+    def check_paper_relevance(self, paper_relevance_score: float, num_excerpts: int) -> bool:
+        """
+        check the paper relevance score, before any keywords are extracted for the doc
+
+        :param paper_relevance_score: paper relevance score of the doc
+        :param num_excerpts: number of excerpts of the doc
+        :return: False if the doc cannot pass
+        """
+        with self.lock:
+            self.stats['docs'] += 1
+        if paper_relevance_score >= self.min_paper_relevance_score:
+            return True
+
+        self.count_saved('gated_paper_relevance', num_excerpts, fulltext=True)
+        return False
+
+    def check_excerpts_left(self, num_kept_records: int, local_llm_scores: List[float], num_excerpts: int, num_excerpts_left: int) -> bool:
+        """
+        check whether the excerpts left can still get the doc to pass, before processing the next excerpt
+
+        :param num_kept_records: number of records kept so far, the fulltext one and one for each scored excerpt
+        :param local_llm_scores: local llm scores of the excerpts kept so far
+        :param num_excerpts: number of excerpts of the doc
+        :param num_excerpts_left: number of excerpts not processed yet
+        :return: False if the doc cannot pass
+        """
+        # at best, all the excerpts left are kept
+        if num_kept_records + num_excerpts_left < self.min_kept_ratio * num_excerpts:
+            self.count_saved('gated_excerpts', num_excerpts_left)
+            return False
+
+        # at best, all the excerpts left are kept with the local llm score of 1
+        num_scores = len(local_llm_scores) + num_excerpts_left
+        if num_scores == 0 or (sum(local_llm_scores) + num_excerpts_left) / num_scores < self.min_avg_local_llm_score:
+            self.count_saved('gated_local_llm', num_excerpts_left)
+            return False
+        return True
+
+    def check(self, paper_relevance_score: float, num_kept_records: int, local_llm_scores: List[float], num_excerpts: int) -> bool:
+        """
+        check all the thresholds, once all the excerpts of the doc are processed
+
+        :param paper_relevance_score: paper relevance score of the doc
+        :param num_kept_records: number of records kept, the fulltext one and one for each scored excerpt
+        :param local_llm_scores: local llm scores of the excerpts kept
+        :param num_excerpts: number of excerpts of the doc
+        :return: True if the records of the doc are to be collected
+        """
+        if not local_llm_scores:
+            return False
+        avg_local_llm_scores = sum(local_llm_scores) / len(local_llm_scores)
+        return avg_local_llm_scores >= self.min_avg_local_llm_score and \
+               paper_relevance_score >= self.min_paper_relevance_score and \
+               num_kept_records >= self.min_kept_ratio * num_excerpts
+
+    def count_saved(self, gate: str, num_excerpts_left: int, fulltext: bool = False):
+        """
+        count a gated doc and the calls saved for it
+
+        :param gate: the name of the gate, the key in stats
+        :param num_excerpts_left: number of excerpts not processed
+        :param fulltext: True if the fulltext keywords were not extracted either
+        :return:
+        """
+        with self.lock:
+            self.stats[gate] += 1
+            self.stats['fulltext_keywords_calls_saved'] += int(fulltext)
+            self.stats['keywords_calls_saved'] += num_excerpts_left
+            # at most, only the excerpts with keywords get these
+            self.stats['special_keywords_calls_saved'] += num_excerpts_left
+            self.stats['local_llm_calls_saved'] += num_excerpts_left
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        the counts of the docs checked and gated, and of the calls saved in the process,
+        the special keywords and local llm calls saved are upper bounds
+
+        :return: dict of the counts
+        """
+        with self.lock:
+            return dict(self.stats)
+
+    def log_stats(self, feature_name: str):
+        """
+        log the counts, once the docs of a feature name are collected
+
+        :param feature_name: the feature name the docs were collected for
+        :return:
+        """
+        logger.info(f"Collect gates after {feature_name}: {self.get_stats()}.")
@@ -0,0 +1,97 @@
+import threading
+from typing import Callable, Dict, List, Tuple
+
+from adsputils import setup_logging, load_config
+
+logger = setup_logging('utils')
+config = {}
+config.update(load_config())
+
+from adsplanetnamepipe.utils.match_excerpt import MatchExcerpt
+from adsplanetnamepipe.utils.extract_keywords import ExtractKeywords
+from adsplanetnamepipe.utils.adsabs_ner import ADSabsNER
+
+
+class EndToEndContext(object):
+    """
+    a class that keeps the excerpts and keywords computed for one feature name in an end_to_end task,
+    so that the collect and the identify phases compute them once for the docs both retrieve
+
+    the excerpts are kept by bibcode, the keywords and the special keywords by excerpt, since the excerpts and the keywords
+    depend only on the doc, the excerpt, and the args of the feature name, both phases get the same results as computing
+    them each, the paper relevance scores are already shared, by PaperRelevanceCache
+    """
+
+    def __init__(self):
+        """
+        initialize the EndToEndContext class
+        """
+        self.excerpts = {}
+        self.keywords = {}
+        self.special_keywords = {}
+        self.stats = {'excerpts_hits': 0, 'excerpts_misses': 0,
+                      'keywords_hits': 0, 'keywords_misses': 0,
+                      'special_keywords_hits': 0, 'special_keywords_misses': 0}
+        # the phases can run their steps from multiple threads
+        self.lock = threading.Lock()
+
+    def get_excerpts(self, match_excerpt: MatchExcerpt, doc: Dict, adsabs_ner: ADSabsNER) -> Tuple[bool, List[str]]:
+        """
+        get the excerpts of the doc, computing them only the first time
+
+        :param match_excerpt: the MatchExcerpt of the phase
+        :param doc: solr document
+        :param adsabs_ner: the ADSabsNER of the phase
+        :return: the output of MatchExcerpt.forward
+        """
+        return self.get('excerpts', doc['bibcode'], lambda: match_excerpt.forward(doc, adsabs_ner))
+
+    def get_keywords(self, extract_keywords: ExtractKeywords, excerpt: str, num_keywords: int) -> List[str]:
+        """
+        get the keywords of the excerpt, computing them only the first time
+
+        :param extract_keywords: the ExtractKeywords of the phase
+        :param excerpt: input text excerpt
+        :param num_keywords: number of keywords to extract
+        :return: the output of ExtractKeywords.forward
+        """
+        return self.get('keywords', (excerpt, num_keywords), lambda: extract_keywords.forward(excerpt, num_keywords=num_keywords))
+
+    def get_special_keywords(self, extract_keywords: ExtractKeywords, excerpt: str) -> List[str]:
+        """
+        get the special keywords of the excerpt, computing them only the first time
+
+        :param extract_keywords: the ExtractKeywords of the phase
+        :param excerpt: input text excerpt
+        :return: the output of ExtractKeywords.forward_special
+        """
+        return self.get('special_keywords', excerpt, lambda: extract_keywords.forward_special(excerpt))
+
+    def get(self, name: str, key: object, compute: Callable[[], object]) -> object:
+        """
+        get a result kept in the context, computing it only the first time
+
+        :param name: name of the dict the results are kept in
+        :param key: key of the result
+        :param compute: function computing the result
+        :return: the result
+        """
+        results = getattr(self, name)
+        with self.lock:
+            if key in results:
+                self.stats[f'{name}_hits'] += 1
+                return results[key]
+        result = compute()
+        with self.lock:
+            results[key] = result
+            self.stats[f'{name}_misses'] += 1
+        return result
+
+    def log_stats(self, feature_name: str):
+        """
+        log how many of the excerpts and keywords were computed once for both phases
+
+        :param feature_name: the feature name of the context
+        :return:
+        """
+        logger.info(f"End to end context for {feature_name}: {self.stats}.")
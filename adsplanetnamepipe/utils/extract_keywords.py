@@ -1,4 +1,6 @@
 import os
+import fcntl
+import hashlib
 import regex
 import math
 from collections import OrderedDict
@@ -16,7 +18,11 @@ import spacy
 spacy_model = spacy.load("en_core_web_lg")
 
 import yake
-from sklearn.feature_extraction.text import TfidfVectorizer
+import numpy as np
+from scipy.sparse import csr_matrix, diags
+from sklearn.feature_extraction.text import TfidfVectorizer, CountVectorizer
+from sklearn.preprocessing import normalize
+from sklearn.utils import murmurhash3_32
 from nltk.stem import WordNetLemmatizer
 from nltk.corpus import stopwords
 
@@ -247,6 +253,188 @@ class YakeWrapper():
         return list(set(tokens))
 
 
+class CorpusIdf():
+
+    """
+    a class that keeps the document frequency of terms over the harvested corpus, to compute idf at the corpus level
+
+    terms are hashed into a fixed number of buckets, so that the table has a fixed size and can be updated
+    incrementally, the table is persisted as numpy files that are memory mapped for reading, and is updated
+    under a file lock, since multiple workers can be updating it
+
+    the same doc is retrieved for many feature names and on every collect_recent, so the (bibcode, fulltext_mtime)
+    pairs already counted are kept in a ledger next to the table, and only the docs not in it are added, the table
+    is reloaded once another process has updated it, so that long lived pipelines see the updates
+    """
+
+    # number of hash buckets for the terms
+    n_features = 2 ** 20
+    # minimum number of documents in the corpus before its idf is used
+    min_num_docs = 100
+    # directory where the document frequencies are persisted, it has to be writable and shared by all the workers
+    idf_path = config.get('PLANETARYNAMES_PIPELINE_CORPUS_IDF_PATH', '/tmp/adsplanetnamepipe/corpus_idf')
+
+    def __init__(self, idf_path: str = None):
+        """
+        initialize the CorpusIdf class by loading the persisted document frequencies, if any
+
+        :param idf_path: directory where the document frequencies are persisted, default is idf_path
+        """
+        self.idf_path = idf_path or self.idf_path
+        self.doc_freq_file = os.path.join(self.idf_path, 'doc_freq.npy')
+        self.num_docs_file = os.path.join(self.idf_path, 'num_docs.npy')
+        self.counted_file = os.path.join(self.idf_path, 'counted.npy')
+        self.lock_file = os.path.join(self.idf_path, 'update.lock')
+        # the same tokenization as the vectorizers of TfidfWrapper
+        self.analyzer = CountVectorizer().build_analyzer()
+        self.load()
+
+    def load(self):
+        """
+        load the persisted document frequencies, or start with an empty table
+
+        :return:
+        """
+        try:
+            # num_docs is saved last, so if it has not changed since, neither has the table
+            self.version = self.get_version()
+            self.doc_freq = np.load(self.doc_freq_file, mmap_mode='r')
+            self.num_docs = int(np.load(self.num_docs_file))
+        except (OSError, ValueError):
+            self.doc_freq = np.zeros(self.n_features, dtype=np.int32)
+            self.num_docs = 0
+
+    def get_version(self) -> Tuple[int, int]:
+        """
+        the version of the persisted table, the file is replaced on each update, so it changes with each update
+
+        :return: tuple of inode and modification time of the num_docs file, or (-1, -1) if there is none
+        """
+        try:
+            stat = os.stat(self.num_docs_file)
+            return (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            return (-1, -1)
+
+    def refresh(self):
+        """
+        reload the table if another process has updated it since it was loaded
+
+        :return:
+        """
+        if self.get_version() != self.version:
+            self.load()
+
+    def is_ready(self) -> bool:
+        """
+        check if enough documents have been seen for the corpus idf to be used, reloading the table if it has been updated
+
+        :return: True if the corpus idf can be used, False otherwise
+        """
+        self.refresh()
+        return self.num_docs >= self.min_num_docs
+
+    def hash_terms(self, terms: List[str]) -> np.ndarray:
+        """
+        map terms to their hash buckets
+
+        :param terms: list of terms
+        :return: array of bucket indices
+        """
+        return np.array([murmurhash3_32(term, positive=True) % self.n_features for term in terms], dtype=np.int64)
+
+    def idf(self, terms: List[str]) -> np.ndarray:
+        """
+        compute the smoothed idf of terms, the same formula TfidfVectorizer uses
+
+        :param terms: list of terms
+        :return: array of idf values
+        """
+        doc_freq = self.doc_freq[self.hash_terms(terms)]
+        return np.log((1 + self.num_docs) / (1 + doc_freq)) + 1
+
+    def update(self, docs: List[Dict]) -> bool:
+        """
+        add the documents not counted yet to the document frequencies, and persist them
+
+        :param docs: list of documents as dictionaries
+        :return: True if the table was updated, False otherwise
+        """
+        if not docs:
+            return False
+
+        try:
+            os.makedirs(self.idf_path, exist_ok=True)
+            with open(self.lock_file, 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # other workers might have updated the table since it was loaded
+                self.load()
+                counted = self.load_counted()
+                keys = {}
+                for doc in docs:
+                    keys.setdefault(self.get_doc_key(doc), doc)
+                new_keys = np.array(list(keys.keys()), dtype=np.int64)
+                new_keys = new_keys[~np.isin(new_keys, counted)]
+                if len(new_keys) == 0:
+                    return False
+
+                # each term is counted once per document
+                indices = np.concatenate([np.unique(self.hash_terms(set(self.analyzer(self.get_text(keys[key])))))
+                                          for key in new_keys.tolist()])
+                doc_freq = self.doc_freq + np.bincount(indices, minlength=self.n_features).astype(np.int32)
+                self.save(self.doc_freq_file, doc_freq)
+                self.save(self.counted_file, np.union1d(counted, new_keys))
+                self.save(self.num_docs_file, np.array(self.num_docs + len(new_keys)))
+            self.load()
+            return True
+        except OSError as e:
+            logger.error(f"Unable to update the corpus idf: {str(e)}")
+            return False
+
+    def load_counted(self) -> np.ndarray:
+        """
+        load the ledger of the docs already counted
+
+        :return: sorted array of the keys of the docs counted, see get_doc_key
+        """
+        try:
+            return np.load(self.counted_file)
+        except (OSError, ValueError):
+            return np.array([], dtype=np.int64)
+
+    def get_doc_key(self, doc: Dict) -> int:
+        """
+        the key of a doc in the ledger, a 64 bit hash of its bibcode and fulltext_mtime,
+        so that a doc is counted again only once its fulltext is modified
+
+        :param doc: input document as a dictionary
+        :return: the key
+        """
+        digest = hashlib.blake2b(f"{doc.get('bibcode', '')}|{doc.get('fulltext_mtime', '')}".encode('utf-8'), digest_size=8).digest()
+        return int.from_bytes(digest, byteorder='little', signed=True)
+
+    def save(self, file_path: str, values: np.ndarray):
+        """
+        save an array to a temporary file and then replace the file, so readers never see a partial file
+
+        :param file_path: path of the numpy file
+        :param values: array to save
+        :return:
+        """
+        with open(file_path + '.tmp', 'wb') as file:
+            np.save(file, values)
+        os.replace(file_path + '.tmp', file_path)
+
+    def get_text(self, doc: Dict) -> str:
+        """
+        get the text of a document that its terms are counted
+
+        :param doc: input document as a dictionary
+        :return: title, abstract, and body of the document
+        """
+        return ' '.join(doc.get('title', '')) + ' ' + doc.get('abstract', '') + ' ' + doc.get('body', '')
+
+
 class TfidfWrapper():
 
     """
@@ -255,8 +443,8 @@ class TfidfWrapper():
     this class provides methods for extracting top keywords using TF-IDF
     """
 
-    # TF-IDF vectorizer for converting text to a matrix of TF-IDF features
-    vectorizer = TfidfVectorizer()
+    # number of top scoring terms considered before filtering
+    num_top_terms = 40
     # WordNet lemmatizer for reducing words to their base forms
     lemmatizer = WordNetLemmatizer()
 
@@ -270,6 +458,14 @@ class TfidfWrapper():
                     'very', 'also', 'just', 'being', 'over', 'own', 'yours', 'such']
     stop_words.update(custom_stops)
 
+    def __init__(self, corpus_idf: CorpusIdf = None):
+        """
+        initialize the TfidfWrapper class
+
+        :param corpus_idf: optional corpus level idf, once it is ready, the idf is no longer computed per document
+        """
+        self.corpus_idf = corpus_idf
+
     def extract_top_keywords(self, doc: Dict) -> List[str]:
         """
         extract top keywords from the document using TF-IDF
@@ -277,10 +473,79 @@ class TfidfWrapper():
         :param doc: input document as a dictionary
         :return: list of extracted keywords
         """
+        if self.corpus_idf and self.corpus_idf.is_ready():
+            return self.extract_top_keywords_docs([doc])[0]
+
         segments = self.get_segments(doc)
-        tfidf_vectors = self.vectorizer.fit_transform(segments)
-        tfidf_features = self.vectorizer.get_feature_names_out()
-        top_tfidf = sorted(zip(tfidf_features, tfidf_vectors.sum(axis=0).tolist()[0]), key=lambda x: x[1], reverse=True)[:40]
+        # a vectorizer per call, since fitting a shared one is not safe when called from multiple threads
+        vectorizer = TfidfVectorizer()
+        tfidf_vectors = vectorizer.fit_transform(segments)
+        tfidf_features = vectorizer.get_feature_names_out()
+        top_tfidf = sorted(zip(tfidf_features, tfidf_vectors.sum(axis=0).tolist()[0]), key=lambda x: x[1], reverse=True)[:self.num_top_terms]
+        return self.select_keywords(top_tfidf)
+
+    def extract_top_keywords_docs(self, docs: List[Dict]) -> List[List[str]]:
+        """
+        extract top keywords from multiple documents using TF-IDF
+
+        the keywords of each document are the same as what extract_top_keywords returns, ie, the idf of a term
+        is computed over the segments of its own document, or is taken from the corpus idf once it is ready,
+        however the segments of all the documents are vectorized into one sparse matrix, and the idf weighting,
+        normalization, and sums are computed with sparse operations
+
+        :param docs: list of input documents as dictionaries
+        :return: list of extracted keywords for each document, in the order of docs
+        """
+        segments = []
+        segment_doc = []
+        for i, doc in enumerate(docs):
+            doc_segments = self.get_segments(doc)
+            segments += doc_segments
+            segment_doc += [i] * len(doc_segments)
+
+        vectorizer = CountVectorizer()
+        try:
+            counts = vectorizer.fit_transform(segments).astype(np.float64)
+        except ValueError:
+            # none of the documents have any tokens
+            return [[] for _ in docs]
+        features = vectorizer.get_feature_names_out()
+
+        segment_doc = np.array(segment_doc)
+        num_segments = len(segment_doc)
+        # indicator matrix of documents by segments
+        doc_segments = csr_matrix((np.ones(num_segments), (segment_doc, np.arange(num_segments))), shape=(len(docs), num_segments))
+
+        if self.corpus_idf and self.corpus_idf.is_ready():
+            # idf is from the corpus, so this is only a transform of the counts
+            tfidf = counts @ diags(self.corpus_idf.idf(features))
+        else:
+            # smoothed idf of each term per document, the same formula TfidfVectorizer uses
+            idf = (doc_segments @ (counts > 0).astype(np.float64)).tocsr()
+            num_doc_segments = np.asarray(doc_segments.sum(axis=1)).ravel()
+            idf.data = np.log((1 + np.repeat(num_doc_segments, np.diff(idf.indptr))) / (1 + idf.data)) + 1
+            tfidf = counts.multiply(idf[segment_doc])
+
+        # l2 normalized tf-idf of each segment, summed over the segments of each document
+        tfidf = normalize(csr_matrix(tfidf))
+        scores = (doc_segments @ tfidf).tocsr()
+
+        top_keywords = []
+        for i in range(len(docs)):
+            indices = scores.indices[scores.indptr[i]:scores.indptr[i + 1]]
+            data = scores.data[scores.indptr[i]:scores.indptr[i + 1]]
+            # highest scores first, and ties in alphabetical order of the terms, same as the stable sort of extract_top_keywords
+            top = np.lexsort((indices, -data))[:self.num_top_terms]
+            top_keywords.append(self.select_keywords([(features[indices[j]], data[j]) for j in top]))
+        return top_keywords
+
+    def select_keywords(self, top_tfidf: List[Tuple[str, float]]) -> List[str]:
+        """
+        filter the top scoring terms to get the keywords
+
+        :param top_tfidf: list of tuples of term and tf-idf score, sorted by score
+        :return: list of keywords
+        """
         top_tfidf = [(p, s) for p, s in top_tfidf if p not in self.stop_words]
 
         # lemmatize and remove small entities, also make sure the entities are all alpha characters
@@ -412,8 +677,10 @@ class ExtractKeywords():
         self.spacy = SpacyWrapper()
         self.yake = YakeWrapper()
         self.wiki = WikiWrapper()
-        self.tfidf = TfidfWrapper()
+        self.tfidf = TfidfWrapper(CorpusIdf() if config.get('PLANETARYNAMES_PIPELINE_CORPUS_IDF', False) else None)
         self.nasa = NASAWrapper()
+        # compiled vocabulary regexes, keyed by the vocabulary
+        self.re_vocabulary = {}
 
     def forward(self, excerpt: str, num_keywords: int = 16) -> List[str]:
         """
@@ -499,8 +766,58 @@ class ExtractKeywords():
         :param num_keywords: number of keywords to extract
         :return: list of extracted keywords
         """
-        re_vocabulary = regex.compile(r'(?i)\b(?:%s)\b' % '|'.join(vocabulary))
         tfidf_keywords = self.tfidf.extract_top_keywords(doc)
+        return self.verify_doc_keywords(tfidf_keywords, self.get_re_vocabulary(vocabulary), usgs_term, num_keywords)
+
+    def forward_docs(self, docs: List[Dict], vocabulary: List[str], usgs_term: bool, num_keywords: int = 20) -> List[List[str]]:
+        """
+        extract keywords from multiple documents using TF-IDF, in one batch
+
+        :param docs: list of input documents as dictionaries
+        :param vocabulary: list of vocabulary terms
+        :param usgs_term: boolean indicating if it's a USGS term
+        :param num_keywords: number of keywords to extract
+        :return: list of extracted keywords for each document, in the order of docs
+        """
+        re_vocabulary = self.get_re_vocabulary(vocabulary)
+        return [self.verify_doc_keywords(tfidf_keywords, re_vocabulary, usgs_term, num_keywords)
+                for tfidf_keywords in self.tfidf.extract_top_keywords_docs(docs)]
+
+    def update_corpus(self, docs: List[Dict]) -> bool:
+        """
+        add the harvested documents to the corpus idf, if corpus idf is enabled
+
+        :param docs: list of input documents as dictionaries
+        :return: True if the corpus idf was updated, False otherwise
+        """
+        if self.tfidf.corpus_idf:
+            return self.tfidf.corpus_idf.update(docs)
+        return False
+
+    def get_re_vocabulary(self, vocabulary: List[str]) -> regex.Pattern:
+        """
+        get the compiled regex matching the vocabulary, compiling it only the first time
+
+        :param vocabulary: list of vocabulary terms
+        :return: compiled regex
+        """
+        key = tuple(vocabulary)
+        re_vocabulary = self.re_vocabulary.get(key)
+        if not re_vocabulary:
+            re_vocabulary = regex.compile(r'(?i)\b(?:%s)\b' % '|'.join(vocabulary))
+            self.re_vocabulary[key] = re_vocabulary
+        return re_vocabulary
+
+    def verify_doc_keywords(self, tfidf_keywords: List[str], re_vocabulary: regex.Pattern, usgs_term: bool, num_keywords: int) -> List[str]:
+        """
+        decide if the keywords extracted from a document are to be included, depending on the vocabulary matches
+
+        :param tfidf_keywords: list of keywords extracted from the document
+        :param re_vocabulary: compiled regex matching the vocabulary
+        :param usgs_term: boolean indicating if it's a USGS term
+        :param num_keywords: number of keywords to extract
+        :return: list of extracted keywords, or empty list if the document is not to be included
+        """
         count_matches = len(list(set([token for token in tfidf_keywords if re_vocabulary.search(token)])))
         # when usgs_term, planetary related, need at least one matched token to among the vocabulary
         # to get included for processing
@@ -0,0 +1,71 @@
+from datetime import datetime
+from typing import Dict, List
+
+from adsputils import setup_logging, load_config
+
+logger = setup_logging('utils')
+config = {}
+config.update(load_config())
+
+from adsplanetnamepipe.utils.common import EntityArgs
+
+
+class GazetteerSnapshot(object):
+    """
+    a class that keeps the gazetteer tables the arguments of the pipeline are setup from (ie, the plural feature types,
+    the contexts of the ambiguous feature names, the multi-token feature names, the named entity labels, and the targets),
+    loaded with one query per table, indexed by entity
+
+    setting up the arguments of each feature name with the app methods takes five queries, so that a sweep over all the
+    feature names takes tens of thousands of them, with the snapshot, the arguments are the same and are setup in memory
+    """
+
+    def __init__(self, plural_feature_types: Dict[str, str], context_ambiguous_feature_names: Dict[str, List[str]],
+                 multi_token_containing_feature_names: Dict[str, List[str]], name_entity_labels: List[dict], all_targets: List[str]):
+        """
+        initialize the GazetteerSnapshot class
+
+        :param plural_feature_types: dict of feature type to its plural form
+        :param context_ambiguous_feature_names: dict of feature name to the list of its contexts
+        :param multi_token_containing_feature_names: dict of feature name to the list of multi-token entities containing it
+        :param name_entity_labels: list of dictionaries containing named entity labels and confidence values
+        :param all_targets: list of all target entities
+        """
+        self.plural_feature_types = plural_feature_types
+        self.context_ambiguous_feature_names = context_ambiguous_feature_names
+        self.multi_token_containing_feature_names = multi_token_containing_feature_names
+        self.name_entity_labels = name_entity_labels
+        self.all_targets = all_targets
+
+    def get_entity_args(self, feature_name: str, target: str, feature_type: str, timestamp: datetime) -> EntityArgs:
+        """
+        setup the arguments of the pipeline for a feature name from the snapshot
+
+        :param feature_name: the name of the feature to be processed
+        :param target: the current target entity (e.g., Moon, Mars)
+        :param feature_type: the feature type (e.g., Crater)
+        :param timestamp: timestamp for identifying or processing entities
+        :return: the arguments of the pipeline, the same as setting them up with the app methods
+        """
+        # copy the lists, so that the arguments of one feature name never share them with the snapshot
+        return EntityArgs(target=target,
+                          feature_type=feature_type,
+                          feature_type_plural=self.plural_feature_types.get(feature_type, ''),
+                          feature_name=feature_name,
+                          context_ambiguous_feature_names=list(self.context_ambiguous_feature_names.get(feature_name, [])),
+                          multi_token_containing_feature_names=list(self.multi_token_containing_feature_names.get(feature_name, [])),
+                          name_entity_labels=[dict(label) for label in self.name_entity_labels],
+                          timestamp=str(timestamp.date()),
+                          all_targets=list(self.all_targets))
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        the sizes of the indexes of the snapshot
+
+        :return: dict of the number of entries of each index
+        """
+        return {'plural_feature_types': len(self.plural_feature_types),
+                'context_ambiguous_feature_names': len(self.context_ambiguous_feature_names),
+                'multi_token_containing_feature_names': len(self.multi_token_containing_feature_names),
+                'name_entity_labels': len(self.name_entity_labels),
+                'all_targets': len(self.all_targets)}
@@ -7,7 +7,10 @@ logger = setup_logging('utils')
 config = {}
 config.update(load_config())
 
+import numpy as np
 import networkx as nx
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order
 
 from adsplanetnamepipe.utils.common import EntityArgs
 
@@ -21,19 +24,28 @@ class KnowledgeGraph():
     emphasis on certain keywords, and provides methods to query the graph for relevance scores
     """
 
-    def __init__(self, args: EntityArgs, keywords: List[List[str]], special_keywords: List[List[str]]):
+    def __init__(self, args: EntityArgs, keywords: List[List[str]], special_keywords: List[List[str]],
+                 path_weights: Dict[str, float] = None):
         """
         initialize the KnowledgeGraph class
 
         :param args: configuration arguments containing feature name and other settings
         :param keywords: list of keyword lists extracted from texts
         :param special_keywords: list of special keyword lists with higher weights
+        :param path_weights: optional path weights of a graph built earlier, if provided the graph is not built
         """
         self.args = args
         self.score_format = '%.{}f'.format(config['PLANETARYNAMES_PIPELINE_FORMAT_SIGNIFICANT_DIGITS'])
         self.graph = nx.Graph()
+        # average path weight from each keyword to the feature name, computed once the graph is built
+        self.path_weights = {}
 
-        self.build_graph(keywords, special_keywords)
+        if path_weights:
+            # all that is needed to score keywords, no need to keep the graph
+            self.graph = None
+            self.path_weights = path_weights
+        else:
+            self.build_graph(keywords, special_keywords)
 
     def build_graph(self, keywords_list: List[List[str]], special_keywords_list: List[List[str]]):
         """
@@ -48,6 +60,7 @@ class KnowledgeGraph():
 
         if len(self.keyword_counts) > 0:
             self.create_graph()
+            self.path_weights = self.compute_path_weights()
         else:
             self.graph = None
 
@@ -101,6 +114,25 @@ class KnowledgeGraph():
             if self.graph.has_node(keyword1) and self.graph.has_node(keyword2*weight):
                 self.graph.add_edge(keyword1, keyword2, weight=count)
 
+    def compute_path_weights(self) -> Dict[str, float]:
+        """
+        compute the average weight of the path between every keyword and the feature name
+
+        all the paths end at the feature name, so instead of a shortest path query per keyword,
+        one breadth first search from the feature name gives the shortest path to every keyword,
+        and the weights are accumulated along the edges of the search tree
+
+        :return: dictionary of keyword to the average weight of its path
+        """
+        total_weights = {self.args.feature_name: 0}
+        path_lengths = {self.args.feature_name: 0}
+        for u, v in nx.bfs_edges(self.graph, self.args.feature_name):
+            total_weights[v] = total_weights[u] + self.graph[u][v].get('weight', 0)
+            path_lengths[v] = path_lengths[u] + 1
+
+        return {keyword: total_weights[keyword] / path_lengths[keyword] if path_lengths[keyword] else 0
+                for keyword in total_weights}
+
     def query_path(self, keyword: str) -> float:
         """
         query the graph for the path weight between a keyword and the feature name
@@ -136,12 +168,199 @@ class KnowledgeGraph():
         """
         # if no data was available to setup the knowledge graph,
         # send the indication with socre = -1
-        if not self.graph:
+        if not self.path_weights:
             return -1
 
+        # keywords that are not in the graph, or have no path to the feature name, are 0
         path_weights = 0
         for keyword in keywords:
-            path_weights += self.query_path(keyword)
+            path_weights += self.path_weights.get(keyword, 0)
 
         score = float(self.score_format % (path_weights / len(keywords)))
         return score
+
+    def forward_many(self, keywords_list: List[List[str]]) -> List[float]:
+        """
+        calculate the average path weight for each of the lists of keywords, in one pass
+
+        the keywords of all the lists are mapped to ids in a table of the path weights, and
+        the weights are gathered and summed per list with numpy, the scores are the same as forward
+
+        :param keywords_list: list of non empty keyword lists to query
+        :return: list of the average path weights, or -1s if the graph is empty
+        """
+        # if no data was available to setup the knowledge graph,
+        # send the indication with socre = -1
+        if not self.path_weights:
+            return [-1] * len(keywords_list)
+
+        if not hasattr(self, 'path_weight_ids') or len(self.path_weight_ids) != len(self.path_weights):
+            self.path_weight_ids = {keyword: i for i, keyword in enumerate(self.path_weights)}
+            # keywords not in the graph are mapped to the last element, that is 0
+            self.path_weight_values = np.array(list(self.path_weights.values()) + [0], dtype=np.float64)
+
+        lengths = [len(keywords) for keywords in keywords_list]
+        ids = [self.path_weight_ids.get(keyword, -1) for keywords in keywords_list for keyword in keywords]
+        # weights are added in the order of the keywords, same as forward
+        path_weights = np.bincount(np.repeat(np.arange(len(keywords_list)), lengths),
+                                   weights=self.path_weight_values[ids], minlength=len(keywords_list))
+        return [float(self.score_format % (path_weight / length)) for path_weight, length in zip(path_weights.tolist(), lengths)]
+
+
+class KnowledgeGraphCSR(KnowledgeGraph):
+
+    """
+    a KnowledgeGraph with a compact array-backed graph instead of networkx
+
+    keywords are interned to integer ids and the edges are kept in a symmetric CSR matrix with the weights in
+    numpy arrays, keyword and pair counts are computed with a sparse product of the keyword occurrence matrix,
+    the edges and their weights are the same as the networkx graph, including which edge added last wins,
+    and so are forward and query_path
+    """
+
+    def build_graph(self, keywords_list: List[List[str]], special_keywords_list: List[List[str]]):
+        """
+        build the knowledge graph from the provided keywords and special keywords
+
+        :param keywords_list: list of keyword lists
+        :param special_keywords_list: list of special keyword lists with higher weights
+        :return:
+        """
+        self.keyword_ids = {self.args.feature_name: 0}
+        self.keyword_counts, self.pair_counts = self.count_keywords(keywords_list)
+        self.special_keyword_counts, self.special_pair_counts = self.count_keywords(special_keywords_list)
+
+        if self.keyword_counts.nnz > 0:
+            self.create_graph()
+            self.path_weights = self.compute_path_weights()
+        else:
+            self.graph = None
+
+    def intern(self, keywords: List[str]) -> List[int]:
+        """
+        map keywords to integer ids, assigning new ids to keywords seen for the first time
+
+        :param keywords: list of keywords
+        :return: list of ids
+        """
+        return [self.keyword_ids.setdefault(keyword, len(self.keyword_ids)) for keyword in keywords]
+
+    def count_keywords(self, keywords_list: List[List[str]]) -> Tuple[csr_matrix, csr_matrix]:
+        """
+        count the occurrences of individual keywords and keyword pairs
+
+        :param keywords_list: list of keyword lists
+        :return: tuple of sparse matrices, keyword counts as a single row, and pair counts as keyword by keyword
+        """
+        rows = [i for i, keywords in enumerate(keywords_list) for _ in keywords]
+        cols = self.intern([keyword for keywords in keywords_list for keyword in keywords])
+        # number of times each keyword appears in each list, duplicates are summed
+        occurrences = csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(len(keywords_list), len(self.keyword_ids)))
+
+        keyword_counts = csr_matrix(occurrences.sum(axis=0))
+        # counted for each occurrence of the two keywords in the same list, a keyword is not paired with itself
+        pair_counts = (occurrences.T @ occurrences).tocoo()
+        not_diagonal = pair_counts.row != pair_counts.col
+        pair_counts = csr_matrix((pair_counts.data[not_diagonal], (pair_counts.row[not_diagonal], pair_counts.col[not_diagonal])),
+                                 shape=pair_counts.shape)
+        return keyword_counts, pair_counts
+
+    def create_graph(self):
+        """
+        create the graph structure based on keyword and pair counts
+
+        :return:
+        """
+        num_nodes = len(self.keyword_ids)
+        feature_name_id = self.keyword_ids[self.args.feature_name]
+        edges_u, edges_v, edges_weight = [], [], []
+
+        for (keyword_counts, pair_counts, weight) in zip([self.keyword_counts, self.special_keyword_counts],
+                                                         [self.pair_counts, self.special_pair_counts],
+                                                         [1, 2]):
+            # an edge between each keyword and the feature name, weights for regular keywords are 1, for special keywords are 2
+            keyword_counts = keyword_counts.tocoo()
+            edges_u.append(keyword_counts.col)
+            edges_v.append(np.full(keyword_counts.nnz, feature_name_id))
+            edges_weight.append(keyword_counts.data * weight)
+
+            # an edge between the pairs, as long as both are nodes already, note that for special keywords
+            # this check is against the second keyword repeated (weight * keyword2), same as the networkx graph
+            pair_counts = pair_counts.tocoo()
+            nodes = np.zeros(num_nodes, dtype=bool)
+            nodes[feature_name_id] = True
+            nodes[self.keyword_counts.indices] = True
+            if weight == 1:
+                second_is_node = nodes[pair_counts.col]
+            else:
+                nodes[self.special_keyword_counts.indices] = True
+                keywords = list(self.keyword_ids)
+                second_is_node = np.array([nodes[self.keyword_ids[keywords[v] * weight]] if keywords[v] * weight in self.keyword_ids else False
+                                           for v in pair_counts.col], dtype=bool)
+            keep = nodes[pair_counts.row] & second_is_node
+            edges_u.append(pair_counts.row[keep])
+            edges_v.append(pair_counts.col[keep])
+            edges_weight.append(pair_counts.data[keep])
+
+        edges_u, edges_v, edges_weight = np.concatenate(edges_u), np.concatenate(edges_v), np.concatenate(edges_weight)
+        # undirected, so an edge is identified by its (smaller id, larger id), and when an edge is added more than once,
+        # the weight added last is kept, same as networkx
+        edges = np.minimum(edges_u, edges_v) * num_nodes + np.maximum(edges_u, edges_v)
+        edges, last = np.unique(edges[::-1], return_index=True)
+        edges_weight = edges_weight[::-1][last]
+        edges_u, edges_v = edges // num_nodes, edges % num_nodes
+
+        # symmetric adjacency, a self loop is kept once
+        not_loop = edges_u != edges_v
+        self.graph = csr_matrix((np.concatenate([edges_weight, edges_weight[not_loop]]),
+                                 (np.concatenate([edges_u, edges_v[not_loop]]), np.concatenate([edges_v, edges_u[not_loop]]))),
+                                shape=(num_nodes, num_nodes))
+        # sorted indices make looking up the weight of an edge a binary search
+        self.graph.sort_indices()
+
+    def compute_path_weights(self) -> Dict[str, float]:
+        """
+        compute the average weight of the path between every keyword and the feature name
+
+        one breadth first search from the feature name gives the shortest path to every keyword,
+        and the weights are accumulated along the edges of the search tree
+
+        :return: dictionary of keyword to the average weight of its path
+        """
+        feature_name_id = self.keyword_ids[self.args.feature_name]
+        order, predecessors = breadth_first_order(self.graph, feature_name_id, directed=False, return_predecessors=True)
+
+        num_nodes = len(self.keyword_ids)
+        total_weights = np.zeros(num_nodes)
+        path_lengths = np.zeros(num_nodes, dtype=np.int64)
+        if len(order) > 1:
+            children = order[1:]
+            parents = predecessors[children]
+            edge_weights = np.asarray(self.graph[parents, children]).ravel()
+            # parents are always before their children in the search order
+            for child, parent, edge_weight in zip(children.tolist(), parents.tolist(), edge_weights.tolist()):
+                total_weights[child] = total_weights[parent] + edge_weight
+                path_lengths[child] = path_lengths[parent] + 1
+
+        keywords = list(self.keyword_ids)
+        return {keywords[i]: total_weights[i] / path_lengths[i] if path_lengths[i] else 0 for i in order.tolist()}
+
+    def query_path(self, keyword: str) -> float:
+        """
+        query the graph for the path weight between a keyword and the feature name
+
+        :param keyword: the keyword to query
+        :return: float the average weight of the path
+        """
+        return self.path_weights.get(keyword, 0)
+
+
+def get_knowledge_graph_class() -> type:
+    """
+    get the knowledge graph implementation set by PLANETARYNAMES_PIPELINE_KNOWLEDGE_GRAPH_BACKEND
+
+    :return: KnowledgeGraphCSR if the backend is `csr`, KnowledgeGraph otherwise
+    """
+    if config.get('PLANETARYNAMES_PIPELINE_KNOWLEDGE_GRAPH_BACKEND', 'networkx') == 'csr':
+        return KnowledgeGraphCSR
+    return KnowledgeGraph
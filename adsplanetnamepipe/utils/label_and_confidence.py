@@ -1,13 +1,20 @@
 import os
 import traceback
 import time
-from typing import Tuple
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple, List
 
+import numpy as np
 import pandas as pd
-from tensorflow import keras
-from tensorflow.keras import Sequential, layers
-from tensorflow.keras.callbacks import EarlyStopping
 from sklearn.model_selection import train_test_split
+try:
+    from tensorflow import keras
+    from tensorflow.keras import Sequential, layers
+    from tensorflow.keras.callbacks import EarlyStopping
+except ImportError:  # pragma: no cover
+    # tensorflow is needed only to train the model and export its weights, inference is done with numpy
+    keras = Sequential = layers = EarlyStopping = None
 
 from adsputils import setup_logging, load_config
 
@@ -23,6 +30,79 @@ except ImportError:
 from adsplanetnamepipe.utils.common import EntityArgs
 
 
+class NumpyModel(object):
+
+    """
+    a class that runs the forward pass of the trained dense network with numpy
+
+    the weights of the keras model are exported once to a npz file, so that
+    predicting the label and confidence does not need tensorflow
+    """
+
+    def __init__(self, weights: List[np.ndarray], biases: List[np.ndarray]):
+        """
+        initialize the NumpyModel class
+
+        :param weights: list of the kernel matrices of the dense layers, in order
+        :param biases: list of the bias vectors of the dense layers, in order
+        """
+        self.weights = [weight.astype(np.float32) for weight in weights]
+        self.biases = [bias.astype(np.float32) for bias in biases]
+
+    def predict(self, inputs) -> np.ndarray:
+        """
+        compute the output of the network, relu for the hidden layers and sigmoid for the last one
+
+        :param inputs: rows of input scores, array-like of shape (num rows, num features)
+        :return: array of shape (num rows, 1) of the predicted scores
+        """
+        outputs = np.asarray(inputs, dtype=np.float32)
+        for weight, bias in zip(self.weights[:-1], self.biases[:-1]):
+            outputs = np.maximum(outputs @ weight + bias, 0)
+        outputs = outputs @ self.weights[-1] + self.biases[-1]
+        return 1 / (1 + np.exp(-outputs))
+
+    def save(self, filename: str):
+        """
+        save the weights to a npz file
+
+        :param filename: path of the npz file
+        :return:
+        """
+        arrays = {}
+        for i, (weight, bias) in enumerate(zip(self.weights, self.biases)):
+            arrays['weight_%d' % i] = weight
+            arrays['bias_%d' % i] = bias
+        # write to a temporary file first, so that a reader never sees a partial file
+        np.savez(filename + '.tmp.npz', **arrays)
+        os.replace(filename + '.tmp.npz', filename)
+
+    @classmethod
+    def load(cls, filename: str) -> 'NumpyModel':
+        """
+        load the weights from a npz file
+
+        :param filename: path of the npz file
+        :return: NumpyModel object
+        """
+        with np.load(filename) as arrays:
+            num_layers = len(arrays.files) // 2
+            return cls([arrays['weight_%d' % i] for i in range(num_layers)],
+                       [arrays['bias_%d' % i] for i in range(num_layers)])
+
+    @classmethod
+    def from_keras(cls, model) -> 'NumpyModel':
+        """
+        extract the weights of the dense layers of a keras model
+
+        :param model: the trained keras Sequential model
+        :return: NumpyModel object
+        """
+        # flatten layer has no weights
+        layer_weights = [layer.get_weights() for layer in model.layers if layer.get_weights()]
+        return cls([weight for weight, _ in layer_weights], [bias for _, bias in layer_weights])
+
+
 class LabelAndConfidence(object):
 
     """
@@ -42,29 +122,37 @@ class LabelAndConfidence(object):
     epoch = 100
     # number of samples per gradient update during training
     batch_size = 1
+    # number of samples per gradient update during the fast training, vectorized mini-batches
+    fast_batch_size = 256
 
     # path to the CSV file containing training data
     training_file = '/label_and_confidence_files/training.csv'
     # path where the trained model will be saved or loaded from
     model_file = os.path.dirname(__file__) + '/label_and_confidence_files/model'
+    # path of the weights of the trained model exported for the numpy inference
+    weights_file = os.path.dirname(__file__) + '/label_and_confidence_files/model_weights.npz'
+
+    # numpy models shared by all the instances in the process, keyed by the weights file
+    inference_models = {}
 
     # maximum number of attempts to train a model meeting the accuracy threshold
     max_build_retry = 5
     # minimum accuracy required for a trained model to be accepted
     accuracy_threshold = 0.96
 
-    def __init__(self, args: EntityArgs, train_mode: bool = False):
+    def __init__(self, args: EntityArgs, train_mode: bool = False, fast_training: bool = False):
         """
         initialize the LabelAndConfidence class
 
         :param args: configuration arguments for the model and prediction process
         :param train_mode: boolean indicating whether to train a new model or load an existing one
+        :param fast_training: if training, use mini-batches and run the attempts in parallel processes
         """
         try:
             if not train_mode:
                 self.load()
             else:
-                self.train_and_save()
+                self.train_and_save(fast_training)
         except:
             self.model = None
 
@@ -85,22 +173,71 @@ class LabelAndConfidence(object):
                 return '', -1
 
             scores = [knowledge_graph_score, paper_relevance_score, local_llm_score]
-            prediction_score = self.model.predict([scores], verbose=0)[0][0].item()
-            confidence = float(self.confidence_format % prediction_score)
-            label = next((item['label'] for item in self.args.name_entity_labels if item['value'] == 1), None) if confidence >= 0.5 else \
-                    next((item['label'] for item in self.args.name_entity_labels if item['value'] == 0), None)
-            return label, confidence
+            prediction_score = self.model.predict([scores])[0][0].item()
+            return self.get_label_and_confidence(prediction_score)
         except Exception as e:
             logger.error(f"Exception in forward method of LabelAndConfidence: {str(e)}")
             return '', -1
 
-    def train(self) -> float:
+    def forward_many(self, scores_list: List[Tuple[float, float, float]]) -> List[Tuple[str, float]]:
+        """
+        predict the labels and confidence scores for multiple input scores in one call to the model
+
+        :param scores_list: list of tuples of knowledge graph, paper relevance, and local llm scores
+        :return: list of tuples containing the predicted label and confidence score, in the same order
+        """
+        try:
+            if not self.model:
+                return [('', -1)] * len(scores_list)
+            if not scores_list:
+                return []
+
+            prediction_scores = self.model.predict([list(scores) for scores in scores_list])[:, 0].tolist()
+            return [self.get_label_and_confidence(prediction_score) for prediction_score in prediction_scores]
+        except Exception as e:
+            logger.error(f"Exception in forward_many method of LabelAndConfidence: {str(e)}")
+            return [('', -1)] * len(scores_list)
+
+    def get_label_and_confidence(self, prediction_score: float) -> Tuple[str, float]:
+        """
+        turn the prediction score of the model into the label and confidence score
+
+        :param prediction_score: output of the model
+        :return: tuple containing the label and confidence score
+        """
+        confidence = float(self.confidence_format % prediction_score)
+        label = next((item['label'] for item in self.args.name_entity_labels if item['value'] == 1), None) if confidence >= 0.5 else \
+                next((item['label'] for item in self.args.name_entity_labels if item['value'] == 0), None)
+        return label, confidence
+
+    def build_model(self, width: int):
+        """
+        create the neural network model
+
+        :param width: number of input features
+        :return: the keras Sequential model
+        """
+        return Sequential([
+            layers.Flatten(input_shape=(width,)),
+            layers.Dense(self.units[0], activation="relu"),
+            layers.Dense(self.units[1], activation="relu"),
+            layers.Dense(self.units[2], activation="relu"),
+            layers.Dense(1, activation="sigmoid"),
+        ])
+
+    def train(self, seed: int = None, batch_size: int = None, verbose: int = 1) -> float:
         """
         train the neural network model using the training data
 
+        :param seed: if provided, the random seed for the initialization and shuffling of the training
+        :param batch_size: number of samples per gradient update, if not provided the class batch_size is used
+        :param verbose: verbosity of keras fit and evaluate
         :return: float representing the test accuracy of the trained model
         """
         try:
+            if seed is not None:
+                keras.utils.set_random_seed(seed)
+
             df = pd.read_csv(os.path.dirname(__file__) + self.training_file)
             properties = list(df.columns.values)
             properties.remove('label')
@@ -115,83 +252,150 @@ class LabelAndConfidence(object):
             partial_y_train = y_train[len_test_valid:]
 
             width = X_train.shape[1]
-            self.model = Sequential([
-                layers.Flatten(input_shape=(width,)),
-                layers.Dense(self.units[0], activation="relu"),
-                layers.Dense(self.units[1], activation="relu"),
-                layers.Dense(self.units[2], activation="relu"),
-                layers.Dense(1, activation="sigmoid"),
-            ])
+            self.model = self.build_model(width)
 
             self.model.compile(optimizer=self.optimizer,
                           loss=self.loss,
                           metrics=['accuracy'])
 
             # create an EarlyStopping callback
-            early_stopping = EarlyStopping(monitor='val_accuracy', min_delta=0.001, patience=5, mode='max', verbose=1)
+            early_stopping = EarlyStopping(monitor='val_accuracy', min_delta=0.001, patience=5, mode='max', verbose=verbose)
             self.model.fit(partial_x_train,
                         partial_y_train,
                         epochs=self.epoch,
-                        batch_size=self.batch_size,
+                        batch_size=batch_size or self.batch_size,
                         validation_data=(x_val, y_val),
-                        verbose=1,
+                        verbose=verbose,
                         callbacks=[early_stopping])
 
-            self.test_loss, self.test_accuracy = self.model.evaluate(X_test, y_test)
+            self.test_loss, self.test_accuracy = self.model.evaluate(X_test, y_test, verbose=verbose)
             logger.debug("test accuracy = %.2f"%self.test_accuracy)
             return self.test_accuracy
         except Exception as e:
             logger.error(f"Exception in training method: {str(e)}")
 
-    def train_and_save(self):
+    def train_parallel(self) -> List[dict]:
+        """
+        train the model max_build_retry times, each in its own process with a different seed and with
+        mini-batches, and keep the model with the best accuracy, even if none is above the threshold,
+        same as the serial retries
+
+        :return: list of dicts with the seed, accuracy, elapsed seconds, and weights of each attempt
+        """
+        start_time = time.time()
+        # tensorflow does not survive a fork once it is initialized, hence spawn
+        with ProcessPoolExecutor(max_workers=self.max_build_retry, mp_context=multiprocessing.get_context('spawn')) as executor:
+            attempts = list(executor.map(train_attempt, range(self.max_build_retry), [self.fast_batch_size] * self.max_build_retry))
+
+        for attempt in attempts:
+            logger.info(f"Training attempt with seed {attempt['seed']}: accuracy {attempt['accuracy']} in {attempt['elapsed']:.2f} s.")
+        logger.info(f"Parallel training took {time.time() - start_time:.2f} s.")
+
+        attempts_succeeded = [attempt for attempt in attempts if attempt['accuracy'] is not None]
+        if attempts_succeeded:
+            best = max(attempts_succeeded, key=lambda attempt: attempt['accuracy'])
+            self.model = self.build_model(best['weights'][0].shape[0])
+            self.model.set_weights(best['weights'])
+            self.test_accuracy = best['accuracy']
+            if best['accuracy'] <= self.accuracy_threshold:
+                logger.warning(f"None of the {self.max_build_retry} training attempts went above the accuracy threshold "
+                               f"{self.accuracy_threshold}, keeping the best one with accuracy {best['accuracy']}.")
+        else:
+            self.model = None
+        return attempts
+
+    def train_and_save(self, fast_training: bool = False):
         """
         train the model and save it if the accuracy threshold is met
 
+        :param fast_training: if True, run the attempts in parallel and keep the best one
         :return:
         """
-        # to accept the training and save, the accuracy has to be above the threshold
-        # if run out of number of tries to go above the threshold, then it is a failure
-        for _ in range(self.max_build_retry):
-            if self.train() > self.accuracy_threshold:
-                break
+        if fast_training:
+            self.train_parallel()
+        else:
+            # to accept the training and save, the accuracy has to be above the threshold
+            # if run out of number of tries to go above the threshold, then it is a failure
+            for _ in range(self.max_build_retry):
+                accuracy = self.train()
+                if accuracy is not None and accuracy > self.accuracy_threshold:
+                    break
+            else:
+                logger.warning(f"None of the {self.max_build_retry} training attempts went above the accuracy threshold "
+                               f"{self.accuracy_threshold}, keeping the last one.")
         if self.model:
             self.save()
 
     def save(self):
         """
-        save the trained model to a file
+        save the trained model to a file, and export its weights for the numpy inference
 
         :return:
         """
         try:
             keras.models.save_model(model=self.model, filepath=self.model_file)
+            NumpyModel.from_keras(self.model).save(self.weights_file)
+            self.inference_models.pop(self.weights_file, None)
         except Exception as e:
             logger.error(f"An error occurred while saving the model: {str(e)}")
 
+    def export_weights(self):
+        """
+        export the weights of the previously saved keras model for the numpy inference
+
+        :return:
+        """
+        NumpyModel.from_keras(keras.models.load_model(self.model_file)).save(self.weights_file)
+
     def load(self):
         """
-        load a previously saved model from a file
+        load the previously exported weights of the model, once per process
 
         :return:
         """
         try:
-            self.model = keras.models.load_model(self.model_file)
+            if self.weights_file not in self.inference_models:
+                if not os.path.exists(self.weights_file):
+                    self.export_weights()
+                self.inference_models[self.weights_file] = NumpyModel.load(self.weights_file)
+            self.model = self.inference_models[self.weights_file]
         except Exception as e:
             self.model = None
             logger.error(f"An error occurred while loading the model: {str(e)}")
 
 
-def create_keras_model():  # pragma: no cover
+def train_attempt(seed: int, batch_size: int) -> dict:
+    """
+    one training attempt of the parallel training, run in a worker process
+
+    :param seed: the random seed of this attempt
+    :param batch_size: number of samples per gradient update
+    :return: dict with the seed, accuracy, elapsed seconds, and weights of the trained model
+    """
+    start_time = time.time()
+    # not initialized, so that the attempt only builds and trains a model, without loading, or exporting, the inference model
+    label_and_confidence = LabelAndConfidence.__new__(LabelAndConfidence)
+    accuracy = label_and_confidence.train(seed=seed, batch_size=batch_size, verbose=0)
+    return {
+        'seed': seed,
+        'accuracy': accuracy,
+        'elapsed': time.time() - start_time,
+        'weights': label_and_confidence.model.get_weights() if accuracy is not None else None,
+    }
+
+
+def create_keras_model(fast_training: bool = False):  # pragma: no cover
     """
     create a keras model and save it to a pickle file
     this is not part of the production, it is run only when
     a new model need to be trained and saved
 
+    :param fast_training: if True, use mini-batches and run the attempts in parallel processes
     :return:
     """
     try:
         start_time = time.time()
-        keras_model = LabelAndConfidence(train_mode=True)
+        keras_model = LabelAndConfidence(args=None, train_mode=True, fast_training=fast_training)
         if not keras_model.model:
             raise
         keras_model.save()
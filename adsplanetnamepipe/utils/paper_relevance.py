@@ -1,8 +1,158 @@
 import regex
+import threading
+from collections import OrderedDict
+from typing import Iterator, Tuple
+
+from adsputils import setup_logging, load_config
+
+logger = setup_logging('utils')
+config = {}
+config.update(load_config())
 
 from adsplanetnamepipe.utils.common import EntityArgs, Synonyms
 
 
+class DocumentFeatures(object):
+    """
+    a class that collects the document level counts that the paper relevance score is computed from
+
+    each count is taken lazily from a regex iterator, so no list of matches is built, and the counting stops
+    as soon as the count has passed the threshold it is compared against, hence the target and wikidata counts
+    are lower bounds once they are above the threshold
+
+    the text is still scanned once per count, rather than in a single pass, the target and feature type regexes ignore
+    case while the wikidata one does not, and their matches can overlap (ie, a target term that is also a wikidata term),
+    so one alternation of the three would give different counts, instead each scan stops early on its own
+    """
+
+    # ratio of the number of tokens in the text that the target and wikidata counts have to be above
+    threshold_ratio = 0.001
+
+    def __init__(self, text: str, re_match_target: regex.Pattern, re_match_feature_type: regex.Pattern,
+                 re_wiki_vocab: regex.Pattern = None):
+        """
+        initialize the DocumentFeatures class
+
+        :param text: the text content of the paper
+        :param re_match_target: compiled regex matching the target and its synonyms
+        :param re_match_feature_type: compiled regex matching the feature type and its synonyms
+        :param re_wiki_vocab: compiled regex matching the wikidata vocabulary, if None wikidata terms are not counted
+        """
+        # number of tokens in the text, approximated by the number of spaces
+        self.num_tokens = text.count(' ')
+        self.threshold = self.num_tokens * self.threshold_ratio
+
+        self.target_terms_len = self.count_matches(re_match_target.finditer(text), self.threshold)
+        # feature type only need to appear once
+        self.feature_type_terms_len = self.count_matches(re_match_feature_type.finditer(text), 0)
+        self.len_existing_wikidata = self.count_unique_matches(re_wiki_vocab.finditer(text), self.threshold) \
+                                     if re_wiki_vocab else 0
+
+    def count_matches(self, matches: Iterator, limit: float) -> int:
+        """
+        count the matches, stopping once the count is above the limit
+
+        :param matches: iterator of regex match objects
+        :param limit: the count is not incremented any further once it is above this value
+        :return: number of matches, capped at the first value above the limit
+        """
+        count = 0
+        for _ in matches:
+            count += 1
+            if count > limit:
+                break
+        return count
+
+    def count_unique_matches(self, matches: Iterator, limit: float) -> int:
+        """
+        count the unique matched terms, stopping once the count is above the limit
+
+        the vocabulary alternatives can contain groups of their own, hence every non empty group
+        of a match is considered a term, similar to what WikiWrapper.extract_top_keywords does
+
+        :param matches: iterator of regex match objects
+        :param limit: the count is not incremented any further once it is above this value
+        :return: number of unique terms, capped at the first value above the limit
+        """
+        terms = set()
+        for match in matches:
+            terms.update(item for item in match.groups() if item)
+            if len(terms) > limit:
+                break
+        return len(terms)
+
+
+class PaperRelevanceCache(object):
+    """
+    a class that memoizes paper relevance scores keyed by (bibcode, fulltext mtime, target, feature type)
+
+    the score of a paper does not depend on the feature name, so when sweeping over all the feature names
+    of a target and feature type, the same paper is scored once, the scores are kept in an in-process LRU
+    that is shared by all the instances, and optionally in a persistent store (ie, the app, saving to the
+    `paper_relevance_score` table) so that they survive across workers and runs
+    """
+
+    # scores shared by all the instances in the process, most recently used at the end
+    scores = OrderedDict()
+    # guards the shared scores, instances can be used from multiple threads
+    lock = threading.Lock()
+    # maximum number of scores kept in the process
+    max_size = config.get('PLANETARYNAMES_PIPELINE_PAPER_RELEVANCE_CACHE_SIZE', 20000)
+
+    def __init__(self, store=None):
+        """
+        initialize the PaperRelevanceCache class
+
+        :param store: optional persistent store providing get_paper_relevance_score and insert_paper_relevance_score
+        """
+        self.store = store
+
+    def get(self, key: Tuple[str, str, str, str]) -> float:
+        """
+        look up a score, first in process then in the persistent store
+
+        :param key: tuple of (bibcode, fulltext mtime, target, feature type)
+        :return: the score, or -1 if it is not available
+        """
+        with self.lock:
+            score = self.scores.get(key, -1)
+            if score != -1:
+                self.scores.move_to_end(key)
+                return score
+
+        if self.store:
+            score = self.store.get_paper_relevance_score(*key)
+            if score != -1:
+                self.add(key, score)
+        return score
+
+    def set(self, key: Tuple[str, str, str, str], score: float):
+        """
+        save a newly computed score in process and in the persistent store
+
+        :param key: tuple of (bibcode, fulltext mtime, target, feature type)
+        :param score: the paper relevance score
+        :return:
+        """
+        self.add(key, score)
+        if self.store:
+            self.store.insert_paper_relevance_score(*key, score)
+
+    def add(self, key: Tuple[str, str, str, str], score: float):
+        """
+        add a score to the in-process LRU, evicting the least recently used ones when full
+
+        :param key: tuple of (bibcode, fulltext mtime, target, feature type)
+        :param score: the paper relevance score
+        :return:
+        """
+        with self.lock:
+            self.scores[key] = score
+            self.scores.move_to_end(key)
+            while len(self.scores) > self.max_size:
+                self.scores.popitem(last=False)
+
+
 class PaperRelevance():
     """
     a class that calculates the relevance score of a paper based on various criteria
@@ -12,12 +162,15 @@ class PaperRelevance():
     of relevant terms to compute a relevance score
     """
 
-    def __init__(self, args: EntityArgs):
+    def __init__(self, args: EntityArgs, store=None):
         """
         initialize the PaperRelevance class
 
         :param args: configuration arguments containing target and feature type information
+        :param store: optional persistent store for the scores, see PaperRelevanceCache
         """
+        self.args = args
+        self.cache = PaperRelevanceCache(store)
         self.synonyms = Synonyms()
         self.re_match_target = regex.compile(r'\b(%s)\b' % self.synonyms.get_target_terms(args.target), flags=regex.IGNORECASE)
         self.re_match_feature_type = regex.compile(r'\b(%s)\b' % self.synonyms.get_feature_type_terms([args.feature_type, args.feature_type_plural]), flags=regex.IGNORECASE)
@@ -33,20 +186,53 @@ class PaperRelevance():
         :param len_existing_wikidata: number of existing Wikidata terms in the paper
         :return: float representing the calculated relevance score of the paper
         """
-        # threshold for num of targets, feature type, and wikidata terms
-        threshold = text.count(' ') * 0.001
+        features = DocumentFeatures(text, self.re_match_target, self.re_match_feature_type)
+        features.len_existing_wikidata = len_existing_wikidata
+        return self.score(features, bibstem, databases, astronomy_main_journals)
+
+    def forward_doc(self, doc: dict, astronomy_main_journals: list, re_wiki_vocab: regex.Pattern) -> float:
+        """
+        calculate the relevance score of a solr document, counting the wikidata terms along with the other features
+
+        :param doc: dictionary containing document information
+        :param astronomy_main_journals: list of main astronomy journals
+        :param re_wiki_vocab: compiled regex matching the wikidata vocabulary
+        :return: float representing the calculated relevance score of the paper
+        """
+        # the score can be reused only if it is known which version of the fulltext it was computed from
+        key = (doc['bibcode'], doc['fulltext_mtime'], self.args.target, self.args.feature_type) if doc.get('fulltext_mtime') else None
+        if key:
+            score = self.cache.get(key)
+            if score != -1:
+                return score
 
-        # get number of times target and feature type appeared in the text,
-        # each is worth 0.2 in scoring if above threshold
-        target_terms_len = len(self.re_match_target.findall(text))
-        feature_type_terms_len = len(self.re_match_feature_type.findall(text))
+        text = ' '.join(doc.get('title', '')) + ' ' + doc.get('abstract', '') + ' ' + doc.get('body', '')
+        features = DocumentFeatures(text, self.re_match_target, self.re_match_feature_type, re_wiki_vocab)
+        score = self.score(features,
+                           bibstem=doc.get('bibcode', '')[4:9].strip('.'),
+                           databases=', '.join(doc.get('database')),
+                           astronomy_main_journals=astronomy_main_journals)
+        if key:
+            self.cache.set(key, score)
+        return score
 
+    def score(self, features: DocumentFeatures, bibstem: str, databases: str, astronomy_main_journals: list) -> float:
+        """
+        combine the document features and the paper's metadata into the relevance score
+
+        :param features: DocumentFeatures object with the counts extracted from the text of the paper
+        :param bibstem: the bibliographic stem of the paper
+        :param databases: string containing the ads collection the paper is in
+        :param astronomy_main_journals: list of main astronomy journals
+        :return: float representing the calculated relevance score of the paper
+        """
         in_astronomy_main_journals = any(journal == bibstem for journal in astronomy_main_journals)
 
+        # number of times target appeared in the text is worth 0.2 in scoring if above threshold,
+        # and so is the number of wikidata terms, while feature type only needs to appear once
         # the threshold and weights have been determined empirically, by analyzing several thousands scores
         return int('astronomy' in databases) * 0.2 + \
                int(in_astronomy_main_journals) * 0.2 + \
-               int(target_terms_len > threshold) * 0.2 + \
-               int(feature_type_terms_len > 0) * 0.2 + \
-               int(len_existing_wikidata > threshold) * 0.2
-
+               int(features.target_terms_len > features.threshold) * 0.2 + \
+               int(features.feature_type_terms_len > 0) * 0.2 + \
+               int(features.len_existing_wikidata > features.threshold) * 0.2
@@ -0,0 +1,97 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+from adsputils import setup_logging, load_config
+
+logger = setup_logging('utils')
+config = {}
+config.update(load_config())
+
+from adsplanetnamepipe.utils.common import EntityArgs
+
+
+class PipelineCache(object):
+    """
+    a class that keeps the pipeline objects (ie, CollectKnowldegeBase and IdentifyPlanetaryEntities) of the process
+    keyed by (pipeline class, target, feature type, timestamp, paper relevance store)
+
+    setting up a pipeline compiles the wiki vocabulary and the synonym regexes and loads the models, none of which
+    depends on the feature name, so when a pipeline for the same target and feature type has been setup earlier in the
+    process, it is reused and only pointed to the new feature name, the pipelines are kept in an LRU shared by all the
+    instances, a pipeline is taken out of the LRU while it is in use, and put back with release once the task is done,
+    so that two threads never use the same pipeline
+    """
+
+    # pipelines shared by all the instances in the process, most recently used at the end
+    pipelines = OrderedDict()
+    # guards the shared pipelines and the stats, instances can be used from multiple threads
+    lock = threading.Lock()
+    # maximum number of pipelines kept in the process, 0 disables the cache
+    max_size = config.get('PLANETARYNAMES_PIPELINE_COMPONENT_CACHE_SIZE', 4)
+    # counts and total setup time of the pipelines requested in the process
+    stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'setup_time_ms': 0.0}
+
+    def get_key(self, pipeline_class: type, args: EntityArgs, paper_relevance_store=None) -> Tuple:
+        """
+        the key of a pipeline, what its reusable components depend on
+
+        :param pipeline_class: the class of the pipeline
+        :param args: configuration arguments for the pipeline
+        :param paper_relevance_store: optional persistent store of the paper relevance scores the pipeline was setup with
+        :return: tuple of pipeline class, target, feature type, timestamp, and the id of the store
+        """
+        return (pipeline_class, args.target, args.feature_type, args.timestamp, id(paper_relevance_store))
+
+    def get(self, key: Tuple, setup: Callable[[], object], update: Callable[[object], None]) -> object:
+        """
+        take out the pipeline for the key and point it to the new feature name, or setup a new one if there is none
+
+        :param key: the key of the pipeline, see get_key
+        :param setup: function creating a new pipeline
+        :param update: function pointing a reused pipeline to the new feature name
+        :return: the pipeline
+        """
+        start_time = time.time()
+        with self.lock:
+            pipeline = self.pipelines.pop(key, None)
+
+        hit = pipeline is not None
+        if hit:
+            update(pipeline)
+        else:
+            pipeline = setup()
+
+        setup_time_ms = (time.time() - start_time) * 1000
+        with self.lock:
+            self.stats['hits' if hit else 'misses'] += 1
+            self.stats['setup_time_ms'] += setup_time_ms
+        logger.info(f"Pipeline {type(pipeline).__name__} for {key[1]}/{key[2]} {'reused' if hit else 'setup'} in {setup_time_ms:.2f} ms.")
+        return pipeline
+
+    def release(self, key: Tuple, pipeline: object):
+        """
+        put the pipeline back once the task is done with it, evicting the least recently used ones when full
+
+        :param key: the key of the pipeline, see get_key
+        :param pipeline: the pipeline
+        :return:
+        """
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.pipelines[key] = pipeline
+            self.pipelines.move_to_end(key)
+            while len(self.pipelines) > self.max_size:
+                self.pipelines.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        the counts and the total setup time of the pipelines requested in the process
+
+        :return: dict of hits, misses, evictions, and setup_time_ms
+        """
+        with self.lock:
+            return dict(self.stats)
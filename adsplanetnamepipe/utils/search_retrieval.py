@@ -36,6 +36,16 @@ class SearchRetrieval():
     # regex pattern for identifying the references section in document text
     re_references = re.compile(r'.(?=References[\W\s]*[A-Z\[\(0-9]+)')
 
+    # number of feature names counted in one request to solr
+    count_chunk_size = 50
+    # number of bibcodes retrieved in one request to solr
+    bibcode_chunk_size = 100
+
+    # fields of the documents returned from solr
+    docs_fields = 'bibcode, title, abstract, body, database, keyword, fulltext_mtime'
+    # fields returned from solr when only the bibcodes of the documents are needed
+    bibcode_fields = 'bibcode, fulltext_mtime'
+
     def __init__(self, args: EntityArgs):
         """
         initialize the SearchRetrieval class
@@ -51,13 +61,14 @@ class SearchRetrieval():
         # start year extracted from the timestamp for the query
         self.year_start = self.args.timestamp.split('-')[0]
 
-    def single_solr_query(self, start: int, rows: int, query: str) -> Tuple[List[Dict], int]:
+    def single_solr_query(self, start: int, rows: int, query: str, fields: str = '') -> Tuple[List[Dict], int]:
         """
         execute a single query to the Solr search engine
 
         :param start: starting index for pagination
         :param rows: number of rows to retrieve
         :param query: Solr query string
+        :param fields: optional, fields to return, default is docs_fields
         :return: tuple containing list of document dictionaries and status code
         """
         params = {
@@ -65,7 +76,7 @@ class SearchRetrieval():
             'start': start,
             'rows': rows,
             'sort': 'bibcode desc',
-            'fl': 'bibcode, title, abstract, body, database, keyword',
+            'fl': fields or self.docs_fields,
         }
 
         try:
@@ -101,11 +112,12 @@ class SearchRetrieval():
         except requests.exceptions.RequestException as e:
             return None, e
 
-    def solr_query(self, query: str) -> List[Dict]:
+    def solr_query(self, query: str, fields: str = '') -> List[Dict]:
         """
         execute a paginated query to solr
 
         :param query: Solr query string
+        :param fields: optional, fields to return, default is docs_fields
         :return: list of document dictionaries
         """
         index = 0
@@ -114,7 +126,7 @@ class SearchRetrieval():
         # go through the loop and get 2000 records at a time
         docs = []
         while True:
-            docs_from_solr, status_code = self.single_solr_query(start=index, rows=rows, query=query)
+            docs_from_solr, status_code = self.single_solr_query(start=index, rows=rows, query=query, fields=fields)
             if status_code == 200:
                 if len(docs_from_solr) > 0:
                     docs += docs_from_solr
@@ -127,15 +139,100 @@ class SearchRetrieval():
                 break
         return docs
 
-    def identify_terms_query(self):
+    def identify_terms_query(self, fulltext_mtime: str = '', fields: str = ''):
         """
         construct and execute a query to collect records for identifying entities
 
+        :param fulltext_mtime: optional, only the records with the fulltext modified at or after this timestamp,
+                               ie, the watermark of the incremental identify
+        :param fields: optional, fields to return, default is docs_fields
         :return: list of document dictionaries
         """
-        query = f'full:(="{self.args.feature_name}") full:("{self.args.target}") full:("{self.feature_types_ored}") '
+        query = f'full:(="{self.args.feature_name}") {self.identify_terms_filters()}'
+        if fulltext_mtime:
+            query += f' fulltext_mtime:["{fulltext_mtime}" TO *]'
+        return self.solr_query(query, fields)
+
+    def bibcodes_query(self, bibcodes: List[str]) -> List[Dict]:
+        """
+        retrieve the records of the bibcodes, ie, the ones selected earlier by identify_terms_query,
+        with one request to solr for a chunk of bibcodes
+
+        :param bibcodes: list of bibcodes
+        :return: list of document dictionaries, in the order of the bibcodes, the ones not found are skipped
+        """
+        found = {}
+        for i in range(0, len(bibcodes), self.bibcode_chunk_size):
+            chunk = bibcodes[i:i + self.bibcode_chunk_size]
+            query = 'bibcode:("%s")' % '" OR "'.join(chunk)
+            docs, status_code = self.single_solr_query(start=0, rows=len(chunk), query=query)
+            if status_code == 200:
+                found.update({doc['bibcode']: doc for doc in docs})
+            else:
+                logger.error(f"From solr status code {status_code}.")
+        if len(found) < len(bibcodes):
+            logger.info(f"Got {len(found)} of {len(bibcodes)} docs from solr for the bibcodes.")
+        return [found[bibcode] for bibcode in bibcodes if bibcode in found]
+
+    def identify_terms_filters(self) -> str:
+        """
+        the part of the query to collect records for identifying entities that does not depend on the feature name
+
+        :return: Solr query string
+        """
+        query = f'full:("{self.args.target}") full:("{self.feature_types_ored}") '
         query += f'{self.astronomy_journal_filter} {self.other_usgs_filters} {self.date_time_filter}'
-        return self.solr_query(query)
+        return query
+
+    def facet_count_query(self, query: str, facet_queries: List[str]) -> Tuple[Dict[str, int], int]:
+        """
+        execute a query to the Solr search engine counting the documents that match each of the facet queries,
+        without retrieving any documents
+
+        :param query: Solr query string
+        :param facet_queries: list of Solr query strings, each counted within the documents of the query
+        :return: tuple containing dict of facet query to its count and status code
+        """
+        params = {
+            'q': query,
+            'rows': 0,
+            'facet': 'true',
+            'facet.query': facet_queries,
+        }
+
+        try:
+            response = requests.get(
+                url=config['PLANETARYNAMES_PIPELINE_SOLR_URL'],
+                params=params,
+                headers={'Authorization': 'Bearer %s' % config['PLANETARYNAMES_PIPELINE_ADSWS_API_TOKEN']},
+                timeout=60
+            )
+            if response.status_code == 200:
+                return response.json().get('facet_counts', {}).get('facet_queries', {}), 200
+            return None, response.status_code
+        except requests.exceptions.RequestException as e:
+            return None, e
+
+    def count_identify_terms_query(self, feature_names: List[str]) -> Dict[str, int]:
+        """
+        count the records identify_terms_query collects for each of the feature names, of the target and feature type
+        of the args, with one request to solr for a chunk of feature names
+
+        :param feature_names: list of feature names
+        :return: dict of feature name to its number of records, -1 if it could not be counted
+        """
+        query = self.identify_terms_filters()
+
+        counts = {}
+        for i in range(0, len(feature_names), self.count_chunk_size):
+            facet_queries = {f'full:(="{feature_name}")': feature_name for feature_name in feature_names[i:i + self.count_chunk_size]}
+            facet_counts, status_code = self.facet_count_query(query, list(facet_queries.keys()))
+            if status_code != 200:
+                logger.error(f"From solr status code {status_code}.")
+                facet_counts = {}
+            for facet_query, feature_name in facet_queries.items():
+                counts[feature_name] = facet_counts.get(facet_query, -1)
+        return counts
 
     def collect_usgs_terms_query(self) -> List[Dict]:
         """
@@ -0,0 +1,107 @@
+import queue
+import threading
+from concurrent.futures import Executor, Future
+from typing import Callable, Iterable, List, Tuple
+
+from adsputils import setup_logging, load_config
+
+logger = setup_logging('utils')
+config = {}
+config.update(load_config())
+
+
+class StagePipeline(object):
+    """
+    a class that runs items through a sequence of stages, with bounded queues between the stages
+
+    each stage is a function and the executor it runs in, ie, a thread pool for the network bound stages and a
+    process pool, or a single thread, for the cpu bound ones, a thread per stage takes the items from its queue
+    in order, waits for the previous stage to be done with the item, and submits it to the stage's executor,
+    so while one item is in a stage, the next items are already in the previous stages, the queues are bounded,
+    so that a fast stage does not run too far ahead of a slow one, the results are returned in the order of the items
+    """
+
+    # maximum number of items waiting between two stages
+    queue_size = 8
+
+    # marks the end of the items in a queue
+    end_of_items = object()
+
+    def __init__(self, stages: List[Tuple[Callable, Executor]]):
+        """
+        initialize the StagePipeline class
+
+        :param stages: list of tuples of the function of the stage and the executor to run it in, in order
+        """
+        self.stages = stages
+
+    def map(self, items: Iterable) -> List:
+        """
+        run all the items through the stages
+
+        :param items: the input of the first stage
+        :return: list of the outputs of the last stage, in the order of the items,
+                 if any stage raised an exception, it is raised once all the items are done
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        threads = [threading.Thread(target=self.feed, args=(items, queues[0]), daemon=True)]
+        for (function, executor), queue_in, queue_out in zip(self.stages, queues[:-1], queues[1:]):
+            threads.append(threading.Thread(target=self.run_stage, args=(function, executor, queue_in, queue_out), daemon=True))
+        for thread in threads:
+            thread.start()
+
+        results = []
+        exception = None
+        while True:
+            future = queues[-1].get()
+            if future is self.end_of_items:
+                break
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # keep draining, so that none of the stages is left blocked on a full queue
+                exception = exception or e
+        for thread in threads:
+            thread.join()
+
+        if exception:
+            raise exception
+        return results
+
+    def feed(self, items: Iterable, queue_out: queue.Queue):
+        """
+        put the items in the queue of the first stage
+
+        :param items: the input of the first stage
+        :param queue_out: queue of the first stage
+        :return:
+        """
+        for item in items:
+            future = Future()
+            future.set_result(item)
+            queue_out.put(future)
+        queue_out.put(self.end_of_items)
+
+    def run_stage(self, function: Callable, executor: Executor, queue_in: queue.Queue, queue_out: queue.Queue):
+        """
+        submit the items to the stage as the previous stage is done with them, in order
+
+        :param function: the function of the stage
+        :param executor: the executor to run the function in
+        :param queue_in: queue of the outputs of the previous stage, as futures
+        :param queue_out: queue of the outputs of this stage, as futures
+        :return:
+        """
+        while True:
+            future = queue_in.get()
+            if future is self.end_of_items:
+                queue_out.put(self.end_of_items)
+                break
+            try:
+                queue_out.put(executor.submit(function, future.result()))
+            except Exception as e:
+                # pass the failure down to be raised once all the items are done
+                failed = Future()
+                failed.set_exception(e)
+                queue_out.put(failed)
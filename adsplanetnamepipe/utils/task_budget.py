@@ -0,0 +1,91 @@
+import time
+import threading
+from typing import Dict, Iterator, List
+
+from adsputils import setup_logging, load_config
+
+logger = setup_logging('utils')
+config = {}
+config.update(load_config())
+
+
+class TaskBudget(object):
+    """
+    a class that keeps track of the time and the number of docs a task is allowed to spend
+
+    the budget is checked cooperatively, between the docs, so that once it is exceeded, identify stops taking new docs,
+    the records of the docs processed are committed, and the docs left are continued in a new task, so that a feature
+    name with thousands of docs does not keep a worker busy for hours, the docs already taken are finished, so a task can
+    run over its time budget by the time of the docs in flight, which is counted in the stats
+    """
+
+    # counts of the tasks, of the ones that exceeded the budget, of the docs continued in new tasks,
+    # and the total seconds the tasks ran over the time budget, shared by all the instances in the process
+    stats = {'tasks': 0, 'overruns': 0, 'docs_continued': 0, 'overrun_seconds': 0.0}
+    # guards the shared stats, instances can be used from multiple threads
+    lock = threading.Lock()
+
+    def __init__(self, max_seconds: float, max_docs: int):
+        """
+        initialize the TaskBudget class, starting the clock
+
+        :param max_seconds: seconds the task is allowed to run, 0 for no limit
+        :param max_docs: number of docs the task is allowed to process, 0 for no limit
+        """
+        self.max_seconds = max_seconds
+        self.max_docs = max_docs
+        self.start_time = time.time()
+        self.num_docs = 0
+        self.docs_left = []
+        with self.lock:
+            self.stats['tasks'] += 1
+
+    def is_exceeded(self) -> bool:
+        """
+        check whether the task has spent its budget
+
+        :return: True if either the time or the number of docs is over the budget
+        """
+        return (self.max_seconds > 0 and time.time() - self.start_time >= self.max_seconds) or \
+               (self.max_docs > 0 and self.num_docs >= self.max_docs)
+
+    def take(self, docs: List[Dict]) -> Iterator[Dict]:
+        """
+        yield the docs as long as the budget is not exceeded, keeping the ones left in docs_left
+
+        :param docs: list of solr documents
+        :return: iterator of the docs within the budget
+        """
+        self.docs_left = []
+        for i, doc in enumerate(docs):
+            if self.is_exceeded():
+                self.docs_left = docs[i:]
+                return
+            self.num_docs += 1
+            yield doc
+
+    def count_overrun(self, feature_name: str, num_docs_left: int):
+        """
+        count and log a task that exceeded its budget, once the docs left of a feature name are continued in a new task
+
+        :param feature_name: the feature name of the docs left
+        :param num_docs_left: number of the docs left
+        :return:
+        """
+        elapsed = time.time() - self.start_time
+        overrun_seconds = max(elapsed - self.max_seconds, 0) if self.max_seconds > 0 else 0
+        with self.lock:
+            self.stats['overruns'] += 1
+            self.stats['docs_continued'] += num_docs_left
+            self.stats['overrun_seconds'] += overrun_seconds
+        logger.warning(f"Task budget exceeded for {feature_name} after {self.num_docs} docs in {elapsed:.2f} s, "
+                       f"{num_docs_left} docs continued in a new task.")
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        the counts of the tasks and of the overruns in the process
+
+        :return: dict of tasks, overruns, docs_continued, and overrun_seconds
+        """
+        with self.lock:
+            return dict(self.stats)
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+
+from adsputils import setup_logging, load_config
+
+logger = setup_logging('utils')
+config = {}
+config.update(load_config())
+
+from adsplanetnamepipe.utils.common import EntityArgs
+
+
+class TaskCheckpoint(object):
+    """
+    a class that keeps the records an identify task has processed, keyed by (feature name, feature type, target, timestamp)
+
+    each record is saved in a persistent store (ie, the app, saving to the `identify_checkpoint` table) as soon as its
+    excerpts are scored, so that when the task fails and is retried, the records saved with the same version of the
+    fulltext are resumed from instead of being processed again, the records are purged once the task is done
+    """
+
+    # the records saved earlier than this are not resumed from, 0 resumes from any of them
+    max_age_hours = config.get('PLANETARYNAMES_PIPELINE_IDENTIFY_CHECKPOINT_MAX_AGE_HOURS', 24)
+
+    def __init__(self, args: EntityArgs, store):
+        """
+        initialize the TaskCheckpoint class
+
+        :param args: configuration arguments of the task
+        :param store: persistent store providing get_identify_checkpoints, insert_identify_checkpoint,
+                      and remove_identify_checkpoints
+        """
+        self.key = (args.feature_name, args.feature_type, args.target, args.timestamp)
+        self.store = store
+
+    def load(self, docs: List[Dict]) -> Dict[str, Dict]:
+        """
+        look up the docs processed by an earlier attempt of the task
+
+        :param docs: list of solr documents
+        :return: dict of bibcode to the scored dict of the doc, or None if the doc has no excerpts,
+                 only for the docs saved with the same fulltext_mtime
+        """
+        date = datetime.now(timezone.utc) - timedelta(hours=self.max_age_hours) if self.max_age_hours > 0 else None
+        checkpoints = self.store.get_identify_checkpoints(*self.key, date)
+
+        resumed = {}
+        for doc in docs:
+            checkpoint = checkpoints.get(doc['bibcode'])
+            if checkpoint and checkpoint[0] == doc.get('fulltext_mtime', ''):
+                resumed[doc['bibcode']] = checkpoint[1]
+        if resumed:
+            logger.info(f"Resuming identify for {'/'.join(self.key[:3])}: {len(resumed)} of {len(docs)} docs were processed earlier.")
+        return resumed
+
+    def save(self, doc: Dict, scored: Dict) -> bool:
+        """
+        save a doc once processed
+
+        :param doc: solr document
+        :param scored: dict of the doc, as returned by score_excerpts, or None if the doc has no excerpts
+        :return: True if saved successfully
+        """
+        return self.store.insert_identify_checkpoint(*self.key, doc['bibcode'], doc.get('fulltext_mtime', ''), scored)
+
+    def purge(self) -> int:
+        """
+        remove the docs saved for the task, once it is done
+
+        :return: number of the docs removed, -1 if there was an error
+        """
+        return self.store.remove_identify_checkpoints(*self.key)
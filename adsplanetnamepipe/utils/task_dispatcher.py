@@ -0,0 +1,163 @@
+import os
+import time
+import signal
+from typing import Callable, Dict, Iterable, Set, Tuple
+
+from celery.result import AsyncResult
+
+from adsputils import setup_logging, load_config
+
+logger = setup_logging('utils')
+config = {}
+config.update(load_config())
+
+
+class TaskDispatcher(object):
+    """
+    a class that queues the tasks keeping at most a window of them in flight, instead of queueing all of them at once
+
+    the completion of the tasks in flight is tracked through the result backend, and the next tasks are queued as the
+    earlier ones complete, the throughput and the estimated time left are reported as it goes, the keys of the completed
+    tasks are appended to a progress file, if given, so that a dispatch that is stopped, with ctrl-c or a SIGTERM, once
+    the tasks in flight complete, or that is killed, resumes from where it left off when run again with the same file,
+    the tasks that failed are not recorded, so they are queued again when resumed
+    """
+
+    # seconds between checking the result backend for the tasks in flight
+    poll_interval = 1
+    # seconds between reporting the progress
+    report_interval = 60
+
+    def __init__(self, window: int, progress_file: str = ''):
+        """
+        initialize the TaskDispatcher class
+
+        :param window: maximum number of tasks in flight
+        :param progress_file: optional file to record the keys of the completed tasks in, and resume from
+        """
+        self.window = window
+        self.progress_file = progress_file
+        self.completed = self.load_progress()
+        self.in_flight: Dict[str, AsyncResult] = {}
+        self.stopping = False
+        self.stats = {'queued': 0, 'succeeded': 0, 'failed': 0, 'skipped': 0}
+        self.start_time = self.report_time = time.time()
+
+    def load_progress(self) -> Set[str]:
+        """
+        read the keys of the tasks completed by an earlier dispatch
+
+        :return: set of the keys
+        """
+        if not self.progress_file or not os.path.exists(self.progress_file):
+            return set()
+        with open(self.progress_file, 'r') as f:
+            completed = set(line.strip() for line in f if line.strip())
+        logger.info(f"Resuming from {self.progress_file}, {len(completed)} tasks were completed earlier.")
+        return completed
+
+    def save_progress(self, key: str):
+        """
+        record the key of a completed task
+
+        :param key: the key of the task
+        :return:
+        """
+        self.completed.add(key)
+        if self.progress_file:
+            with open(self.progress_file, 'a') as f:
+                f.write(f'{key}\n')
+
+    def dispatch(self, tasks: Iterable[Tuple[str, Callable[[], AsyncResult]]], num_tasks: int) -> bool:
+        """
+        queue the tasks, waiting for a task in flight to complete when the window is full
+
+        :param tasks: iterable of tuples of the key of a task and the function queueing it, returning its AsyncResult
+        :param num_tasks: number of the tasks, for reporting the progress
+        :return: True if all the tasks were queued, False if stopped before that
+        """
+        previous_handlers = self.set_signal_handlers(self.stop)
+        try:
+            for key, queue_task in tasks:
+                if key in self.completed:
+                    self.stats['skipped'] += 1
+                    continue
+                while len(self.in_flight) >= self.window and not self.stopping:
+                    self.wait(num_tasks)
+                if self.stopping:
+                    break
+                self.in_flight[key] = queue_task()
+                self.stats['queued'] += 1
+
+            while self.in_flight:
+                self.wait(num_tasks)
+        finally:
+            self.set_signal_handlers(previous_handlers)
+
+        self.report(num_tasks)
+        return not self.stopping
+
+    def wait(self, num_tasks: int):
+        """
+        wait a poll interval, and take the completed tasks out of the ones in flight
+
+        :param num_tasks: number of the tasks, for reporting the progress
+        :return:
+        """
+        time.sleep(self.poll_interval)
+        for key, result in list(self.in_flight.items()):
+            if result.ready():
+                del self.in_flight[key]
+                if result.successful():
+                    self.stats['succeeded'] += 1
+                    self.save_progress(key)
+                else:
+                    self.stats['failed'] += 1
+                    logger.error(f"Task {key} failed: {result.result}")
+        if time.time() - self.report_time >= self.report_interval:
+            self.report(num_tasks)
+
+    def report(self, num_tasks: int):
+        """
+        log the progress, the throughput, and the estimated time left
+
+        :param num_tasks: number of the tasks
+        :return:
+        """
+        self.report_time = time.time()
+        elapsed = self.report_time - self.start_time
+        num_done = self.stats['succeeded'] + self.stats['failed']
+        num_left = max(num_tasks - num_done - self.stats['skipped'], 0)
+        throughput = num_done / elapsed if elapsed > 0 else 0
+        eta = f"{num_left / throughput:.0f} s" if throughput > 0 else 'unknown'
+        logger.info(f"Dispatched {num_done + self.stats['skipped']} of {num_tasks} tasks {self.stats}, "
+                    f"{len(self.in_flight)} in flight, {throughput * 60:.2f} tasks/min, ETA {eta}.")
+
+    def stop(self, signum: int, frame):
+        """
+        signal handler, stop queueing and wait for the tasks in flight, a second signal exits without waiting
+
+        :param signum: the signal number
+        :param frame: the current stack frame
+        :return:
+        """
+        if self.stopping:
+            raise KeyboardInterrupt()
+        self.stopping = True
+        logger.info(f"Stopping, waiting for the {len(self.in_flight)} tasks in flight, interrupt again to exit now.")
+
+    def set_signal_handlers(self, handlers) -> Dict[int, object]:
+        """
+        set the handlers of SIGINT and SIGTERM
+
+        :param handlers: a handler for both, or a dict of signal number to handler, as returned by this method
+        :return: dict of signal number to the previous handler
+        """
+        previous_handlers = {}
+        for signum in [signal.SIGINT, signal.SIGTERM]:
+            try:
+                previous_handlers[signum] = signal.signal(signum, handlers[signum] if isinstance(handlers, dict) else handlers)
+            except ValueError:
+                # signals can only be handled in the main thread
+                pass
+        return previous_handlers
@@ -0,0 +1,46 @@
+"""added paper relevance score
+
+Revision ID: 3b1f6c2d9a47
+Revises: 8507ff0f750d
+Create Date: 2026-10-19 09:12:40.218311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b1f6c2d9a47'
+down_revision = '8507ff0f750d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # CREATE TABLE paper_relevance_score (
+    #     bibcode VARCHAR(19),
+    #     fulltext_mtime VARCHAR(32),
+    #     target_entity VARCHAR(32),
+    #     feature_type_entity VARCHAR(32),
+    #     paper_relevance_score FLOAT NOT NULL,
+    #     date TIMESTAMP WITH TIME ZONE NOT NULL,
+    #     PRIMARY KEY (bibcode, fulltext_mtime, target_entity, feature_type_entity),
+    #     FOREIGN KEY (feature_type_entity, target_entity) REFERENCES feature_type (entity, target_entity)
+    # );
+    op.create_table(
+        'paper_relevance_score',
+        sa.Column('bibcode', sa.String(19), primary_key=True),
+        sa.Column('fulltext_mtime', sa.String(32), primary_key=True),
+        sa.Column('target_entity', sa.String(32), primary_key=True),
+        sa.Column('feature_type_entity', sa.String(32), primary_key=True),
+        sa.Column('paper_relevance_score', sa.Float, nullable=False),
+        sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['feature_type_entity', 'target_entity'], ['feature_type.entity', 'feature_type.target_entity'],
+        )
+    )
+
+
+def downgrade():
+    op.drop_table('paper_relevance_score')
@@ -0,0 +1,41 @@
+"""added knowledge graph path weights
+
+Revision ID: 5d2e8a4c1f63
+Revises: 3b1f6c2d9a47
+Create Date: 2026-10-19 11:37:05.642918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2e8a4c1f63'
+down_revision = '3b1f6c2d9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # CREATE TABLE knowledge_graph_path_weights (
+    #     history_id integer,
+    #     path_weights JSONB NOT NULL,
+    #     date TIMESTAMP WITH TIME ZONE NOT NULL,
+    #     PRIMARY KEY (history_id),
+    #     FOREIGN KEY (history_id) REFERENCES knowledge_base_history (id)
+    # );
+    op.create_table(
+        'knowledge_graph_path_weights',
+        sa.Column('history_id', sa.Integer(), nullable=False, primary_key=True),
+        sa.Column('path_weights', postgresql.JSONB(), nullable=False),
+        sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['history_id'], ['knowledge_base_history.id'],
+        )
+    )
+
+
+def downgrade():
+    op.drop_table('knowledge_graph_path_weights')
@@ -0,0 +1,70 @@
+"""added identify watermark
+
+Revision ID: 9c4e7b2a6d18
+Revises: 5d2e8a4c1f63
+Create Date: 2026-10-19 14:02:51.317204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e7b2a6d18'
+down_revision = '5d2e8a4c1f63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # CREATE TABLE identify_watermark (
+    #     feature_name_entity VARCHAR(32),
+    #     feature_type_entity VARCHAR(32),
+    #     target_entity VARCHAR(32),
+    #     fulltext_mtime VARCHAR(32) NOT NULL,
+    #     date TIMESTAMP WITH TIME ZONE NOT NULL,
+    #     PRIMARY KEY (feature_name_entity, feature_type_entity, target_entity),
+    #     FOREIGN KEY (feature_name_entity, feature_type_entity, target_entity) REFERENCES feature_name (entity, feature_type_entity, target_entity)
+    # );
+    op.create_table(
+        'identify_watermark',
+        sa.Column('feature_name_entity', sa.String(32), primary_key=True),
+        sa.Column('feature_type_entity', sa.String(32), primary_key=True),
+        sa.Column('target_entity', sa.String(32), primary_key=True),
+        sa.Column('fulltext_mtime', sa.String(32), nullable=False),
+        sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['feature_name_entity', 'feature_type_entity', 'target_entity'],
+            ['feature_name.entity', 'feature_name.feature_type_entity', 'feature_name.target_entity'],
+        )
+    )
+
+    # CREATE TABLE identified_fulltext (
+    #     feature_name_entity VARCHAR(32),
+    #     feature_type_entity VARCHAR(32),
+    #     target_entity VARCHAR(32),
+    #     bibcode VARCHAR(19),
+    #     fulltext_mtime VARCHAR(32),
+    #     date TIMESTAMP WITH TIME ZONE NOT NULL,
+    #     PRIMARY KEY (feature_name_entity, feature_type_entity, target_entity, bibcode, fulltext_mtime),
+    #     FOREIGN KEY (feature_name_entity, feature_type_entity, target_entity) REFERENCES feature_name (entity, feature_type_entity, target_entity)
+    # );
+    op.create_table(
+        'identified_fulltext',
+        sa.Column('feature_name_entity', sa.String(32), primary_key=True),
+        sa.Column('feature_type_entity', sa.String(32), primary_key=True),
+        sa.Column('target_entity', sa.String(32), primary_key=True),
+        sa.Column('bibcode', sa.String(19), primary_key=True),
+        sa.Column('fulltext_mtime', sa.String(32), primary_key=True),
+        sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['feature_name_entity', 'feature_type_entity', 'target_entity'],
+            ['feature_name.entity', 'feature_name.feature_type_entity', 'feature_name.target_entity'],
+        )
+    )
+
+
+def downgrade():
+    op.drop_table('identified_fulltext')
+    op.drop_table('identify_watermark')
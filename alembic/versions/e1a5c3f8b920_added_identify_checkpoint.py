@@ -0,0 +1,52 @@
+"""added identify checkpoint
+
+Revision ID: e1a5c3f8b920
+Revises: 9c4e7b2a6d18
+Create Date: 2026-10-19 16:25:13.804572
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a5c3f8b920'
+down_revision = '9c4e7b2a6d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+
+    # CREATE TABLE identify_checkpoint (
+    #     feature_name_entity VARCHAR(32),
+    #     feature_type_entity VARCHAR(32),
+    #     target_entity VARCHAR(32),
+    #     timestamp VARCHAR(32),
+    #     bibcode VARCHAR(19),
+    #     fulltext_mtime VARCHAR(32) NOT NULL,
+    #     scored JSONB,
+    #     date TIMESTAMP WITH TIME ZONE NOT NULL,
+    #     PRIMARY KEY (feature_name_entity, feature_type_entity, target_entity, timestamp, bibcode),
+    #     FOREIGN KEY (feature_name_entity, feature_type_entity, target_entity) REFERENCES feature_name (entity, feature_type_entity, target_entity)
+    # );
+    op.create_table(
+        'identify_checkpoint',
+        sa.Column('feature_name_entity', sa.String(32), primary_key=True),
+        sa.Column('feature_type_entity', sa.String(32), primary_key=True),
+        sa.Column('target_entity', sa.String(32), primary_key=True),
+        sa.Column('timestamp', sa.String(32), primary_key=True),
+        sa.Column('bibcode', sa.String(19), primary_key=True),
+        sa.Column('fulltext_mtime', sa.String(32), nullable=False),
+        sa.Column('scored', postgresql.JSONB(), nullable=True),
+        sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ['feature_name_entity', 'feature_type_entity', 'target_entity'],
+            ['feature_name.entity', 'feature_name.feature_type_entity', 'feature_name.target_entity'],
+        )
+    )
+
+
+def downgrade():
+    op.drop_table('identify_checkpoint')
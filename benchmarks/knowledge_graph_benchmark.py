@@ -0,0 +1,100 @@
+import sys, os
+project_home = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+if project_home not in sys.path:
+    sys.path.insert(0, project_home)
+
+import argparse
+import time
+import tracemalloc
+from typing import List, Tuple
+
+from adsplanetnamepipe.utils.knowledge_graph import KnowledgeGraph, KnowledgeGraphCSR
+from adsplanetnamepipe.utils.common import EntityArgs
+
+from adsplanetnamepipe.tests.unittests.stubdata import keywords
+
+
+"""
+benchmark memory and speed of the networkx and the array-backed knowledge graphs on the stubdata keywords
+
+    python benchmarks/knowledge_graph_benchmark.py -s 50
+
+with scale > 1 the keyword lists are repeated with each keyword suffixed by the repeat number,
+to get graphs with as many nodes and edges as the knowledge graphs of frequently mentioned features
+"""
+
+
+def scale_keywords(keywords_list: List[List[str]], scale: int) -> List[List[str]]:
+    """
+    repeat the keyword lists, making the keywords of each repeat distinct
+
+    :param keywords_list: list of keyword lists
+    :param scale: number of repeats
+    :return: list of keyword lists
+    """
+    if scale <= 1:
+        return keywords_list
+    return [[f'{keyword}{i}' for keyword in keywords] for i in range(scale) for keywords in keywords_list]
+
+
+def measure(knowledge_graph_class: type, args: EntityArgs, keywords_list: List[List[str]], special_keywords_list: List[List[str]],
+            identify_keywords: List[List[str]], repeat: int) -> Tuple[float, float, float]:
+    """
+    measure build time, forward time, and the memory allocated to build the graph
+
+    :param knowledge_graph_class: KnowledgeGraph or KnowledgeGraphCSR
+    :param args: EntityArgs object containing the feature name
+    :param keywords_list: list of keyword lists to build the graph from
+    :param special_keywords_list: list of special keyword lists to build the graph from
+    :param identify_keywords: list of keyword lists to score
+    :param repeat: number of times to repeat each measurement
+    :return: tuple of build time in ms, forward time for all the identify keywords in ms, and peak memory in MB
+    """
+    tracemalloc.start()
+    knowledge_graph = knowledge_graph_class(args, keywords_list, special_keywords_list)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        knowledge_graph = knowledge_graph_class(args, keywords_list, special_keywords_list)
+    build_time = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for keywords in identify_keywords:
+            knowledge_graph.forward(keywords)
+    forward_time = (time.perf_counter() - start) / repeat
+
+    return build_time * 1000, forward_time * 1000, peak_memory / 1024 / 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the knowledge graph backends')
+    parser.add_argument('-s', '--scale', type=int, default=1, help='Number of times to repeat the stubdata keyword lists')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='Number of times to repeat each measurement')
+    args = parser.parse_args()
+
+    entity_args = EntityArgs(
+        target="Moon",
+        feature_type="Crater",
+        feature_type_plural="Craters",
+        feature_name="Antoniadi",
+        context_ambiguous_feature_names=["Moon", "Mars"],
+        multi_token_containing_feature_names=["Antoniadi Dorsum"],
+        name_entity_labels=[{'label': 'planetary', 'value': 1}, {'label': 'non planetary', 'value': 0}],
+        timestamp='2000-01-01',
+        all_targets=["Mars", "Mercury", "Moon", "Venus"]
+    )
+    keywords_list = scale_keywords([row[2] for row in keywords.collect_positive], args.scale)
+    special_keywords_list = scale_keywords([row[3] for row in keywords.collect_positive], args.scale)
+    identify_keywords = [row[2] for row in keywords.identify]
+
+    print(f'{"backend":<10} {"nodes":>8} {"edges":>10} {"build (ms)":>12} {"forward (ms)":>14} {"memory (MB)":>12}')
+    for name, knowledge_graph_class in [('networkx', KnowledgeGraph), ('csr', KnowledgeGraphCSR)]:
+        knowledge_graph = knowledge_graph_class(entity_args, keywords_list, special_keywords_list)
+        num_nodes = len(knowledge_graph.path_weights)
+        num_edges = knowledge_graph.graph.number_of_edges() if name == 'networkx' else knowledge_graph.graph.nnz // 2
+        build_time, forward_time, memory = measure(knowledge_graph_class, entity_args, keywords_list, special_keywords_list,
+                                                   identify_keywords, args.repeat)
+        print(f'{name:<10} {num_nodes:>8} {num_edges:>10} {build_time:>12.2f} {forward_time:>14.3f} {memory:>12.2f}')
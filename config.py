@@ -40,4 +40,72 @@ PLANETARYNAMES_PIPELINE_TOP_ASTRONOMY_JOURNALS = [
     "SSRv"
 ]
 
-PLANETARYNAMES_PIPELINE_DEFAULT_TIMESTAMP = '2000-01-01'
\ No newline at end of file
+PLANETARYNAMES_PIPELINE_DEFAULT_TIMESTAMP = '2000-01-01'
+
+# maximum number of paper relevance scores memoized in each worker process
+PLANETARYNAMES_PIPELINE_PAPER_RELEVANCE_CACHE_SIZE = 20000
+# if True paper relevance scores are also saved to the `paper_relevance_score` table and shared across workers and runs
+PLANETARYNAMES_PIPELINE_PERSIST_PAPER_RELEVANCE_SCORES = False
+
+# if True TF-IDF keywords are computed with idf over the harvested corpus, that is updated on each collect run,
+# instead of idf over the segments of each paper
+PLANETARYNAMES_PIPELINE_CORPUS_IDF = False
+# directory where the corpus idf is persisted, it has to be writable and shared by all the workers that collect or identify
+PLANETARYNAMES_PIPELINE_CORPUS_IDF_PATH = '/tmp/adsplanetnamepipe/corpus_idf'
+
+# if True path weights of the knowledge graphs are saved to the `knowledge_graph_path_weights` table,
+# and reused until the knowledge base records they were built from change
+PLANETARYNAMES_PIPELINE_CACHE_KNOWLEDGE_GRAPH = False
+
+# implementation of the knowledge graph, either `networkx`, or `csr` for the compact array-backed graph
+PLANETARYNAMES_PIPELINE_KNOWLEDGE_GRAPH_BACKEND = 'networkx'
+
+# maximum number of pipelines (ie, collect and identify, each for a target and feature type) kept in each worker process
+# to be reused for the next feature names, 0 disables reusing them
+PLANETARYNAMES_PIPELINE_COMPONENT_CACHE_SIZE = 4
+
+# if True the identify actions are queued as a chain of tasks, each stage on its own queue:
+# task_identify_retrieve (solr), task_identify_extract (nlp), task_identify_score (local llm and nasa concepts),
+# and task_identify_label (knowledge graph, label, and saving), so that each can be run with its own concurrency,
+# each chain processes one feature name, without the checkpoint and the task budget, so it cannot be combined with them, nor with -b or -w
+PLANETARYNAMES_PIPELINE_STAGE_SPLIT = False
+
+# number of threads running the remote steps of identify (local llm and nasa concepts) for several docs at once,
+# while the local steps (excerpts and keywords) of the next docs go on, 0 runs the steps one doc after another
+PLANETARYNAMES_PIPELINE_IDENTIFY_THREADS = 0
+
+# if True identify_recent only identifies the records that are new, or whose fulltext has been modified, since its last
+# successful run for the feature name, keeping a watermark and a ledger of the identified fulltexts in the db
+PLANETARYNAMES_PIPELINE_INCREMENTAL_IDENTIFY = False
+
+# if True identify saves the excerpts, keywords, and scores of each record once processed, so that when the task is
+# retried it resumes where it stopped, instead of processing all the records again, the saved records are removed once
+# the identified records are committed
+PLANETARYNAMES_PIPELINE_IDENTIFY_CHECKPOINT = False
+# the saved records older than this many hours are not resumed from, 0 resumes from any of them
+PLANETARYNAMES_PIPELINE_IDENTIFY_CHECKPOINT_MAX_AGE_HOURS = 24
+
+# the budget of each identify task, once either is spent, identify stops between the docs, the records identified so far
+# are committed, and the docs left are continued in a new task for the same feature name, 0 for no limit
+PLANETARYNAMES_PIPELINE_TASK_TIME_BUDGET_SECONDS = 0
+PLANETARYNAMES_PIPELINE_TASK_DOCS_BUDGET = 0
+
+# if True the feature names are queued longest first, estimating the cost of each as the number of records identify
+# collects for it, counted with a few facet queries to solr before queueing, the estimate is passed along to the task
+# and logged next to its runtime
+PLANETARYNAMES_PIPELINE_LONGEST_FIRST = False
+
+# maximum number of tasks run.py keeps in flight for the queued actions, queueing the rest as these complete,
+# and reporting the throughput and the estimated time left, 0 queues all of them at once (can be set with -w),
+# the completion of the tasks is tracked through the result backend, so it needs CELERY_RESULT_BACKEND to be set
+# (ie, 'rpc://'), with the stage split an identify task counts as complete once its records are retrieved
+PLANETARYNAMES_PIPELINE_DISPATCH_WINDOW = 0
+
+# if True identify_recent first counts the records with the fulltext modified since the timestamp for all the feature
+# names, with a few facet queries to solr for each target and feature type, and queues only the feature names with any
+PLANETARYNAMES_PIPELINE_PLAN_IDENTIFY_RECENT = False
+
+# if True run.py loads the tables the arguments of the pipeline are setup from (ie, plural feature types, ambiguous and
+# multi-token feature names, named entity labels, and targets) once, with one query per table, and sets up the arguments
+# of all the feature names from them, instead of with five queries for each feature name
+PLANETARYNAMES_PIPELINE_GAZETTEER_SNAPSHOT = False
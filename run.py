@@ -1,16 +1,23 @@
 import sys
 import os
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from datetime import datetime, timedelta
 
 from adsputils import setup_logging, load_config
 
 import argparse
+from functools import partial
+
+from celery.backends.base import DisabledBackend
+from celery.result import AsyncResult
 
 from adsplanetnamepipe import tasks
 from adsplanetnamepipe.models import NamedEntityLabel
 from adsplanetnamepipe.utils.common import PLANETARYNAMES_PIPELINE_ACTION, EntityArgs
 from adsplanetnamepipe.utils.file_io import FileIO
+from adsplanetnamepipe.utils.gazetteer_snapshot import GazetteerSnapshot
+from adsplanetnamepipe.utils.search_retrieval import SearchRetrieval
+from adsplanetnamepipe.utils.task_dispatcher import TaskDispatcher
 
 proj_home = os.path.realpath(os.path.dirname(__file__))
 config = load_config(proj_home=proj_home)
@@ -18,6 +25,16 @@ config = load_config(proj_home=proj_home)
 app = tasks.app
 logger = setup_logging('run.py')
 
+# these actions go through queue
+queued_actions = [PLANETARYNAMES_PIPELINE_ACTION.collect,
+                  PLANETARYNAMES_PIPELINE_ACTION.identify,
+                  PLANETARYNAMES_PIPELINE_ACTION.end_to_end,
+                  PLANETARYNAMES_PIPELINE_ACTION.collect_recent,
+                  PLANETARYNAMES_PIPELINE_ACTION.identify_recent]
+
+# the gazetteer tables loaded for the run, None until the first feature name, False if disabled or not loaded
+gazetteer_snapshot = None
+
 
 def map_input_param_to_action_type(input_param: str) -> PLANETARYNAMES_PIPELINE_ACTION:
     """
@@ -47,8 +64,209 @@ def get_default_filename(action_type: PLANETARYNAMES_PIPELINE_ACTION) -> str:
     return ''
 
 
+def get_gazetteer_snapshot() -> GazetteerSnapshot:
+    """
+    the gazetteer tables loaded once for the run, if enabled, so that the arguments of the feature names
+    are setup in memory instead of with five queries each
+
+    :return: GazetteerSnapshot, or None if disabled or the tables could not be loaded
+    """
+    global gazetteer_snapshot
+    if gazetteer_snapshot is None:
+        gazetteer_snapshot = False
+        if config.get('PLANETARYNAMES_PIPELINE_GAZETTEER_SNAPSHOT', False):
+            # when the load fails, it is not tried again for each feature name, the arguments are queried instead
+            gazetteer_snapshot = app.get_gazetteer_snapshot() or False
+    return gazetteer_snapshot or None
+
+
+def get_entity_args(feature_name: str, target: str, feature_type: str, timestamp: datetime) -> EntityArgs:
+    """
+    setup the arguments of the pipeline for a feature name
+
+    :param feature_name: str, the name of the feature to be processed
+    :param target: str, the current target entity (e.g., Moon, Mars)
+    :param feature_type: str, the feature type (e.g., Crater)
+    :param timestamp: datetime, timestamp for identifying or processing entities
+    :return: EntityArgs, the arguments of the pipeline
+    """
+    snapshot = get_gazetteer_snapshot()
+    if snapshot:
+        return snapshot.get_entity_args(feature_name, target, feature_type, timestamp)
+    return EntityArgs(target=target,
+                      feature_type=feature_type,
+                      feature_type_plural=app.get_plural_feature_type_entity(feature_type),
+                      feature_name=feature_name,
+                      context_ambiguous_feature_names=app.get_context_ambiguous_feature_name(feature_name),
+                      multi_token_containing_feature_names=app.get_multi_token_containing_feature_name(feature_name),
+                      name_entity_labels=app.get_named_entity_label(),
+                      timestamp=str(timestamp.date()),
+                      all_targets=app.get_target_entities())
+
+
+def group_feature_names(feature_names_info: List[Tuple[str, str, str]]) -> Dict[Tuple[str, str], List[str]]:
+    """
+    group the feature names by target and feature type, keeping the order
+
+    :param feature_names_info: list of tuples of (target, feature type, feature name)
+    :return: dict of (target, feature type) to the list of its feature names
+    """
+    groups = {}
+    for (target, feature_type, feature_name) in feature_names_info:
+        groups.setdefault((target, feature_type), []).append(feature_name)
+    return groups
+
+
+def estimate_feature_name_costs(feature_names_info: List[Tuple[str, str, str]], timestamp: datetime) -> Dict[Tuple[str, str, str], int]:
+    """
+    estimate the cost of each feature name as the number of records identify collects for it, counted with
+    one request to solr for a chunk of feature names of a target and feature type
+
+    :param feature_names_info: list of tuples of (target, feature type, feature name)
+    :param timestamp: datetime, timestamp for identifying or processing entities
+    :return: dict of (target, feature type, feature name) to its number of records, -1 if it could not be counted
+    """
+    costs = {}
+    for (target, feature_type), feature_names in group_feature_names(feature_names_info).items():
+        search_retrieval = SearchRetrieval(get_entity_args(feature_names[0], target, feature_type, timestamp))
+        counts = search_retrieval.count_identify_terms_query(feature_names)
+        for feature_name in feature_names:
+            costs[(target, feature_type, feature_name)] = counts.get(feature_name, -1)
+    logger.info(f"Estimated the costs of {len(costs)} feature names, {sum(cost for cost in costs.values() if cost > 0)} records in total.")
+    return costs
+
+
+def get_longest_first_key(cost: int) -> float:
+    """
+    the key to sort the costs in descending order with, the ones that could not be estimated go first
+
+    :param cost: int, estimated number of records, -1 if it could not be counted
+    :return: float, key for sorted
+    """
+    return -cost if cost >= 0 else float('-inf')
+
+
+def is_stage_split(action_type: PLANETARYNAMES_PIPELINE_ACTION) -> bool:
+    """
+    if the action is queued through the stage queues of identify
+
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION, one of the queued actions
+    :return: bool, True if the stage split is enabled and the action is identify or identify_recent
+    """
+    return config.get('PLANETARYNAMES_PIPELINE_STAGE_SPLIT', False) and \
+           action_type in [PLANETARYNAMES_PIPELINE_ACTION.identify, PLANETARYNAMES_PIPELINE_ACTION.identify_recent]
+
+
+def verify_stage_split(action_type: PLANETARYNAMES_PIPELINE_ACTION, batch_size: int, dispatcher: TaskDispatcher = None) -> bool:
+    """
+    the stage queues of identify process one feature name per chain of tasks, without the checkpoint and the budget
+    of the identify task, so these settings cannot be combined with the stage split, nor can the dispatcher, which
+    would track the first task of the chain, and record the feature name as completed before the last stage is done
+
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION, one of the queued actions
+    :param batch_size: int, maximum number of feature names in a chunk
+    :param dispatcher: optional dispatcher the feature names are to be queued with
+    :return: bool, False if the action is queued through the stage queues with any of these settings, True otherwise
+    """
+    if not is_stage_split(action_type):
+        return True
+    unsupported = []
+    if config.get('PLANETARYNAMES_PIPELINE_IDENTIFY_CHECKPOINT', False):
+        unsupported.append('PLANETARYNAMES_PIPELINE_IDENTIFY_CHECKPOINT')
+    if config.get('PLANETARYNAMES_PIPELINE_TASK_TIME_BUDGET_SECONDS', 0) > 0 or config.get('PLANETARYNAMES_PIPELINE_TASK_DOCS_BUDGET', 0) > 0:
+        unsupported.append('the task budget')
+    if batch_size > 1:
+        unsupported.append('-b')
+    if dispatcher:
+        unsupported.append('-w')
+    if unsupported:
+        logger.warning(f"PLANETARYNAMES_PIPELINE_STAGE_SPLIT cannot be combined with {', '.join(unsupported)}, "
+                       f"either disable the stage split or these settings. Nothing queued.")
+        return False
+    return True
+
+
+def queue_a_feature_name(feature_name: str, target: str, feature_type: str, action_type: PLANETARYNAMES_PIPELINE_ACTION,
+                         timestamp: datetime, estimated_docs: int = -1) -> AsyncResult:
+    """
+    queue the task of a single feature name
+
+    :param feature_name: str, the name of the feature to be processed
+    :param target: str, the current target entity (e.g., Moon, Mars)
+    :param feature_type: str, the feature type (e.g., Crater)
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION, one of the queued actions
+    :param timestamp: datetime, timestamp for identifying or processing entities
+    :param estimated_docs: int, optional estimated number of records of the feature name, passed along to the task
+    :return: AsyncResult, the result of the task
+    """
+    entity_args = get_entity_args(feature_name, target, feature_type, timestamp)
+    # serialize before queueing
+    the_task = {'action_type': action_type.value, 'args': entity_args.toJSON()}
+    if estimated_docs >= 0:
+        # to be logged next to the runtime of the task
+        the_task['estimated_docs'] = estimated_docs
+    if is_stage_split(action_type):
+        # identify goes through the stage queues, starting with the retrieval
+        return tasks.task_identify_retrieve.delay(the_task)
+    return tasks.task_process_planetary_nomenclature.delay(the_task)
+
+
+def queue_a_chunk(feature_names: List[str], target: str, feature_type: str, action_type: PLANETARYNAMES_PIPELINE_ACTION,
+                  timestamp: datetime, estimated_docs: int = -1) -> AsyncResult:
+    """
+    queue the task of a chunk of feature names of the same target and feature type
+
+    :param feature_names: list of the names of the features to be processed
+    :param target: str, the current target entity (e.g., Moon, Mars)
+    :param feature_type: str, the feature type (e.g., Crater)
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION, one of the queued actions
+    :param timestamp: datetime, timestamp for identifying or processing entities
+    :param estimated_docs: int, optional estimated number of records of the chunk, passed along to the task
+    :return: AsyncResult, the result of the task
+    """
+    entity_args_list = [get_entity_args(feature_name, target, feature_type, timestamp) for feature_name in feature_names]
+    # serialize before queueing
+    the_task = {'action_type': action_type.value, 'args': [entity_args.toJSON() for entity_args in entity_args_list]}
+    if estimated_docs >= 0:
+        # to be logged next to the runtime of the task
+        the_task['estimated_docs'] = estimated_docs
+    return tasks.task_process_planetary_nomenclature_batch.delay(the_task)
+
+
+def get_task_key(action_type: PLANETARYNAMES_PIPELINE_ACTION, target: str, feature_type: str, feature_names: List[str]) -> str:
+    """
+    the key of a task, the dispatcher records the completed tasks by
+
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION, one of the queued actions
+    :param target: str, the current target entity (e.g., Moon, Mars)
+    :param feature_type: str, the feature type (e.g., Crater)
+    :param feature_names: list of the names of the features of the task
+    :return: str, the key
+    """
+    return f"{action_type.value}/{target}/{feature_type}/{'|'.join(feature_names)}"
+
+
+def get_dispatcher(args: argparse.Namespace) -> TaskDispatcher:
+    """
+    the dispatcher keeping at most a window of tasks in flight, if enabled
+
+    :param args: parsed command-line arguments object
+    :return: TaskDispatcher, or None if the tasks are to be queued all at once
+    """
+    try:
+        window = int(args.window) if args.window else config.get('PLANETARYNAMES_PIPELINE_DISPATCH_WINDOW', 0)
+    except ValueError:
+        window = 0
+    if window <= 0:
+        return None
+    if isinstance(app.backend, DisabledBackend):
+        logger.error("The dispatcher tracks the tasks through the result backend, set CELERY_RESULT_BACKEND to use it.")
+        sys.exit(1)
+    return TaskDispatcher(window, args.progress_file or '')
+
+
 def process_a_feature_name(feature_name: str, target: str, feature_type: str, action_type: PLANETARYNAMES_PIPELINE_ACTION,
-                           keyword: str, timestamp: datetime, output_file: str, label: str):
+                           keyword: str, timestamp: datetime, output_file: str, label: str, estimated_docs: int = -1):
     """
     processes a single feature name based on the provided action type
 
@@ -60,26 +278,10 @@ def process_a_feature_name(feature_name: str, target: str, feature_type: str, ac
     :param timestamp: datetime, timestamp for identifying or processing entities
     :param output_file: str, the file name for data export
     :param label: str, label to specify getting planetary or non-planetary keywords (ie, planetray or unknown)
+    :param estimated_docs: int, optional estimated number of records of the feature name, passed along to the task
     """
-    entity_args = EntityArgs(target=target,
-                             feature_type=feature_type,
-                             feature_type_plural=app.get_plural_feature_type_entity(feature_type),
-                             feature_name=feature_name,
-                             context_ambiguous_feature_names=app.get_context_ambiguous_feature_name(feature_name),
-                             multi_token_containing_feature_names=app.get_multi_token_containing_feature_name(feature_name),
-                             name_entity_labels=app.get_named_entity_label(),
-                             timestamp=str(timestamp.date()),
-                             all_targets=app.get_target_entities())
-
-    # these actions go through queue
-    if action_type in [PLANETARYNAMES_PIPELINE_ACTION.collect,
-                       PLANETARYNAMES_PIPELINE_ACTION.identify,
-                       PLANETARYNAMES_PIPELINE_ACTION.end_to_end,
-                       PLANETARYNAMES_PIPELINE_ACTION.collect_recent,
-                       PLANETARYNAMES_PIPELINE_ACTION.identify_recent]:
-        # serialize before queueing
-        the_task = {'action_type': action_type.value, 'args': entity_args.toJSON()}
-        tasks.task_process_planetary_nomenclature.delay(the_task)
+    if action_type in queued_actions:
+        queue_a_feature_name(feature_name, target, feature_type, action_type, timestamp, estimated_docs)
 
     # the following five actions is applied to knowledge graph (ie, remove most recent record, remove all all but most recent records,
     # remove keywords, add keywords, export keywords)
@@ -133,6 +335,99 @@ def process_a_feature_name(feature_name: str, target: str, feature_type: str, ac
                 f"No keywords to add for feature name '{feature_name}', feature type '{feature_type}', target '{target}', and label '{named_entity_label}'.")
 
 
+def process_feature_names_in_batches(feature_names_info: List[Tuple[str, str, str]], action_type: PLANETARYNAMES_PIPELINE_ACTION,
+                                     timestamp: datetime, batch_size: int, costs: Dict[Tuple[str, str, str], int] = None,
+                                     dispatcher: TaskDispatcher = None):
+    """
+    queue the feature names in chunks, each chunk processed by one task that reuses the pipeline components
+
+    :param feature_names_info: list of tuples of (target, feature type, feature name)
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION, one of the queued actions
+    :param timestamp: datetime, timestamp for identifying or processing entities
+    :param batch_size: int, maximum number of feature names in a chunk
+    :param costs: optional estimated costs of the feature names, if given the chunks are queued longest first
+    :param dispatcher: optional dispatcher to queue the chunks with, otherwise they are queued all at once
+    """
+    # a chunk has to share the target and feature type, so group them first, keeping the order
+    chunks = []
+    for (target, feature_type), feature_names in group_feature_names(feature_names_info).items():
+        for i in range(0, len(feature_names), batch_size):
+            chunk = feature_names[i:i + batch_size]
+            # the cost of a chunk is the sum of the costs of its feature names
+            chunk_costs = [costs.get((target, feature_type, feature_name), -1) for feature_name in chunk] if costs else [-1]
+            chunks.append((target, feature_type, chunk, -1 if -1 in chunk_costs else sum(chunk_costs)))
+    if costs:
+        chunks = sorted(chunks, key=lambda chunk: get_longest_first_key(chunk[3]))
+
+    if dispatcher:
+        dispatcher.dispatch(((get_task_key(action_type, target, feature_type, feature_names),
+                              partial(queue_a_chunk, feature_names, target, feature_type, action_type, timestamp, estimated_docs))
+                             for (target, feature_type, feature_names, estimated_docs) in chunks), len(chunks))
+    else:
+        for (target, feature_type, feature_names, estimated_docs) in chunks:
+            queue_a_chunk(feature_names, target, feature_type, action_type, timestamp, estimated_docs)
+
+
+def plan_identify_recent(feature_names_info: List[Tuple[str, str, str]], timestamp: datetime) -> \
+        Tuple[List[Tuple[str, str, str]], Dict[Tuple[str, str, str], int]]:
+    """
+    find the feature names that have any records with the fulltext modified since the timestamp, counting the records
+    of all the feature names of a target and feature type with a few requests to solr, so that only these are queued
+
+    :param feature_names_info: list of tuples of (target, feature type, feature name)
+    :param timestamp: datetime, timestamp for identifying or processing entities
+    :return: tuple of the list of the feature names with new records, or that could not be counted,
+             and the dict of (target, feature type, feature name) to its number of records
+    """
+    counts = estimate_feature_name_costs(feature_names_info, timestamp)
+    planned = [info for info in feature_names_info if counts[info] != 0]
+    logger.info(f"Planned identify_recent for {len(planned)} of {len(feature_names_info)} feature names, "
+                f"the rest have no records modified since {timestamp.date()}.")
+    return planned, counts
+
+
+def process_feature_names(feature_names_info: List[Tuple[str, str, str]], action_type: PLANETARYNAMES_PIPELINE_ACTION,
+                          args: argparse.Namespace, timestamp: datetime, costs: Dict[Tuple[str, str, str], int] = None):
+    """
+    processes the feature names, queueing them in chunks if the batch size is specified for a queued action
+
+    :param feature_names_info: list of tuples of (target, feature type, feature name)
+    :param action_type: PLANETARYNAMES_PIPELINE_ACTION, the action to perform (e.g., collect, identify, etc.)
+    :param args: parsed command-line arguments object
+    :param timestamp: datetime, timestamp for identifying or processing entities
+    :param costs: optional estimated costs of the feature names, if already counted
+    """
+    try:
+        batch_size = int(args.batch_size) if args.batch_size else 1
+    except ValueError:
+        batch_size = 1
+    dispatcher = get_dispatcher(args) if action_type in queued_actions else None
+    if not verify_stage_split(action_type, batch_size, dispatcher):
+        return
+
+    # the feature names with the most records are queued first, so that they do not end up dominating the total runtime
+    if action_type in queued_actions and config.get('PLANETARYNAMES_PIPELINE_LONGEST_FIRST', False):
+        if costs is None:
+            costs = estimate_feature_name_costs(feature_names_info, timestamp)
+    else:
+        costs = {}
+
+    if action_type in queued_actions and batch_size > 1:
+        process_feature_names_in_batches(feature_names_info, action_type, timestamp, batch_size, costs, dispatcher)
+    else:
+        if costs:
+            feature_names_info = sorted(feature_names_info, key=lambda info: get_longest_first_key(costs[info]))
+        if dispatcher:
+            dispatcher.dispatch(((get_task_key(action_type, target, feature_type, [feature_name]),
+                                  partial(queue_a_feature_name, feature_name, target, feature_type, action_type, timestamp,
+                                          costs.get((target, feature_type, feature_name), -1)))
+                                 for (target, feature_type, feature_name) in feature_names_info), len(feature_names_info))
+        else:
+            for (target, feature_type, feature_name) in feature_names_info:
+                process_a_feature_name(feature_name, target, feature_type, action_type, args.keyword,
+                                       timestamp, args.output_file, args.label, costs.get((target, feature_type, feature_name), -1))
+
+
 def import_usgs_update(usgs_update_file: str):
     """
     import the USGS Gazetteer update by reading the input file, identifying new entity IDs,
@@ -211,6 +506,9 @@ def parse_arguments() -> argparse.Namespace:
     parser.add_argument('-u', '--usgs_update', help='CSV file for USGS data update.')
     parser.add_argument('-o', '--output_file', help='optional: specify file name for data export. If omitted, defaults to `keywords_export_<timestamp>.csv` or `identified_entities_<timestamp>.csv`, saved in the current directory.')
     parser.add_argument('-l', '--label', help='optional: specify label of the knowledge graph keywords to export (e.g, planetary or unknown).')
+    parser.add_argument('-b', '--batch_size', help='optional: number of feature names of a target and feature type to queue in one task for collect, identify, end_to_end, and the recent actions.')
+    parser.add_argument('-w', '--window', help='optional: maximum number of tasks in flight, the rest are queued as these complete, for collect, identify, end_to_end, and the recent actions.')
+    parser.add_argument('-p', '--progress_file', help='optional: with -w, file to record the completed tasks in, to resume from if stopped.')
     return parser.parse_args()
 
 
@@ -227,6 +525,8 @@ def parse_arguments() -> argparse.Namespace:
 # python run.py -a update_database_with_usgs_entities -u updated_usgs_terms.csv
 # python run.py -a collect_recent
 # python run.py -a identify_recent
+# python run.py -a identify_recent -b 20
+# python run.py -a identify_recent -w 50 -p identify_recent_progress.txt
 
 # Main entry point of the script.
 # Sets up argument parsing, processes the arguments, and executes the appropriate action based on the provided command-line arguments.
@@ -268,9 +568,7 @@ if __name__ == '__main__':
 
         if results:
             timestamp = get_date(args.days, config['PLANETARYNAMES_PIPELINE_DEFAULT_TIMESTAMP'])
-            for (current_target, current_feature_type, feature_name) in results:
-                process_a_feature_name(feature_name, current_target, current_feature_type, action_type, args.keyword,
-                                       timestamp, args.output_file, args.label)
+            process_feature_names(results, action_type, args, timestamp)
 
     # one more action command with one optional parameter (days)
     elif action_type == PLANETARYNAMES_PIPELINE_ACTION.identify_recent:
@@ -278,9 +576,12 @@ if __name__ == '__main__':
 
         if results:
             timestamp = get_date(args.days, config['PLANETARYNAMES_PIPELINE_DEFAULT_TIMESTAMP'])
-            for (current_target, current_feature_type, feature_name) in results:
-                process_a_feature_name(feature_name, current_target, current_feature_type, action_type, args.keyword,
-                                       timestamp, args.output_file, args.label)
+            if config.get('PLANETARYNAMES_PIPELINE_PLAN_IDENTIFY_RECENT', False):
+                # queue only the feature names with records modified since the timestamp
+                results, costs = plan_identify_recent(results, timestamp)
+                process_feature_names(results, action_type, args, timestamp, costs)
+            else:
+                process_feature_names(results, action_type, args, timestamp)
 
     # this action requires one parameter: the csv file extracted info from usgs recently
     elif action_type == PLANETARYNAMES_PIPELINE_ACTION.update_database_with_usgs_entities:
@@ -299,9 +600,8 @@ if __name__ == '__main__':
             if current_target and (current_feature_type or current_feature_names):
                 # process one to many feature names
                 # one is when feature name is entered, while many is when feature type is entered
-                for feature_name in current_feature_names:
-                    process_a_feature_name(feature_name, current_target, current_feature_type, action_type, args.keyword,
-                                           timestamp, args.output_file, args.label)
+                process_feature_names([(current_target, current_feature_type, feature_name) for feature_name in current_feature_names],
+                                      action_type, args, timestamp)
             else:
                 logger.info('Either valid feature type (-f) or valid feature name (-n) is needed for processing! Terminating!')
                 sys.exit(1)